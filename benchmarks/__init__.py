@@ -0,0 +1,5 @@
+import os
+
+# Бенчмарки работают офлайн, поэтому настоящий токен не нужен.
+# Значение задается до импорта bot.config, который требует TELEGRAM_BOT_TOKEN.
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:BENCHMARK")
@@ -0,0 +1,67 @@
+"""
+Пакетный перевод: пропускная способность и задержка при фиксированной стоимости вызова.
+
+Переводчик-заглушка тратит BACKEND_OVERHEAD секунд на каждый вызов и PER_ITEM на каждый текст,
+пул ограничен WORKERS потоками (исходящими соединениями). Основные замеры - с API
+googletrans (одна строка за вызов): пачка дает только объединение одинаковых текстов.
+Для сравнения - переводчик с пакетным API, которого у googletrans нет.
+
+Запуск: python -m benchmarks.batch_bench
+"""
+import asyncio
+import random
+import time
+
+import benchmarks  # noqa: F401  (задает токен для bot.config)
+from benchmarks.fakes import FakeTranslator, FakeBatchTranslator, percentile
+from bot.services.translation import TranslationService
+
+BACKEND_OVERHEAD = 0.02
+PER_ITEM = 0.0005
+WORKERS = 4
+REQUESTS = 400
+
+
+async def burst(service, texts):
+    latencies = []
+    start = time.perf_counter()
+
+    async def one(text):
+        await service.translate(text, dest='en')
+        latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(t) for t in texts))
+    return latencies, time.perf_counter() - start
+
+
+async def lone_user(service, count=20):
+    latencies = []
+    for i in range(count):
+        start = time.perf_counter()
+        await service.translate(f"Одинокий запрос {i}", dest='en')
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def main():
+    rng = random.Random(1)
+    texts = [f"Сообщение {rng.randrange(REQUESTS // 2)}" for _ in range(REQUESTS)]
+
+    variants = [(name, window, FakeTranslator)
+                for name, window in (("без пачек", 0), ("окно 2 мс", 0.002), ("окно 5 мс", 0.005),
+                                     ("окно 10 мс", 0.01))]
+    variants.append(("пакетный API, окно 5 мс", 0.005, FakeBatchTranslator))
+    for name, window, translator in variants:
+        backend = translator(latency=BACKEND_OVERHEAD, per_item=PER_ITEM)
+        service = TranslationService(backend, max_workers=WORKERS, max_queue=REQUESTS,
+                                     batch_window=window, batch_size=50)
+        latencies, total = await burst(service, texts)
+        lone = await lone_user(service)
+        print(f"{name:<24} {REQUESTS / total:7.0f} req/s  calls={backend.calls:4d}  "
+              f"p50={percentile(latencies, 50) * 1000:7.1f} ms  p99={percentile(latencies, 99) * 1000:7.1f} ms  "
+              f"одиночный p50={percentile(lone, 50) * 1000:5.1f} ms")
+        await service.shutdown()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
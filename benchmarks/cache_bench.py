@@ -0,0 +1,71 @@
+"""
+Кэш переводов: доля попаданий и задержка на повторяющихся фразах.
+
+Запуск: python -m benchmarks.cache_bench
+"""
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+import benchmarks  # noqa: F401  (задает токен для bot.config)
+from benchmarks.fakes import FakeTranslator, percentile
+from bot.db import database
+from bot.services.translation import TranslationService, TranslationCache
+
+REQUESTS = 2000
+PHRASES = 500
+BACKEND_LATENCY = 0.01
+
+
+def zipf_phrases(count, vocabulary, seed=42):
+    """Фразы с распределением Ципфа: несколько популярных и длинный хвост."""
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(vocabulary)]
+    return [f"Фраза номер {i}" for i in rng.choices(range(vocabulary), weights=weights, k=count)]
+
+
+async def run(service, texts):
+    latencies = []
+    for text in texts:
+        start = time.perf_counter()
+        await service.translate(text, dest='en')
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, 'bench.db')
+        await database.init_db()
+        texts = zipf_phrases(REQUESTS, PHRASES)
+
+        for name, cache_size in (("без кэша", None), ("LRU 100", 100), ("LRU 1000", 1000)):
+            backend = FakeTranslator(latency=BACKEND_LATENCY)
+            cache = TranslationCache(max_size=cache_size, persistent=False) if cache_size else None
+            service = TranslationService(backend, cache=cache, batch_window=0)
+            latencies = await run(service, texts)
+            stats = cache.stats() if cache else {'hit_rate': 0.0, 'evictions': 0}
+            print(f"{name:<12} backend_calls={backend.calls:5d} hit_rate={stats['hit_rate']:.2%} "
+                  f"evictions={stats['evictions']:5d} p50={percentile(latencies, 50) * 1000:6.2f} ms "
+                  f"p99={percentile(latencies, 99) * 1000:6.2f} ms")
+            await service.shutdown()
+
+        # Прогреваем SQLite и имитируем перезапуск: память пуста, записи берутся из БД
+        warm = TranslationService(FakeTranslator(latency=BACKEND_LATENCY), cache=TranslationCache(max_size=100))
+        await run(warm, texts)
+        await warm.shutdown()
+        backend = FakeTranslator(latency=BACKEND_LATENCY)
+        restarted = TranslationService(backend, cache=TranslationCache(max_size=100))
+        latencies = await run(restarted, texts)
+        stats = restarted.cache.stats()
+        print(f"{'после рестарта':<12} backend_calls={backend.calls:5d} hit_rate={stats['hit_rate']:.2%} "
+              f"db_hits={stats['db_hits']:5d} p50={percentile(latencies, 50) * 1000:6.2f} ms "
+              f"p99={percentile(latencies, 99) * 1000:6.2f} ms")
+        await restarted.shutdown()
+        await database.close_db()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
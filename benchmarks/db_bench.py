@@ -0,0 +1,89 @@
+"""
+Скорость вставки студентов: новое соединение на каждый вызов, пул соединений
+с записью по одной строке и пул с пакетной отложенной записью (add_student).
+
+Запуск: python -m benchmarks.db_bench
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+import aiosqlite
+
+import benchmarks  # noqa: F401  (задает токен для bot.config)
+from benchmarks.fakes import percentile
+from bot.db import database
+
+ROWS = 1000
+CONCURRENCY = 8
+
+
+async def add_student_connect_per_call(name: str, age: int, grade: str):
+    """Прежняя реализация add_student: отдельное соединение и commit на каждую запись."""
+    async with aiosqlite.connect(database.DB_PATH) as db:
+        await db.execute(
+            'INSERT INTO students (name, age, grade) VALUES (?, ?, ?)',
+            (name, age, grade)
+        )
+        await db.commit()
+    return True
+
+
+async def add_student_pooled_single(name: str, age: int, grade: str):
+    """Одна строка и commit через долгоживущее соединение из пула."""
+    async with database.get_pool().acquire() as db:
+        await db.execute(
+            'INSERT INTO students (name, age, grade) VALUES (?, ?, ?)',
+            (name, age, grade)
+        )
+        await db.commit()
+    return True
+
+
+async def run(insert, rows, concurrency):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await insert(name=f"Студент {i}", age=10 + i % 8, grade=f"{5 + i % 7}А")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(rows)))
+    return latencies, time.perf_counter() - start
+
+
+def report(name, latencies, total):
+    print(f"{name:<20} {len(latencies) / total:8.0f} rows/s  "
+          f"p50={percentile(latencies, 50) * 1000:6.2f} ms  p99={percentile(latencies, 99) * 1000:6.2f} ms")
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        # Прежний путь: журнал по умолчанию (DELETE), соединение на каждый вызов
+        database.DB_PATH = os.path.join(tmp, 'connect_per_call.db')
+        async with aiosqlite.connect(database.DB_PATH) as db:
+            await db.execute('CREATE TABLE students (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                             'name TEXT NOT NULL, age INTEGER, grade TEXT)')
+            await db.commit()
+        report("connect per call", *await run(add_student_connect_per_call, ROWS, CONCURRENCY))
+
+        # Пул соединений с WAL, но по одной строке и commit на запись
+        database.DB_PATH = os.path.join(tmp, 'pooled.db')
+        await database.init_db()
+        report("pool, row per commit", *await run(add_student_pooled_single, ROWS, CONCURRENCY))
+        await database.close_db()
+
+        # Пул соединений с пакетной записью: так работает add_student
+        database.DB_PATH = os.path.join(tmp, 'write_behind.db')
+        await database.init_db()
+        report("pool + write-behind", *await run(database.add_student, ROWS, CONCURRENCY))
+        report("  burst (x64 conc.)", *await run(database.add_student, ROWS, 64))
+        await database.close_db()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,184 @@
+"""
+Локальный поддельный сервер Telegram Bot API на aiohttp.
+
+Бот подключается к нему через AiohttpSession(api=TelegramAPIServer.from_base(server.base_url)),
+поэтому весь путь запроса (сериализация, HTTP, разбор ответа) настоящий, но сеть не нужна.
+Сервер отдает апдейты через getUpdates, запоминает отправленные ботом сообщения
+и умеет отвечать ошибкой 429 с retry_after, как настоящий Telegram.
+"""
+import asyncio
+import itertools
+import random
+import time
+
+from aiohttp import web
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.enums import ParseMode
+
+BOT_TOKEN = "123456:BENCHMARK"
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+
+
+class FakeTelegramAPI:
+    """
+    Поддельный Bot API.
+
+    rate_limit_probability - доля запросов отправки, на которые сервер отвечает 429;
+    retry_after - значение retry_after в таких ответах, сек;
+    latency - искусственная задержка каждого ответа, сек;
+    upload_bandwidth - скорость приема загружаемых файлов, байт/с (0 - без ограничения);
+    invalid_file_ids - file_id, на которые сервер отвечает 400, как на устаревшие.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 rate_limit_probability: float = 0.0, retry_after: int = 1, seed: int = 0,
+                 upload_bandwidth: float = 0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.upload_bandwidth = upload_bandwidth
+        self.invalid_file_ids = set()
+        self.uploaded_bytes = 0
+        self.rate_limit_probability = rate_limit_probability
+        self.retry_after = retry_after
+        self.updates = asyncio.Queue()
+        self.sent = []            # (время, метод, параметры) успешных запросов отправки
+        self.rate_limited = 0
+        self.calls = {}
+        self.files = {}           # file_path -> bytes
+        self._message_ids = itertools.count(1)
+        self._rng = random.Random(seed)
+        self._runner = None
+        self._sent_event = asyncio.Event()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        app = web.Application(client_max_size=50 * 1024 * 1024)
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        app.router.add_get("/file/bot{token}/{path:.+}", self._handle_file)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def make_bot(self, **kwargs) -> Bot:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(self.base_url))
+        return Bot(token=BOT_TOKEN, session=session, parse_mode=ParseMode.HTML, **kwargs)
+
+    def push_updates(self, updates):
+        for update in updates:
+            self.updates.put_nowait(update)
+
+    async def wait_sent(self, count: int, timeout: float = 60):
+        """Ждет, пока бот отправит count сообщений."""
+        deadline = time.monotonic() + timeout
+        while len(self.sent) < count:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"Бот отправил {len(self.sent)} из {count} сообщений")
+            self._sent_event.clear()
+            try:
+                await asyncio.wait_for(self._sent_event.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    # --- Обработка запросов ---
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = dict(await request.post())
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        uploaded = sum(len(value.file.read()) for value in params.values() if hasattr(value, "file"))
+        if uploaded:
+            self.uploaded_bytes += uploaded
+            if self.upload_bandwidth:
+                await asyncio.sleep(uploaded / self.upload_bandwidth)
+
+        if method == "getUpdates":
+            return self._ok(await self._get_updates(params))
+        if method == "getMe":
+            return self._ok(BOT_USER)
+        if method in ("deleteWebhook", "setWebhook", "answerCallbackQuery", "close", "logOut"):
+            return self._ok(True)
+        if method == "getFile":
+            file_id = params.get("file_id", "")
+            return self._ok({"file_id": file_id, "file_unique_id": f"u{file_id}",
+                             "file_size": len(self.files.get(file_id, b"")), "file_path": file_id})
+
+        if method.startswith("send") or method.startswith("edit"):
+            if {value for value in params.values() if isinstance(value, str)} & self.invalid_file_ids:
+                return web.json_response({"ok": False, "error_code": 400,
+                                          "description": "Bad Request: wrong file identifier/HTTP URL specified"},
+                                         status=400)
+            if self.rate_limit_probability and self._rng.random() < self.rate_limit_probability:
+                self.rate_limited += 1
+                return web.json_response({
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                }, status=429)
+            self.sent.append((time.monotonic(), method, params))
+            self._sent_event.set()
+            return self._ok(self._message(method, params))
+
+        return self._ok(True)
+
+    async def _handle_file(self, request: web.Request) -> web.Response:
+        self.calls["file"] = self.calls.get("file", 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        data = self.files.get(request.match_info["path"])
+        if data is None:
+            return web.Response(status=404)
+        return web.Response(body=data)
+
+    async def _get_updates(self, params):
+        limit = int(params.get("limit", 100))
+        timeout = min(float(params.get("timeout", 0)), 1.0)
+        updates = []
+        try:
+            updates.append(await asyncio.wait_for(self.updates.get(), timeout) if timeout
+                           else self.updates.get_nowait())
+        except (asyncio.TimeoutError, asyncio.QueueEmpty):
+            return []
+        while len(updates) < limit and not self.updates.empty():
+            updates.append(self.updates.get_nowait())
+        return updates
+
+    def _message(self, method, params):
+        chat_id = int(params.get("chat_id", 0) or 0)
+        message = {
+            "message_id": int(params.get("message_id", 0) or 0) or next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+        }
+        if "text" in params:
+            message["text"] = params["text"]
+        if method == "sendVoice":
+            file_id = f"voice{message['message_id']}"
+            message["voice"] = {"file_id": file_id, "file_unique_id": f"u{file_id}", "duration": 1}
+        if method == "sendAudio":
+            file_id = f"audio{message['message_id']}"
+            message["audio"] = {"file_id": file_id, "file_unique_id": f"u{file_id}", "duration": 1}
+        if method == "sendPhoto":
+            file_id = f"photo{message['message_id']}"
+            message["photo"] = [{"file_id": file_id, "file_unique_id": f"u{file_id}", "width": 1, "height": 1}]
+        return message
+
+    @staticmethod
+    def _ok(result):
+        return web.json_response({"ok": True, "result": result})
@@ -0,0 +1,81 @@
+"""
+Сессия aiogram без сети: ответы Bot API собираются в памяти.
+
+Запрос проходит ту же подготовку параметров и тот же разбор ответа
+(check_response), что и в AiohttpSession, поэтому нагрузка на процессор
+близка к настоящей, но сокет не открывается и время сети не мешает замерам.
+"""
+import asyncio
+import hashlib
+import itertools
+import json
+import time
+from collections import Counter
+
+from aiogram.client.session.base import BaseSession
+
+from benchmarks.fake_api import BOT_USER
+
+
+class FakeSession(BaseSession):
+    """
+    latency - искусственная задержка каждого запроса, сек;
+    file_size - размер "скачиваемых" файлов, байт. Содержимое файла зависит
+    только от его пути, так что одинаковые file_id дают одинаковые байты.
+    """
+
+    def __init__(self, latency: float = 0.0, file_size: int = 64 * 1024):
+        super().__init__()
+        self.latency = latency
+        self.file_size = file_size
+        self.calls = Counter()
+        self._message_ids = itertools.count(1)
+
+    async def close(self):
+        pass
+
+    async def make_request(self, bot, method, timeout=None):
+        name = method.__api_method__
+        self.calls[name] += 1
+        files = {}
+        params = {}
+        for key, value in method.model_dump(warnings=False).items():
+            prepared = self.prepare_value(value, bot=bot, files=files)
+            if prepared is not None:
+                params[key] = prepared
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        content = json.dumps({"ok": True, "result": self._result(name, params)})
+        response = self.check_response(bot=bot, method=method, status_code=200, content=content)
+        return response.result
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        block = hashlib.sha256(url.encode()).digest()
+        data = (block * (self.file_size // len(block) + 1))[:self.file_size]
+        for offset in range(0, len(data), chunk_size):
+            yield data[offset:offset + chunk_size]
+
+    def _result(self, name: str, params: dict):
+        if name == "getMe":
+            return BOT_USER
+        if name == "getFile":
+            file_id = params.get("file_id", "")
+            return {"file_id": file_id, "file_unique_id": f"u{file_id}",
+                    "file_size": self.file_size, "file_path": f"photos/{file_id}.jpg"}
+        if name.startswith(("send", "edit", "copy", "forward")):
+            message_id = int(params.get("message_id") or 0) or next(self._message_ids)
+            message = {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": int(params.get("chat_id", 0) or 0), "type": "private"},
+                "from": BOT_USER,
+            }
+            if "text" in params:
+                message["text"] = params["text"]
+            if name in ("sendVoice", "sendAudio"):
+                kind = "voice" if name == "sendVoice" else "audio"
+                message[kind] = {"file_id": f"{kind}{message_id}", "file_unique_id": f"u{kind}{message_id}",
+                                 "duration": 1}
+            return message
+        return True
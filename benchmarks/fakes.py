@@ -0,0 +1,143 @@
+"""Локальные заглушки внешних сервисов для бенчмарков."""
+import time
+import threading
+from types import SimpleNamespace
+
+
+class FakeTranslation(SimpleNamespace):
+    """Результат перевода с теми же полями, что и у googletrans."""
+
+
+class FakeTranslator:
+    """
+    Синхронный переводчик с фиксированной задержкой и тем же API, что у googletrans
+    (только translate, одна строка за вызов). Не выходит в сеть:
+    каждый вызов стоит latency секунд плюс per_item секунд на каждый текст.
+    """
+
+    def __init__(self, latency: float = 0.05, src: str = 'ru', per_item: float = 0.0):
+        self.latency = latency
+        self.per_item = per_item
+        self.src = src
+        self.calls = 0
+        self.items = 0
+        self._lock = threading.Lock()
+
+    def _result(self, text, dest, src):
+        return FakeTranslation(text=f"[{dest}] {text}", src=self.src if src == 'auto' else src, dest=dest)
+
+    def translate(self, text, dest='en', src='auto'):
+        with self._lock:
+            self.calls += 1
+            self.items += 1
+        time.sleep(self.latency + self.per_item)
+        return self._result(text, dest, src)
+
+
+class FakeBatchTranslator(FakeTranslator):
+    """Переводчик с пакетным API (у googletrans его нет): пачка стоит один вызов."""
+
+    def translate_batch(self, texts, dest='en', src='auto'):
+        with self._lock:
+            self.calls += 1
+            self.items += len(texts)
+        time.sleep(self.latency + self.per_item * len(texts))
+        return [self._result(text, dest, src) for text in texts]
+
+
+class FakeMessage:
+    """
+    Минимальная замена aiogram Message: запоминает ответы бота.
+    В events пишутся (time.perf_counter(), 'answer' или 'edit') для каждого ответа и его правки.
+    """
+
+    def __init__(self, text: str, user_id: int = 1, chat_id: int = None):
+        self.text = text
+        self.from_user = SimpleNamespace(id=user_id, first_name="Bench", full_name="Bench User")
+        self.chat = SimpleNamespace(id=chat_id if chat_id is not None else user_id)
+        self.answers = []
+        self.events = []
+
+    async def answer(self, text, **kwargs):
+        self.answers.append(text)
+        self.events.append((time.perf_counter(), 'answer'))
+        return FakeSentMessage(self, text, len(self.answers))
+
+
+class FakeSentMessage:
+    """Отправленное ботом сообщение, которое можно отредактировать."""
+
+    def __init__(self, reply_to: FakeMessage, text: str, message_id: int):
+        self.reply_to = reply_to
+        self.text = text
+        self.message_id = message_id
+        self.chat = reply_to.chat
+
+    async def edit_text(self, text, **kwargs):
+        self.text = text
+        self.reply_to.answers[self.message_id - 1] = text
+        self.reply_to.events.append((time.perf_counter(), 'edit'))
+        return self
+
+
+def percentile(values, p: float) -> float:
+    """Перцентиль p (0..100) по отсортированной выборке без интерполяции."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+# --- Синтетические апдейты Telegram в виде JSON, как их присылает Bot API ---
+def make_user(user_id: int) -> dict:
+    return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "language_code": "ru"}
+
+
+def make_message_update(update_id: int, user_id: int, text: str, chat_id: int = None) -> dict:
+    chat_id = chat_id if chat_id is not None else user_id
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private", "first_name": f"User{user_id}"},
+        "from": make_user(user_id),
+        "text": text,
+    }
+    if text.startswith('/'):
+        command = text.split()[0]
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+    return {"update_id": update_id, "message": message}
+
+
+def make_photo_update(update_id: int, user_id: int, file_id: str, file_unique_id: str = None,
+                      size: int = 1024) -> dict:
+    file_unique_id = file_unique_id or f"u{file_id}"
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private", "first_name": f"User{user_id}"},
+            "from": make_user(user_id),
+            "photo": [{"file_id": file_id, "file_unique_id": file_unique_id,
+                       "width": 800, "height": 600, "file_size": size}],
+        },
+    }
+
+
+def make_callback_update(update_id: int, user_id: int, data: str, message_id: int = 1) -> dict:
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": make_user(user_id),
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private", "first_name": f"User{user_id}"},
+                "text": "Нажмите кнопку ниже, чтобы увидеть больше опций:",
+            },
+        },
+    }
@@ -0,0 +1,68 @@
+"""
+FSM-хранилище: полные сценарии /register через MemoryStorage и SQLiteStorage.
+
+Запуск: python -m benchmarks.fsm_bench
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+import benchmarks  # noqa: F401  (задает токен для bot.config)
+from bot.db import database
+from bot.db.fsm_storage import SQLiteStorage
+from bot.handlers.user_handlers import RegistrationStates
+
+USERS = 2000
+
+
+async def registration_flow(storage, user_id):
+    """Те же обращения к хранилищу, что делают обработчики регистрации."""
+    state = FSMContext(storage=storage, key=StorageKey(bot_id=1, chat_id=user_id, user_id=user_id))
+    await state.clear()
+    await state.set_state(RegistrationStates.waiting_for_name)
+    await state.get_state()
+    await state.update_data(name=f"Студент {user_id}")
+    await state.set_state(RegistrationStates.waiting_for_age)
+    await state.get_state()
+    await state.update_data(age=12)
+    await state.set_state(RegistrationStates.waiting_for_grade)
+    await state.get_state()
+    await state.update_data(grade="6А")
+    await state.get_data()
+    await state.clear()
+
+
+async def run(name, storage):
+    start = time.perf_counter()
+    await asyncio.gather(*(registration_flow(storage, user_id) for user_id in range(USERS)))
+    await storage.close()
+    total = time.perf_counter() - start
+    extra = f"  записей в БД={storage.writes}, транзакций={storage.flushes}" if isinstance(storage, SQLiteStorage) else ""
+    print(f"{name:<14} {USERS / total:8.0f} регистраций/с{extra}")
+
+
+async def main():
+    await run("MemoryStorage", MemoryStorage())
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, 'fsm.db')
+        await database.init_db()
+        await run("SQLiteStorage", SQLiteStorage(database.get_pool(), ttl=3600))
+
+        # Незавершенный диалог переживает перезапуск
+        storage = SQLiteStorage(database.get_pool(), ttl=3600)
+        key = StorageKey(bot_id=1, chat_id=42, user_id=42)
+        await storage.set_state(key, RegistrationStates.waiting_for_age)
+        await storage.update_data(key, {'name': "Иван"})
+        await storage.close()
+        restarted = SQLiteStorage(database.get_pool(), ttl=3600)
+        print("после рестарта:", await restarted.get_state(key), await restarted.get_data(key))
+        await database.close_db()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,211 @@
+"""
+Журнал апдейтов (bot/db/journal.py).
+
+1. Отсев повторов: проверка update_id по кольцу в памяти против запроса к таблице
+   update_journal - на кольце из --ring номеров.
+2. Прием: сколько апдейтов в секунду журнал записывает, когда пачка getUpdates
+   принимается целиком (group commit), и когда каждый апдейт пишется отдельно.
+3. Перезапуск: --users пользователей проходят регистрацию; сразу после обработки
+   класса процесс бота падает - отметки об обработке и изменения FSM не записаны,
+   студенты уже в базе. После запуска журнал повторяет необработанные апдейты,
+   Telegram присылает неподтвержденные апдейты еще раз - студентов в базе
+   должно быть ровно --users.
+
+Запуск: python -m benchmarks.journal_bench [--ring 10000] [--updates 20000] [--users 300]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from aiogram.types import Update
+
+import benchmarks  # noqa: F401  (задает токен для bot.config)
+from benchmarks.fake_session import FakeSession
+from benchmarks.fakes import make_message_update
+from bot import main as bot_main
+from bot.db import database
+from bot.db.journal import UpdateJournal
+from bot.polling import DispatcherFeed
+from bot.services.outbound import SendScheduler
+
+LOOKUPS = 200_000
+BATCH = 100   # Апдейтов в одном ответе getUpdates
+
+
+async def fresh_db(path: str):
+    await database.close_db()
+    if os.path.exists(path):
+        os.remove(path)
+    database.DB_PATH = path
+    await database.init_db()
+
+
+def payload(update_id: int) -> str:
+    return json.dumps(make_message_update(update_id, 1000 + update_id % 300, f"Текст {update_id}"), ensure_ascii=False)
+
+
+async def bench_lookup(db_path: str, ring: int):
+    await fresh_db(db_path)
+    journal = UpdateJournal(database.get_pool(), ring_size=ring)
+    await journal.start()
+    await asyncio.gather(*(journal.accept(update_id, "{}") for update_id in range(1, ring * 2 + 1)))
+    await journal.prune()
+    rng = random.Random(1)
+    ids = [rng.randint(1, ring * 3) for _ in range(LOOKUPS)]
+
+    start = time.perf_counter()
+    duplicates = sum(journal.seen(update_id) for update_id in ids)
+    in_memory = (time.perf_counter() - start) / LOOKUPS
+
+    queries = ids[:LOOKUPS // 100]
+    start = time.perf_counter()
+    async with database.get_pool().acquire() as db:
+        for update_id in queries:
+            async with db.execute('SELECT 1 FROM update_journal WHERE update_id = ?', (update_id,)) as cursor:
+                await cursor.fetchone()
+    in_db = (time.perf_counter() - start) / len(queries)
+    await journal.close()
+    print(f"  кольцо {ring}: {in_memory * 1e9:6.0f} нс на проверку (повторов {duplicates / LOOKUPS:.0%}); "
+          f"запрос к таблице {in_db * 1e6:6.1f} мкс")
+
+
+async def bench_accept(db_path: str, updates: int):
+    for grouped in (True, False):
+        await fresh_db(db_path)
+        journal = UpdateJournal(database.get_pool())
+        await journal.start()
+        payloads = [(update_id, payload(update_id)) for update_id in range(1, updates + 1)]
+        start = time.perf_counter()
+        if grouped:
+            for i in range(0, updates, BATCH):
+                await asyncio.gather(*(journal.accept(*item) for item in payloads[i:i + BATCH]))
+        else:
+            for item in payloads:
+                await journal.accept(*item)
+        elapsed = time.perf_counter() - start
+        await journal.close()
+        name = f"пачками по {BATCH}" if grouped else "по одному"
+        print(f"  {name:<14} {updates / elapsed:8.0f} апдейтов/с, {elapsed / updates * 1e6:6.1f} мкс на апдейт")
+
+
+async def start_bot(flush_delay: float):
+    """Бот, как в run_bot, но с сессией без сети; flush_delay - задержка записи FSM и отметок журнала."""
+    await database.init_db()
+    # Лимиты Telegram на отправку не ждем: меряем прием и повтор, а не планировщик
+    scheduler = SendScheduler(global_rate=1e9, chat_rate=1e9, group_rate=1e9, chat_burst=10 ** 9)
+    bot = bot_main.create_bot(session=FakeSession(), scheduler=scheduler)
+    storage = bot_main.create_storage()
+    storage.flush_delay = flush_delay
+    storage.start()
+    journal = bot_main.create_journal()
+    journal.flush_delay = flush_delay
+    await journal.start()
+    dp = bot_main.create_dispatcher(storage, journal)
+    return bot, storage, journal, dp
+
+
+async def deliver(bot, dp, journal, feed, updates: list) -> int:
+    """Принимает апдейты, как полинг: пачка записывается в журнал, новые передаются диспетчеру."""
+    parsed = [Update.model_validate(update, context={"bot": bot}) for update in updates]
+    accepted = await asyncio.gather(*(journal.accept(update['update_id'], json.dumps(update, ensure_ascii=False))
+                                      for update in updates))
+    for update, is_new in zip(parsed, accepted):
+        if is_new:
+            await feed.put(update)
+    await feed.close()
+    return sum(accepted)
+
+
+async def count_students() -> int:
+    async with database.get_pool().acquire() as db:
+        async with db.execute('SELECT COUNT(*) FROM students') as cursor:
+            return (await cursor.fetchone())[0]
+
+
+def registration_updates(users: int):
+    """Шаги регистрации каждого пользователя: [/register], [имя], [возраст] и отдельно [класс]."""
+    update_ids = iter(range(1, 10 ** 9))
+    steps = [[make_message_update(next(update_ids), user_id, text(user_id)) for user_id in range(1, users + 1)]
+             for text in (lambda _: "/register", lambda user_id: f"Студент {user_id}", lambda _: "12")]
+    grades = [make_message_update(next(update_ids), user_id, "7А") for user_id in range(1, users + 1)]
+    return steps, grades
+
+
+def crash_during_registration(db_path: str, users: int):
+    """
+    Процесс бота, который падает сразу после обработки класса: студенты уже в базе,
+    а состояние FSM и отметки журнала отложены и не записаны.
+    """
+    database.DB_PATH = db_path
+    steps, grades = registration_updates(users)
+
+    async def run():
+        bot, storage, journal, dp = await start_bot(flush_delay=0.05)
+        for step in steps:
+            await deliver(bot, dp, journal, DispatcherFeed(bot, dp), step)
+        await storage.flush()
+        await journal.flush()
+        storage.flush_delay = journal.flush_delay = 3600
+        await deliver(bot, dp, journal, DispatcherFeed(bot, dp), grades)
+        os._exit(0)
+
+    asyncio.run(run())
+
+
+async def bench_restart(db_path: str, users: int):
+    await fresh_db(db_path)
+    await database.close_db()
+    process = multiprocessing.get_context('spawn').Process(target=crash_during_registration, args=(db_path, users))
+    process.start()
+    await asyncio.to_thread(process.join)
+
+    database.DB_PATH = db_path
+    bot, storage, journal, dp = await start_bot(flush_delay=0.05)
+    before = await count_students()
+    # Состояние "ввод класса" не сброшено: повтор снова дойдет до обработчика регистрации
+    waiting = sum((await storage.state_counts()).values())
+    feed = DispatcherFeed(bot, dp)
+    start = time.perf_counter()
+    replayed = await journal.replay(bot, feed.put)
+    await feed.close()
+    replay_time = time.perf_counter() - start
+    # Telegram не получил подтверждения и присылает последнюю пачку еще раз
+    _, grades = registration_updates(users)
+    redelivered = await deliver(bot, dp, journal, DispatcherFeed(bot, dp), grades)
+    after = await count_students()
+    await storage.close()
+    await journal.flush()
+    stats = await journal.stats()
+    await journal.close()
+    await database.close_db()
+    await bot.session.close()
+
+    print(f"  до перезапуска студентов {before}, ждут ввода класса {waiting}; повторено из журнала {replayed} апдейтов за {replay_time:.2f} с; "
+          f"из {len(grades)} присланных повторно принято {redelivered}; студентов после {after}; "
+          f"не обработано в журнале {stats['pending']}")
+    assert before == after == users, "регистрация задвоилась или потерялась"
+    assert waiting == replayed == users and redelivered == 0 and stats['pending'] == 0
+
+
+async def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'journal.db')
+        print("Проверка повтора")
+        await bench_lookup(db_path, args.ring)
+        print(f"Прием {args.updates} апдейтов")
+        await bench_accept(db_path, args.updates)
+        print(f"Перезапуск посреди регистрации {args.users} пользователей")
+        await bench_restart(os.path.join(tmp, 'restart.db'), args.users)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Журнал апдейтов: отсев повторов, прием, перезапуск")
+    parser.add_argument('--ring', type=int, default=10_000)
+    parser.add_argument('--updates', type=int, default=20_000)
+    parser.add_argument('--users', type=int, default=300)
+    asyncio.run(main(parser.parse_args()))
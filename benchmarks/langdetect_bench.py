@@ -0,0 +1,157 @@
+"""
+Локальное определение языка перед переводом.
+
+1. Точность detect_language на размеченных примерах и цена одного вызова.
+2. Поток сообщений, похожий на реальный (русский текст, английский, эмодзи,
+   числа, ссылки, другие языки), через TranslationService с local_detect и без:
+   доля запросов, которые не дошли до переводчика, число вызовов переводчика
+   и задержка ответа. Кэш выключен, чтобы сравнивались сами вызовы.
+
+Запуск: python -m benchmarks.langdetect_bench [--messages 2000] [--latency 0.05]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import benchmarks  # noqa: F401  (задает токен для bot.config)
+from benchmarks.fakes import FakeTranslator, percentile
+from bot.services.langdetect import detect_language
+from bot.services.translation import TranslationService
+
+# (текст, ожидаемый язык; None - язык не определяется, '' - переводить нечего)
+SAMPLES = [
+    ("Привет, как дела?", 'ru'),
+    ("Сегодня контрольная по математике, не забудьте тетради", 'ru'),
+    ("Привіт, як справи? Що нового?", 'uk'),
+    ("Hello, how are you?", 'en'),
+    ("Thanks, see you tomorrow at the school", 'en'),
+    ("ok", None),
+    ("Can you translate this for me please", 'en'),
+    ("Wie geht es dir heute?", 'de'),
+    ("Bonjour, je ne sais pas", 'fr'),
+    ("¿Dónde está la biblioteca?", 'es'),
+    ("Ciao, come stai?", 'it'),
+    ("Olá, tudo bem? Obrigado", 'pt'),
+    ("Dzień dobry, jak się masz?", 'pl'),
+    ("Merhaba, nasılsın?", 'tr'),
+    ("こんにちは、元気ですか", 'ja'),
+    ("你好，你今天怎么样", 'zh-cn'),
+    ("안녕하세요", 'ko'),
+    ("مرحبا كيف حالك", 'ar'),
+    ("Γεια σου, τι κάνεις;", 'el'),
+    ("😀👍🔥", ''),
+    ("12345", ''),
+    ("+7 (999) 123-45-67", ''),
+    ("https://example.com/lesson?id=5", ''),
+    ("@classmate", ''),
+    ("Moscow", None),
+    ("Minä olen kotona", None),
+    ("Saya di rumah", None),
+    ("Mi chiamo Anna", None),
+    ("Naïve idea", None),
+    ("a to je", None),
+    ("Здравей, как си? Какво правиш днес?", 'bg'),
+    ("Обичам морето", None),
+    ("حال شما خوب است؟", 'fa'),
+    ("من خوبم", None),
+    ("Hi Вася, как дела?", 'ru'),
+]
+
+# Доли сообщений в потоке: в основном русский текст, как у пользователей бота
+STREAM = [('ru', 0.55), ('en', 0.15), ('emoji', 0.1), ('digits', 0.05), ('url', 0.05), ('other', 0.1)]
+STREAM_TEXTS = {
+    'ru': ["Привет, как дела номер {}?", "Завтра урок {} начнется позже", "Сколько стоит учебник {}?"],
+    'en': ["Hello, this is message {}", "Thanks for the homework {}", "What time is the lesson {}?"],
+    'emoji': ["👍" * 3, "😂😂", "🔥🎉"],
+    'digits': ["{}", "{}.{}", "+7 999 {}"],
+    'url': ["https://example.com/{}", "www.school.ru/news/{}", "youtube.com/watch?v={}"],
+    'other': ["Wie geht es dir {}?", "Bonjour, je suis {}", "Hola, ¿qué tal {}?"],
+}
+
+
+def accuracy():
+    correct = 0
+    for text, expected in SAMPLES:
+        detection = detect_language(text)
+        got = '' if not detection.letters else detection.lang
+        ok = got == expected
+        correct += ok
+        if not ok:
+            print(f"  ошибка: {text!r}: ожидалось {expected!r}, получено {got!r}")
+    print(f"Точность: {correct}/{len(SAMPLES)}")
+
+    texts = [text for text, _ in SAMPLES] + ["Привет, как дела? Сегодня хорошая погода, пойдем гулять." * 10]
+    for text in (texts[0], texts[3], texts[-1]):
+        calls = 20_000
+        start = time.perf_counter()
+        for _ in range(calls):
+            detect_language(text)
+        print(f"  {len(text):5} символов: {(time.perf_counter() - start) / calls * 1e6:6.1f} мкс на вызов")
+
+
+def make_stream(messages: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    kinds, weights = zip(*STREAM)
+    texts = []
+    for i in range(messages):
+        template = rng.choice(STREAM_TEXTS[rng.choices(kinds, weights)[0]])
+        texts.append(template.format(i, i % 100))
+    return texts
+
+
+async def run_stream(texts: list, local_detect: bool, latency: float, concurrency: int) -> dict:
+    translator = FakeTranslator(latency=latency)
+    service = TranslationService(translator, max_workers=concurrency, max_queue=len(texts), batch_window=0,
+                                 local_detect=local_detect)
+    latencies = []
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(text):
+        async with slots:
+            start = time.perf_counter()
+            await service.translate(text, dest='en')
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(text) for text in texts))
+    elapsed = time.perf_counter() - start
+    stats = service.stats()
+    await service.shutdown()
+    return {
+        'elapsed': elapsed,
+        'calls': translator.calls,
+        'mean': sum(latencies) / len(latencies),
+        'p50': percentile(latencies, 50),
+        'p99': percentile(latencies, 99),
+        'stats': stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальное определение языка перед вызовом переводчика")
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.05, help="задержка переводчика, сек")
+    parser.add_argument('--concurrency', type=int, default=8, help="одновременных переводов (TRANSLATE_MAX_WORKERS)")
+    args = parser.parse_args()
+
+    accuracy()
+
+    texts = make_stream(args.messages)
+    print(f"\nПоток: {args.messages} сообщений, задержка переводчика {args.latency * 1000:.0f} мс, "
+          f"одновременно {args.concurrency}")
+    for local_detect in (False, True):
+        r = asyncio.run(run_stream(texts, local_detect, args.latency, args.concurrency))
+        name = "с определением" if local_detect else "без определения"
+        print(f"  {name:<16} вызовов переводчика {r['calls']:5}, прогон {r['elapsed']:6.2f} с, "
+              f"задержка средняя {r['mean'] * 1000:6.1f} мс, p50 {r['p50'] * 1000:6.1f} мс, "
+              f"p99 {r['p99'] * 1000:6.1f} мс")
+        if local_detect:
+            stats = r['stats']
+            print(f"  пропущено: {stats['avoided_share']:.1%} (уже английский {stats['same_language']}, "
+                  f"без букв {stats['nothing_to_translate']}), с подсказкой языка {stats['hinted']}, "
+                  f"сэкономлено ~{stats['saved_seconds']:.1f} с ожидания переводчика")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+"""
+Нагрузочный тест бота без сети.
+
+Диспетчер собирается так же, как в bot/main.py (create_bot, create_storage,
+create_dispatcher: user_router, FSM в SQLite, метрики, ограничение частоты),
+но бот работает через FakeSession, а переводчик заменен заглушкой. Синтетические
+апдейты подаются через dp.feed_update: каждый пользователь присылает свои апдейты
+по порядку, пользователи работают параллельно (не больше --concurrency сразу).
+
+Каждый сценарий запускается в отдельном процессе, чтобы пиковый RSS относился
+именно к нему. Для каждого сценария сообщаются апдейты в секунду, перцентили
+задержки feed_update и пиковый RSS. Результаты сохраняются в JSON; с --compare
+выводится сравнение с прошлым запуском.
+
+Запуск: python -m benchmarks.load_test [--users 2000] [--output results.json] [--compare old.json]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import benchmarks  # noqa: F401  (задает токен для bot.config)
+from benchmarks.fakes import (
+    FakeTranslator,
+    percentile,
+    make_message_update,
+    make_photo_update,
+    make_callback_update,
+)
+
+SCENARIOS = ('start', 'register', 'callbacks', 'text', 'photo', 'mixed')
+TRANSLATOR_LATENCY = 0.02
+PHOTO_SIZE = 64 * 1024
+
+
+# --- Сценарии: для каждого пользователя - список апдейтов по порядку ---
+def scenario_sessions(name: str, users: int) -> list:
+    update_ids = iter(range(1, 10 ** 9))
+
+    def message(user_id, text):
+        return make_message_update(next(update_ids), user_id, text)
+
+    def session(user_id, kind):
+        if kind == 'start':
+            return [message(user_id, "/start")]
+        if kind == 'register':
+            return [message(user_id, "/register"), message(user_id, f"Студент {user_id}"),
+                    message(user_id, str(7 + user_id % 10)), message(user_id, f"{1 + user_id % 11}А")]
+        if kind == 'callbacks':
+            return [make_callback_update(next(update_ids), user_id, "show_more_options"),
+                    make_callback_update(next(update_ids), user_id, "select_option_1")]
+        if kind == 'text':
+            # Часть текстов повторяется, как в жизни: работает кэш переводов
+            return [message(user_id, f"Как дела, номер {user_id % (users // 4 + 1)}?")]
+        if kind == 'photo':
+            # Каждое третье фото - пересланное, уже виденное ботом
+            file_id = f"photo{user_id % (users * 2 // 3 + 1)}"
+            return [make_photo_update(next(update_ids), user_id, file_id, size=PHOTO_SIZE)]
+        raise ValueError(kind)
+
+    if name == 'mixed':
+        kinds = ('start', 'register', 'callbacks', 'text', 'text', 'photo')
+        return [session(user_id, kinds[user_id % len(kinds)]) for user_id in range(1, users + 1)]
+    return [session(user_id, name) for user_id in range(1, users + 1)]
+
+
+async def run_scenario(name: str, users: int, concurrency: int, telegram_limits: bool) -> dict:
+    from aiogram.types import Update
+
+    from bot.db import database
+    from bot.handlers import user_handlers
+    from bot.services.outbound import SendScheduler
+    from bot.services.photos import photo_ingestor
+    from bot.services.translation import TranslationService, TranslationCache
+    from bot.middlewares.throttling import throttling_middleware
+    from benchmarks.fake_session import FakeSession
+    from bot import main as bot_main
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, 'load.db')
+        await database.init_db()
+        photo_ingestor.root = os.path.join(tmp, 'img')
+        photo_ingestor.processor = None   # Поддельные файлы - не изображения; обработку меряет photo_processing_bench
+        await photo_ingestor.start()
+        translator = FakeTranslator(latency=TRANSLATOR_LATENCY)
+        user_handlers.translation_service = TranslationService(translator, cache=TranslationCache(),
+                                                               max_queue=users)
+
+        # Без --telegram-limits планировщик не ждет: меряем сам бот, а не лимиты Telegram
+        scheduler = SendScheduler() if telegram_limits else SendScheduler(
+            global_rate=1e9, chat_rate=1e9, group_rate=1e9, chat_burst=10 ** 9)
+        session = FakeSession(file_size=PHOTO_SIZE)
+        bot = bot_main.create_bot(session=session, scheduler=scheduler)
+        storage = bot_main.create_storage()
+        storage.start()
+        dp = bot_main.create_dispatcher(storage)
+
+        sessions = [[Update.model_validate(update, context={"bot": bot}) for update in updates]
+                    for updates in scenario_sessions(name, users)]
+        total = sum(len(updates) for updates in sessions)
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        latencies = []
+        slots = asyncio.Semaphore(concurrency)
+
+        async def run_user(updates):
+            async with slots:
+                for update in updates:
+                    start = time.perf_counter()
+                    await dp.feed_update(bot, update)
+                    latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(run_user(updates) for updates in sessions))
+        handled = time.perf_counter() - start
+        await photo_ingestor.close()   # Дожидаемся фоновых скачиваний
+        await storage.close()
+        elapsed = time.perf_counter() - start
+
+        await user_handlers.translation_service.shutdown()
+        await database.close_db()
+        await bot.session.close()
+
+    return {
+        'scenario': name,
+        'updates': total,
+        'users': users,
+        'concurrency': concurrency,
+        'elapsed_s': round(elapsed, 3),
+        'updates_per_s': round(total / handled, 1),
+        'latency_ms': {f'p{p}': round(percentile(latencies, p) * 1000, 3) for p in (50, 90, 99)}
+        | {'max': round(max(latencies) * 1000, 3)},
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'setup_rss_mb': round(rss_before / 1024, 1),
+        'api_calls': dict(session.calls),
+        'translator_calls': translator.calls,
+        'throttling': throttling_middleware.stats(),
+        'photos': photo_ingestor.stats(),
+    }
+
+
+def _child(name, users, concurrency, telegram_limits, queue):
+    import logging
+    logging.disable(logging.INFO)   # Логи обработчиков искажают замеры
+    try:
+        queue.put(asyncio.run(run_scenario(name, users, concurrency, telegram_limits)))
+    except BaseException as e:
+        queue.put({'scenario': name, 'error': repr(e)})
+        raise
+
+
+def run_in_subprocess(name, users, concurrency, telegram_limits) -> dict:
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_child, args=(name, users, concurrency, telegram_limits, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def print_results(results: list, baseline: dict = None):
+    print(f"{'сценарий':<10} {'апдейтов':>8} {'апд/с':>8} {'p50 ms':>8} {'p99 ms':>8} {'RSS MB':>7}")
+    for result in results:
+        if 'error' in result:
+            print(f"{result['scenario']:<10} ошибка: {result['error']}")
+            continue
+        line = (f"{result['scenario']:<10} {result['updates']:>8} {result['updates_per_s']:>8.0f} "
+                f"{result['latency_ms']['p50']:>8.2f} {result['latency_ms']['p99']:>8.2f} {result['peak_rss_mb']:>7.1f}")
+        old = (baseline or {}).get(result['scenario'])
+        if old and 'error' not in old:
+            line += (f"   апд/с {result['updates_per_s'] / old['updates_per_s'] - 1:+.1%}, "
+                     f"p99 {result['latency_ms']['p99'] / old['latency_ms']['p99'] - 1:+.1%}, "
+                     f"RSS {result['peak_rss_mb'] - old['peak_rss_mb']:+.1f} MB")
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест бота на синтетических апдейтах")
+    parser.add_argument('--users', type=int, default=2000, help="пользователей в каждом сценарии")
+    parser.add_argument('--concurrency', type=int, default=100, help="одновременно обрабатываемых пользователей")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help="сценарии через запятую")
+    parser.add_argument('--telegram-limits', action='store_true', help="соблюдать лимиты Telegram на отправку")
+    parser.add_argument('--output', default='load_test_results.json', help="куда сохранить результаты")
+    parser.add_argument('--compare', help="JSON прошлого запуска для сравнения")
+    args = parser.parse_args()
+
+    results = []
+    for name in args.scenarios.split(','):
+        if name not in SCENARIOS:
+            parser.error(f"неизвестный сценарий {name}; доступны: {', '.join(SCENARIOS)}")
+        results.append(run_in_subprocess(name, args.users, args.concurrency, args.telegram_limits))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = {result['scenario']: result for result in json.load(f)['results']}
+    print_results(results, baseline)
+
+    report = {
+        'revision': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'params': {'users': args.users, 'concurrency': args.concurrency, 'telegram_limits': args.telegram_limits,
+                   'translator_latency_s': TRANSLATOR_LATENCY, 'photo_size': PHOTO_SIZE},
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Результаты сохранены в {args.output}")
+
+
+if __name__ == '__main__':
+    main()
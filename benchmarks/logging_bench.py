@@ -0,0 +1,155 @@
+"""
+Сколько времени обработчика уходит на логирование: прежняя настройка
+(basicConfig с FileHandler, f-строки с полными текстами) против конвейера
+из bot/log.py (QueueHandler, запись в фоновом потоке, JSON, выборка, обрезка).
+
+1. Обработчики-имитации: --handlers корутин параллельно, каждая пишет в лог
+   те же записи, что handle_text_translate (текст в --text-size символов).
+   Сообщается время, которое обработчик провел в логировании (p50/p99),
+   и длительность всего прогона.
+   --slow-disk добавляет задержку к каждой записи в файл - так ведет себя
+   занятый диск или сетевая ФС; при синхронной записи эту задержку ждет
+   цикл событий.
+2. Сценарий text нагрузочного теста (dp.feed_update через user_router) при
+   каждой из настроек, в отдельных процессах.
+
+Запуск: python -m benchmarks.logging_bench [--handlers 5000] [--slow-disk 0.2]
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+
+import benchmarks  # noqa: F401  (задает токен для bot.config)
+from benchmarks.fakes import percentile
+
+OLD_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+
+
+class SlowFile:
+    """Файл, каждая запись в который занимает delay миллисекунд."""
+
+    def __init__(self, stream, delay_ms: float):
+        self.stream = stream
+        self.delay = delay_ms / 1000
+
+    def write(self, text):
+        if self.delay:
+            time.sleep(self.delay)
+        return self.stream.write(text)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def configure(mode: str, log_file: str, slow_disk: float):
+    """Настраивает логирование процесса; возвращает функцию завершения."""
+    if mode == 'sync':
+        logging.basicConfig(level=logging.INFO, format=OLD_FORMAT, filename=log_file, force=True)
+        handler = logging.getLogger().handlers[0]
+        handler.stream = SlowFile(handler.stream, slow_disk)
+        return logging.shutdown
+
+    from bot.log import setup_logging
+    pipeline = setup_logging(log_file=log_file, console=False)
+    for handler in pipeline.listener.handlers:
+        handler.stream = SlowFile(handler.stream, slow_disk)
+    return pipeline.stop
+
+
+# --- 1. Обработчики-имитации ---
+async def old_handler(user_id: int, text: str) -> float:
+    """Возвращает время, которое обработчик провел в вызовах логирования."""
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    logging.info(f"Пользователь {user_id} отправил текст.")
+    logging.info(f"Текст '{text}' (ru) переведен на английский: '{text.upper()}' для пользователя {user_id}")
+    return time.perf_counter() - start
+
+
+async def new_handler(user_id: int, text: str) -> float:
+    logger = logging.getLogger('bot.handlers.bench')
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    logger.info("Пользователь %s отправил текст.", user_id)
+    logger.info("Перевод для пользователя %s: %s -> en, %s символов", user_id, 'ru', len(text))
+    return time.perf_counter() - start
+
+
+async def run_handlers(mode: str, handlers: int, text_size: int) -> dict:
+    handler = old_handler if mode == 'sync' else new_handler
+    text = ("Привет, как дела? " * (text_size // 18 + 1))[:text_size]
+    latencies = []
+
+    async def timed(user_id):
+        latencies.append(await handler(user_id, text))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(timed(user_id) for user_id in range(handlers)))
+    elapsed = time.perf_counter() - start
+    return {'elapsed': elapsed, 'p50': percentile(latencies, 50), 'p99': percentile(latencies, 99)}
+
+
+def _handlers_child(mode, handlers, text_size, slow_disk, results):
+    with tempfile.TemporaryDirectory() as tmp:
+        log_file = os.path.join(tmp, 'bot.log')
+        finish = configure(mode, log_file, slow_disk)
+        result = asyncio.run(run_handlers(mode, handlers, text_size))
+        start = time.perf_counter()
+        finish()   # Для очереди - дописать накопленное
+        result['flush'] = time.perf_counter() - start
+        result['log_bytes'] = sum(os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp))
+    results.put(result)
+
+
+# --- 2. Нагрузочный сценарий text ---
+def _scenario_child(mode, users, concurrency, slow_disk, results):
+    from benchmarks.load_test import run_scenario
+    with tempfile.TemporaryDirectory() as tmp:
+        finish = configure(mode, os.path.join(tmp, 'bot.log'), slow_disk)
+        result = asyncio.run(run_scenario('text', users, concurrency, telegram_limits=False))
+        finish()
+    results.put(result)
+
+
+def in_subprocess(target, *args) -> dict:
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=target, args=(*args, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Задержка обработчиков при синхронном и асинхронном логировании")
+    parser.add_argument('--handlers', type=int, default=5000, help="обработчиков-имитаций")
+    parser.add_argument('--text-size', type=int, default=2000, help="длина текста сообщения, символов")
+    parser.add_argument('--slow-disk', type=float, default=0.0, help="задержка одной записи в файл, мс")
+    parser.add_argument('--users', type=int, default=1000, help="пользователей в сценарии text")
+    parser.add_argument('--concurrency', type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"Обработчики-имитации: {args.handlers}, текст {args.text_size} символов, "
+          f"задержка записи {args.slow_disk} мс")
+    for mode in ('sync', 'queue'):
+        r = in_subprocess(_handlers_child, mode, args.handlers, args.text_size, args.slow_disk)
+        print(f"  {mode:<6} прогон {r['elapsed'] * 1000:8.1f} мс, "
+              f"логирование в обработчике p50 {r['p50'] * 1e6:7.1f} мкс, "
+              f"p99 {r['p99'] * 1e6:7.1f} мкс; дозапись при остановке {r['flush'] * 1000:.1f} мс, "
+              f"лог {r['log_bytes'] / 1024:.0f} КБ")
+
+    print(f"Сценарий text: {args.users} пользователей, одновременно {args.concurrency}")
+    for mode in ('sync', 'queue'):
+        r = in_subprocess(_scenario_child, mode, args.users, args.concurrency, args.slow_disk)
+        latency = r['latency_ms']
+        print(f"  {mode:<6} {r['updates_per_s']:8.0f} апд/с, feed_update p50 {latency['p50']:.2f} мс, "
+              f"p99 {latency['p99']:.2f} мс")
+
+
+if __name__ == '__main__':
+    main()
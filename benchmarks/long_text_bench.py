@@ -0,0 +1,131 @@
+"""
+Перевод длинных текстов: один вызов переводчика на весь текст против перевода
+по фрагментам (TranslationService.translate_chunks и _send_long_translation).
+
+Задержка переводчика растет с длиной текста (--latency + --per-char на символ),
+часть вызовов медленнее в --slow-factor раз (--slow-rate), часть падает
+(--fail-rate). Для каждого пути сообщаются время до первого ответа пользователю
+(TTFB), время до полного перевода и доля текстов, оставшихся без перевода.
+
+Запуск: python -m benchmarks.long_text_bench [--texts 50] [--chars 4000]
+"""
+import argparse
+import asyncio
+import random
+import threading
+import time
+
+import benchmarks  # noqa: F401  (задает токен для bot.config)
+from benchmarks.fakes import FakeTranslator, FakeMessage, percentile
+from bot.handlers import user_handlers
+from bot.services.translation import TranslationService
+
+SENTENCES = [
+    "Сегодня в школе прошло собрание родителей и учителей.",
+    "Обсуждали расписание экзаменов и подготовку к олимпиадам!",
+    "Директор рассказал о ремонте спортивного зала, который закончится к осени.",
+    "Вопросы можно задать классному руководителю?",
+    "Следующая встреча состоится в последний четверг месяца.",
+]
+
+
+class SizedTranslator(FakeTranslator):
+    """Переводчик, время ответа которого зависит от длины текста; иногда тормозит или падает."""
+
+    def __init__(self, latency, per_char, slow_rate, slow_factor, fail_rate, seed=1):
+        super().__init__(latency=latency)
+        self.per_char = per_char
+        self.slow_rate = slow_rate
+        self.slow_factor = slow_factor
+        self.fail_rate = fail_rate
+        self.failures = 0
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+
+    def translate(self, text, dest='en', src='auto'):
+        with self._random_lock:
+            slow = self._random.random() < self.slow_rate
+            fail = self._random.random() < self.fail_rate
+        with self._lock:
+            self.calls += 1
+        delay = (self.latency + self.per_char * len(text)) * (self.slow_factor if slow else 1)
+        time.sleep(delay)
+        if fail:
+            with self._lock:
+                self.failures += 1
+            raise RuntimeError("переводчик вернул ошибку")
+        return self._result(text, dest, src)
+
+
+def make_text(chars: int, seed: int) -> str:
+    rng = random.Random(seed)
+    parts = []
+    while sum(map(len, parts)) < chars:
+        parts.append(rng.choice(SENTENCES) + ("\n\n" if rng.random() < 0.15 else " "))
+    return ''.join(parts)[:chars]
+
+
+async def single_call(service, text) -> dict:
+    message = FakeMessage(text)
+    start = time.perf_counter()
+    try:
+        translation = await service.translate(text, dest='en')
+        await message.answer(f"<b>Перевод на английский:</b>\n{translation.text}")
+    except Exception:
+        return {'ttfb': None, 'total': time.perf_counter() - start, 'failed': True, 'messages': 0}
+    elapsed = time.perf_counter() - start
+    return {'ttfb': elapsed, 'total': elapsed, 'failed': False, 'messages': 1}
+
+
+async def chunked(service, text) -> dict:
+    message = FakeMessage(text)
+    start = time.perf_counter()
+    await user_handlers._send_long_translation(message, text, reply_markup=None)
+    total = time.perf_counter() - start
+    return {'ttfb': message.events[0][0] - start, 'total': total,
+            'failed': any("не удалось перевести" in answer for answer in message.answers),
+            'messages': len(message.answers)}
+
+
+async def run(path, args) -> tuple:
+    translator = SizedTranslator(args.latency, args.per_char, args.slow_rate, args.slow_factor, args.fail_rate)
+    service = TranslationService(translator, max_workers=8, timeout=30, max_queue=1000, batch_window=0,
+                                 local_detect=True)
+    user_handlers.translation_service = service
+    results = []
+    for i in range(args.texts):
+        results.append(await path(service, make_text(args.chars, seed=i)))
+    await service.shutdown()
+    return results, translator
+
+
+def report(name, results, translator):
+    ttfb = [r['ttfb'] for r in results if r['ttfb'] is not None]
+    total = [r['total'] for r in results]
+    failed = sum(r['failed'] for r in results)
+    print(f"{name:<12} TTFB p50 {percentile(ttfb, 50) * 1000:7.0f} мс, p99 {percentile(ttfb, 99) * 1000:7.0f} мс; "
+          f"полностью p50 {percentile(total, 50) * 1000:7.0f} мс, p99 {percentile(total, 99) * 1000:7.0f} мс; "
+          f"без полного перевода {failed}/{len(results)}; вызовов {translator.calls}, "
+          f"сообщений в среднем {sum(r['messages'] for r in results) / len(results):.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Перевод длинных текстов целиком и по фрагментам")
+    parser.add_argument('--texts', type=int, default=50)
+    parser.add_argument('--chars', type=int, default=4000, help="длина текста")
+    parser.add_argument('--latency', type=float, default=0.1, help="базовая задержка вызова, сек")
+    parser.add_argument('--per-char', type=float, default=0.0001, help="добавка к задержке на символ, сек")
+    parser.add_argument('--slow-rate', type=float, default=0.1, help="доля медленных вызовов")
+    parser.add_argument('--slow-factor', type=float, default=5)
+    parser.add_argument('--fail-rate', type=float, default=0.05, help="доля вызовов с ошибкой")
+    args = parser.parse_args()
+
+    print(f"{args.texts} текстов по {args.chars} символов; вызов {args.latency * 1000:.0f} мс + "
+          f"{args.per_char * 1e6:.0f} мкс/символ, медленных {args.slow_rate:.0%} (x{args.slow_factor:g}), "
+          f"ошибок {args.fail_rate:.0%}")
+    report("один вызов", *asyncio.run(run(single_call, args)))
+    report("фрагменты", *asyncio.run(run(chunked, args)))
+
+
+if __name__ == '__main__':
+    main()
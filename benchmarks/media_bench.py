@@ -0,0 +1,76 @@
+"""
+Отправка /sendvoice: загрузка файла каждый раз против отправки по сохраненному file_id.
+
+Поддельный Bot API принимает загрузки со скорость UPLOAD_BANDWIDTH, как медленный канал.
+
+Запуск: python -m benchmarks.media_bench
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+
+from aiogram.types import FSInputFile
+
+import benchmarks  # noqa: F401  (задает токен для bot.config)
+from benchmarks.fake_api import FakeTelegramAPI
+from benchmarks.fakes import percentile
+from bot.config import PROJECT_BASE_DIR
+from bot.db import database
+from bot.services.media import MediaRegistry
+
+SENDS = 100
+UPLOAD_BANDWIDTH = 1024 * 1024  # 1 МБ/с
+SAMPLE = os.path.join(PROJECT_BASE_DIR, 'assets', 'audio', 'sample.ogg')
+
+
+async def measure(send):
+    latencies = []
+    for chat_id in range(SENDS):
+        start = time.perf_counter()
+        await send(chat_id + 1)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def report(name, latencies, api):
+    print(f"{name:<18} p50={percentile(latencies, 50) * 1000:6.1f} ms  p99={percentile(latencies, 99) * 1000:6.1f} ms  "
+          f"загружено={api.uploaded_bytes // 1024:5d} КБ")
+
+
+async def main():
+    api = await FakeTelegramAPI(upload_bandwidth=UPLOAD_BANDWIDTH).start()
+    bot = api.make_bot()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        voice_path = os.path.join(tmp, 'sample.ogg')
+        shutil.copy(SAMPLE, voice_path)
+
+        async def upload_every_time(chat_id):
+            await bot.send_voice(chat_id, FSInputFile(path=voice_path, filename="sample.ogg"))
+
+        report("FSInputFile", await measure(upload_every_time), api)
+
+        api.uploaded_bytes = 0
+        database.DB_PATH = os.path.join(tmp, 'media.db')
+        await database.init_db()
+        registry = MediaRegistry()
+        report("MediaRegistry", await measure(lambda chat_id: registry.send(bot, chat_id, voice_path, 'voice')), api)
+
+        # Telegram отклонил file_id - файл загружается заново один раз
+        api.invalid_file_ids.add(registry._records[(voice_path, 'voice')].file_id)
+        await registry.send(bot, 1, voice_path, 'voice')
+        # Файл изменился - тоже одна повторная загрузка
+        with open(voice_path, 'ab') as f:
+            f.write(b'\0')
+        await registry.send(bot, 1, voice_path, 'voice')
+        print(f"загрузок всего: {registry.uploads}, отправок по file_id: {registry.sent_by_id}")
+        await database.close_db()
+
+    await bot.session.close()
+    await api.stop()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
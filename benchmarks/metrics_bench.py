@@ -0,0 +1,93 @@
+"""
+Накладные расходы метрик на один апдейт.
+
+1. Вызов MetricsMiddleware (внешняя + tag_handler) вокруг пустого обработчика
+   против прямого вызова обработчика.
+2. dp.feed_update через роутер с пустым обработчиком, без метрик и с ними,
+   чтобы увидеть долю метрик на фоне остальной обработки aiogram.
+
+Запуск: python -m benchmarks.metrics_bench
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+from aiogram import Dispatcher, Router, F
+from aiogram.types import Update
+
+import benchmarks  # noqa: F401  (задает токен для bot.config)
+from benchmarks.fake_api import FakeTelegramAPI
+from benchmarks.fakes import make_message_update
+from bot.services.metrics import Metrics, MetricsMiddleware
+
+CALLS = 200_000
+UPDATES = 20_000
+
+
+async def empty_handler(event, data):
+    return None
+
+
+async def bench_middleware():
+    middleware = MetricsMiddleware(Metrics())
+    data_handler = SimpleNamespace(callback=empty_handler)
+
+    async def inner(event, data):
+        return await middleware.tag_handler(empty_handler, event, data)
+
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        await empty_handler(None, {'handler': data_handler})
+    bare = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        await middleware(inner, None, {'handler': data_handler})
+    instrumented = time.perf_counter() - start
+
+    overhead = (instrumented - bare) / CALLS * 1e6
+    print(f"middleware: без метрик {bare / CALLS * 1e6:.2f} мкс, с метриками {instrumented / CALLS * 1e6:.2f} мкс, "
+          f"накладные расходы {overhead:.2f} мкс на апдейт")
+
+
+async def bench_feed_update(bot, with_metrics: bool):
+    router = Router()
+
+    @router.message(F.text)
+    async def noop(message):
+        return None
+
+    metrics = Metrics()
+    if with_metrics:
+        middleware = MetricsMiddleware(metrics)
+        router.message.outer_middleware(middleware)
+        router.message.middleware(middleware.tag_handler)
+    dp = Dispatcher()
+    dp.include_router(router)
+
+    updates = [Update.model_validate(make_message_update(i + 1, 1 + i % 100, f"Текст {i}"), context={"bot": bot})
+               for i in range(UPDATES)]
+    start = time.perf_counter()
+    for update in updates:
+        await dp.feed_update(bot, update)
+    elapsed = time.perf_counter() - start
+    return elapsed / UPDATES * 1e6, metrics
+
+
+async def main():
+    await bench_middleware()
+
+    api = await FakeTelegramAPI().start()
+    bot = api.make_bot()
+    without, _ = await bench_feed_update(bot, False)
+    with_metrics, metrics = await bench_feed_update(bot, True)
+    print(f"feed_update: без метрик {without:.1f} мкс, с метриками {with_metrics:.1f} мкс "
+          f"(+{with_metrics - without:.1f} мкс, {(with_metrics - without) / without:.1%})")
+    print(f"учтено апдейтов: {metrics.handler_calls}")
+    print(f"размер /metrics: {len(await metrics.render())} байт")
+    await bot.session.close()
+    await api.stop()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
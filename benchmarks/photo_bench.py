@@ -0,0 +1,97 @@
+"""
+Сохранение фото: скачивание прямо в обработчике против фоновой очереди с дедупликацией.
+
+Поддельный Bot API отдает файлы с задержкой LATENCY. Половина апдейтов - повторно
+пересланные фото (тот же file_unique_id), часть - разные file_unique_id с одинаковым содержимым.
+
+Запуск: python -m benchmarks.photo_bench
+"""
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from aiogram.types import Update
+
+import benchmarks  # noqa: F401  (задает токен для bot.config)
+from benchmarks.fake_api import FakeTelegramAPI
+from benchmarks.fakes import make_photo_update, percentile
+from bot.db import database
+from bot.handlers import user_handlers
+from bot.services.photos import PhotoIngestor
+
+PHOTOS = 300
+UNIQUE = 100
+LATENCY = 0.02
+PHOTO_SIZE = 256 * 1024
+
+
+async def old_handle_photo(message, img_dir):
+    """Прежний handle_photo: скачивание по file_id прямо в обработчике."""
+    photo = message.photo[-1]
+    save_path = os.path.join(img_dir, f"{photo.file_id}.jpg")
+    await message.bot.download(file=photo, destination=save_path)
+    await message.answer(f"Фото сохранено как {photo.file_id}.jpg!")
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+async def run(handler, messages):
+    latencies = []
+    start = time.perf_counter()
+
+    async def one(message):
+        t = time.perf_counter()
+        await handler(message)
+        latencies.append(time.perf_counter() - t)
+
+    await asyncio.gather(*(one(m) for m in messages))
+    return latencies, time.perf_counter() - start
+
+
+async def main():
+    rng = random.Random(3)
+    api = await FakeTelegramAPI(latency=LATENCY).start()
+    bot = api.make_bot()
+    contents = [rng.randbytes(PHOTO_SIZE) for _ in range(UNIQUE // 2)]
+    updates = []
+    for i in range(PHOTOS):
+        n = rng.randrange(UNIQUE)
+        file_id = f"photo{i}"
+        api.files[file_id] = contents[n % len(contents)]  # Разные фото могут совпадать по содержимому
+        updates.append(make_photo_update(i + 1, 1000 + i, file_id, file_unique_id=f"uniq{n}", size=PHOTO_SIZE))
+    messages = [Update.model_validate(u, context={"bot": bot}).message for u in updates]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        old_dir = os.path.join(tmp, 'old')
+        os.makedirs(old_dir)
+        latencies, total = await run(lambda m: old_handle_photo(m, old_dir), messages)
+        print(f"в обработчике     ответ p50={percentile(latencies, 50) * 1000:6.1f} ms "
+              f"p99={percentile(latencies, 99) * 1000:6.1f} ms  всё за {total:5.2f} с  "
+              f"скачиваний={api.calls.get('file', 0):4d}  на диске={dir_size(old_dir) // 1024} КБ")
+
+        api.calls.clear()
+        database.DB_PATH = os.path.join(tmp, 'photos.db')
+        await database.init_db()
+        ingestor = PhotoIngestor(root=os.path.join(tmp, 'new'), workers=8, max_queue=PHOTOS)
+        await ingestor.start()
+        user_handlers.photo_ingestor = ingestor
+        start = time.perf_counter()
+        latencies, _ = await run(user_handlers.handle_photo, messages)
+        await ingestor.close()
+        total = time.perf_counter() - start
+        print(f"фоновая очередь   ответ p50={percentile(latencies, 50) * 1000:6.1f} ms "
+              f"p99={percentile(latencies, 99) * 1000:6.1f} ms  всё за {total:5.2f} с  "
+              f"скачиваний={api.calls.get('file', 0):4d}  на диске={dir_size(ingestor.root) // 1024} КБ")
+        print("  ", ingestor.stats())
+        await database.close_db()
+
+    await bot.session.close()
+    await api.stop()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
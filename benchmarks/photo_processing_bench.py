@@ -0,0 +1,141 @@
+"""
+Обработка фото (превью, пережатая копия без EXIF): прямо в цикле событий
+против PhotoProcessor с пулом процессов из 1, 2, ... процессов.
+
+Фото - синтетические JPEG размера --size (как оригиналы с телефона) с EXIF
+Orientation. Для каждого варианта сообщаются фото в секунду и задержка цикла
+событий: насколько позже срабатывает asyncio.sleep(5 мс), пока идет обработка -
+столько же ждали бы ответа все пользователи бота.
+
+Запуск: python -m benchmarks.photo_processing_bench [--photos 60] [--workers 1,2,4]
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from PIL import Image, ImageDraw
+
+import benchmarks  # noqa: F401  (задает токен для bot.config)
+from benchmarks.fakes import percentile
+from bot.db import database
+from bot.services import imaging
+from bot.services.photos import PhotoProcessor
+
+TICK = 0.005
+EXIF_ORIENTATION = 0x0112
+
+
+def make_photos(root: str, count: int, size: tuple) -> list:
+    """Создает count разных JPEG в root; возвращает [(hash, путь относительно root)]."""
+    rng = random.Random(5)
+    base = Image.new('RGB', size)
+    draw = ImageDraw.Draw(base)
+    for _ in range(300):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        draw.ellipse((x, y, x + rng.randint(20, 400), y + rng.randint(20, 400)),
+                     fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    exif = Image.Exif()
+    exif[EXIF_ORIENTATION] = 6   # Снято повернутым телефоном: при показе повернуть на 90°
+    photos = []
+    for i in range(count):
+        file_hash = f"{i:064x}"
+        rel_path = os.path.join(file_hash[:2], file_hash[2:4], f"{file_hash}.jpg")
+        os.makedirs(os.path.join(root, os.path.dirname(rel_path)), exist_ok=True)
+        # Каждое фото немного отличается, чтобы не сравнивать с закэшированным
+        image = base.rotate(i % 7, fillcolor=(i % 256, 0, 0))
+        image.save(os.path.join(root, rel_path), 'JPEG', quality=92, exif=exif)
+        photos.append((file_hash, rel_path))
+    return photos
+
+
+async def register(photos: list, root: str):
+    for file_hash, rel_path in photos:
+        size = os.path.getsize(os.path.join(root, rel_path))
+        await database.save_photo(f"u{file_hash}", file_hash, rel_path, size, time.time())
+
+
+async def measure_lag(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+async def run_inline(photos: list, root: str) -> dict:
+    """Обработка прямо в обработчике: цикл событий занят все время сжатия."""
+    lags, stop = [], asyncio.Event()
+    ticker = asyncio.create_task(measure_lag(stop, lags))
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    for file_hash, rel_path in photos:
+        imaging.process_image(root, rel_path, 320, 1600, 82)
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+    return {'elapsed': elapsed, 'lags': lags}
+
+
+async def run_pool(photos: list, root: str, workers: int) -> dict:
+    processor = PhotoProcessor(root=root, workers=workers, max_queue=len(photos))
+    await processor.start()   # Запуск процессов не входит в замер
+    lags, stop = [], asyncio.Event()
+    ticker = asyncio.create_task(measure_lag(stop, lags))
+    start = time.perf_counter()
+    for file_hash, rel_path in photos:
+        processor.submit(file_hash, rel_path)
+    await processor._queue.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+    await processor.close()
+    return {'elapsed': elapsed, 'lags': lags, 'stats': processor.stats()}
+
+
+def report(name: str, photos: int, result: dict):
+    lags = result['lags'] or [0.0]
+    print(f"  {name:<14} {photos / result['elapsed']:6.1f} фото/с ({result['elapsed']:5.2f} с); "
+          f"задержка цикла событий p50 {percentile(lags, 50) * 1000:6.1f} мс, "
+          f"p99 {percentile(lags, 99) * 1000:6.1f} мс, max {max(lags) * 1000:6.1f} мс")
+
+
+async def check_output(photos: list, root: str):
+    """Проверка результата: копии повернуты по EXIF, метаданных в них нет, размеры записаны в БД."""
+    file_hash, rel_path = photos[0]
+    variants = await database.get_photo_variants(file_hash)
+    for kind, (path, width, height, size) in sorted(variants.items()):
+        with Image.open(os.path.join(root, path)) as image:
+            print(f"  {kind:<10} {width}x{height}, {size / 1024:.0f} КБ, EXIF: {'есть' if image.getexif() else 'нет'}")
+
+
+async def main(args):
+    size = tuple(int(side) for side in args.size.split('x'))
+    workers_list = [int(n) for n in args.workers.split(',')]
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, 'photos.db')
+        await database.init_db()
+        root = os.path.join(tmp, 'img')
+        photos = make_photos(root, args.photos, size)
+        await register(photos, root)
+        original = sum(os.path.getsize(os.path.join(root, rel_path)) for _, rel_path in photos) / len(photos)
+        print(f"{args.photos} фото {args.size} (~{original / 1024:.0f} КБ), ядер: {os.cpu_count()}")
+
+        report("в цикле", args.photos, await run_inline(photos, root))
+        for workers in workers_list:
+            result = await run_pool(photos, root, workers)
+            report(f"процессов: {workers}", args.photos, result)
+            assert result['stats']['failed'] == 0, "обработка завершилась с ошибками"
+        await check_output(photos, root)
+        await database.close_db()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Обработка фото в цикле событий и в пуле процессов")
+    parser.add_argument('--photos', type=int, default=60)
+    parser.add_argument('--size', default='4000x3000', help="размер оригинала, ШxВ")
+    parser.add_argument('--workers', default=','.join(str(n) for n in sorted({1, 2, os.cpu_count() or 1})),
+                        help="числа процессов через запятую")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,101 @@
+"""
+Отчет /report: сводка student_stats против GROUP BY по всей таблице students
+при 10k, 100k и 1M строк. Дополнительно - сколько стоит поддержка сводки
+триггерами при вставке и сколько занимает /report rebuild.
+
+Запуск: python -m benchmarks.report_bench
+"""
+import asyncio
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+import benchmarks  # noqa: F401  (задает токен для bot.config)
+from benchmarks.fakes import percentile
+from bot.db import database
+from bot.handlers import user_handlers
+
+SIZES = (10_000, 100_000, 1_000_000)
+REPEATS = 50
+GRADES = [f"{n}{letter}" for n in range(1, 12) for letter in "АБВГ"]
+FULL_SCAN = 'SELECT grade, age, COUNT(*) FROM students GROUP BY grade, age'
+
+
+def fill(path, start, stop, rng) -> float:
+    """Дописывает строки через sqlite3 (триггеры сводки срабатывают); возвращает время вставки."""
+    rows = []
+    for i in range(start, stop):
+        name = f"Студент {i}"
+        rows.append((name, rng.randint(6, 18), rng.choice(GRADES), database.make_name_key(name)))
+    started = time.perf_counter()
+    with sqlite3.connect(path) as db:
+        db.executemany('INSERT INTO students (name, age, grade, name_key) VALUES (?, ?, ?, ?)', rows)
+    return time.perf_counter() - started
+
+
+async def full_scan():
+    async with database.get_pool().acquire() as db:
+        async with db.execute(FULL_SCAN) as cursor:
+            return await cursor.fetchall()
+
+
+async def measure(query):
+    latencies = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        await query()
+        latencies.append(time.perf_counter() - start)
+    return percentile(latencies, 50) * 1000, percentile(latencies, 99) * 1000
+
+
+def trigger_cost(tmp, rows=100_000) -> tuple:
+    """Время вставки rows строк со сводкой и без нее (триггеры удалены)."""
+    times = []
+    for with_triggers in (False, True):
+        path = os.path.join(tmp, f'triggers_{with_triggers}.db')
+        with sqlite3.connect(path) as db:
+            db.execute('CREATE TABLE students (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, '
+                       'age INTEGER, grade TEXT, name_key TEXT)')
+            db.execute('CREATE INDEX idx_students_grade ON students (grade, name_key, id)')
+            if with_triggers:
+                for statement in database._STUDENT_STATS_DDL:
+                    db.execute(statement)
+        times.append(fill(path, 0, rows, random.Random(1)))
+    return times
+
+
+async def main():
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, 'students.db')
+        await database.init_db()
+        await database.close_db()
+
+        filled = 0
+        print(f"{'строк':>9} | {'/report p50':>12} {'p99':>8} | {'GROUP BY p50':>13} {'p99':>8} | "
+              f"{'rebuild':>8} | вставка")
+        for size in SIZES:
+            insert_time = fill(database.DB_PATH, filled, size, rng)
+            inserted = size - filled
+            filled = size
+            await database.init_db()
+
+            report = await measure(user_handlers._build_report)
+            scan = await measure(full_scan)
+            start = time.perf_counter()
+            cells, mismatched = await database.rebuild_student_stats()
+            rebuild = time.perf_counter() - start
+            assert mismatched == 0, "сводка разошлась с таблицей"
+            print(f"{size:>9} | {report[0]:9.2f} мс {report[1]:5.2f} мс | {scan[0]:10.2f} мс {scan[1]:5.2f} мс | "
+                  f"{rebuild * 1000:5.0f} мс | {inserted / insert_time:7.0f} строк/с ({cells} ячеек сводки)")
+            await database.close_db()
+
+        plain, with_stats = trigger_cost(tmp)
+        print(f"\nВставка 100k строк: без сводки {plain:.2f} с, с триггерами сводки {with_stats:.2f} с "
+              f"(+{(with_stats / plain - 1):.0%})")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
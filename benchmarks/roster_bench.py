@@ -0,0 +1,123 @@
+"""
+Массовый импорт и экспорт студентов (bot/roster.py).
+
+1. Импорт --rows строк из CSV и из JSONL: строк в секунду и пиковая память
+   Python (tracemalloc) - она не должна расти вместе с размером файла.
+   Около 2% строк заведомо ошибочные и должны попасть в отчет.
+2. Для сравнения: те же строки по одной через add_student (--baseline строк,
+   время пересчитывается на весь файл).
+3. Экспорт всей таблицы в CSV.
+
+Запуск: python -m benchmarks.roster_bench [--rows 100000] [--baseline 2000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import benchmarks  # noqa: F401  (задает токен для bot.config)
+from bot import roster
+from bot.db import database
+
+FIRST_NAMES = ["Иван", "Мария", "Петр", "Анна", "Алексей", "Ольга", "Дмитрий", "Елена", "Andrew", "Kate"]
+LAST_NAMES = ["Иванов", "Петров", "Сидоров", "Смирнов", "Кузнецов", "Попов", "Волков", "Соколов"]
+GRADES = [f"{n}{letter}" for n in range(1, 12) for letter in "АБВ"]
+BAD_SHARE = 0.02
+
+
+def make_rows(count: int, seed: int = 3):
+    rng = random.Random(seed)
+    for i in range(count):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}"
+        age, grade = str(rng.randint(6, 18)), rng.choice(GRADES)
+        if rng.random() < BAD_SHARE:
+            age = rng.choice(["", "двенадцать", "250"])
+        yield name, age, grade
+
+
+def write_files(tmp: str, count: int) -> dict:
+    paths = {'csv': os.path.join(tmp, 'students.csv'), 'jsonl': os.path.join(tmp, 'students.jsonl')}
+    with open(paths['csv'], 'w', encoding='utf-8') as f:
+        f.write("ФИО;Возраст;Класс\n")
+        for name, age, grade in make_rows(count):
+            f.write(f"{name};{age};{grade}\n")
+    with open(paths['jsonl'], 'w', encoding='utf-8') as f:
+        for name, age, grade in make_rows(count):
+            f.write(json.dumps({'name': name, 'age': age, 'grade': grade}, ensure_ascii=False) + "\n")
+    return paths
+
+
+async def fresh_db(path: str):
+    await database.close_db()
+    if os.path.exists(path):
+        os.remove(path)
+    database.DB_PATH = path
+    await database.init_db()
+
+
+async def bench_import(path: str, fmt: str, db_path: str):
+    await fresh_db(db_path)
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        report = await roster.import_students(f, fmt)
+    # Память - отдельным проходом без записи в базу: tracemalloc сильно замедляет разбор
+    tracemalloc.start()
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        await roster.import_students(f, fmt, dry_run=True)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size = os.path.getsize(path) / 1024 / 1024
+    print(f"  {fmt:<6} {report.rows} строк ({size:.1f} МБ) за {report.elapsed:5.2f} с, "
+          f"{report.rows / report.elapsed:8.0f} строк/с; добавлено {report.imported}, "
+          f"отклонено {report.rejected}; пик памяти разбора {peak / 1024 / 1024:.1f} МБ")
+
+
+async def bench_baseline(rows: int, total: int, db_path: str):
+    await fresh_db(db_path)
+    start = time.perf_counter()
+    for name, age, grade in make_rows(rows):
+        if age.isdigit() and 5 <= int(age) <= 100:
+            await database.add_student(name, int(age), grade)
+    elapsed = time.perf_counter() - start
+    print(f"  add_student по одной: {rows} строк за {elapsed:5.2f} с, {rows / elapsed:8.0f} строк/с "
+          f"(на {total} строк ~{elapsed * total / rows:.0f} с)")
+
+
+async def bench_export(tmp: str, db_path: str):
+    # Таблица остается после последнего импорта
+    out = os.path.join(tmp, 'export.csv')
+    start = time.perf_counter()
+    with open(out, 'w', encoding='utf-8', newline='') as f:
+        count = await roster.export_students(f)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    with open(os.devnull, 'w', newline='') as f:
+        await roster.export_students(f)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  экспорт {count} строк за {elapsed:5.2f} с, {count / elapsed:8.0f} строк/с; "
+          f"пик памяти {peak / 1024 / 1024:.1f} МБ, файл {os.path.getsize(out) / 1024 / 1024:.1f} МБ")
+
+
+async def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_files(tmp, args.rows)
+        db_path = os.path.join(tmp, 'students.db')
+        print(f"Импорт {args.rows} строк, ошибочных ~{BAD_SHARE:.0%}, транзакции по {roster.ROSTER_BATCH_SIZE}")
+        if args.baseline:
+            await bench_baseline(args.baseline, args.rows, db_path)
+        for fmt in ('jsonl', 'csv'):
+            await bench_import(paths[fmt], fmt, db_path)
+        print("Экспорт")
+        await bench_export(tmp, db_path)
+        await database.close_db()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Массовый импорт и экспорт студентов")
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--baseline', type=int, default=2000, help="строк для сравнения с add_student (0 - пропустить)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,83 @@
+"""
+Отправка сообщений под нагрузкой: напрямую против планировщика SendScheduler.
+
+Поддельный Bot API отвечает 429 на долю RATE_LIMIT_PROBABILITY запросов.
+Одновременно идет фоновая рассылка BULK сообщений по разным чатам и приходят
+INTERACTIVE ответов пользователям. Без планировщика часть сообщений теряется
+на 429; с планировщиком доставляются все, а ответы пользователям обгоняют рассылку.
+
+Запуск: python -m benchmarks.send_bench
+"""
+import asyncio
+import logging
+import time
+
+from aiogram.exceptions import TelegramRetryAfter
+
+import benchmarks  # noqa: F401  (задает токен для bot.config)
+from benchmarks.fake_api import FakeTelegramAPI
+from benchmarks.fakes import percentile
+from bot.services.outbound import SendScheduler, bulk_priority
+
+BULK = 300
+INTERACTIVE = 60
+RATE_LIMIT_PROBABILITY = 0.05
+GLOBAL_RATE = 100   # Ниже реальных 30/с не опускаемся, чтобы прогон шел секунды, а не минуты
+
+
+async def run(name, scheduler):
+    api = await FakeTelegramAPI(rate_limit_probability=RATE_LIMIT_PROBABILITY, retry_after=1).start()
+    bot = api.make_bot()
+    if scheduler is not None:
+        bot.session.middleware(scheduler)
+
+    lost = 0
+    latencies = {'bulk': [], 'interactive': []}
+
+    async def send(kind, chat_id, text):
+        nonlocal lost
+        start = time.perf_counter()
+        try:
+            await bot.send_message(chat_id, text)
+        except TelegramRetryAfter:
+            lost += 1
+            return
+        latencies[kind].append(time.perf_counter() - start)
+
+    async def broadcast():
+        with bulk_priority():
+            await asyncio.gather(*(send('bulk', 100000 + i, f"рассылка {i}") for i in range(BULK)))
+
+    async def replies():
+        # Пользователи пишут боту во время рассылки, по одному сообщению в 50 мс
+        tasks = []
+        for i in range(INTERACTIVE):
+            tasks.append(asyncio.create_task(send('interactive', 1 + i % 20, f"ответ {i}")))
+            await asyncio.sleep(0.05)
+        await asyncio.gather(*tasks)
+
+    start = time.perf_counter()
+    await asyncio.gather(broadcast(), replies())
+    elapsed = time.perf_counter() - start
+
+    print(f"{name}: {elapsed:.2f} с, доставлено {len(api.sent)} из {BULK + INTERACTIVE}, потеряно {lost}, "
+          f"429 от сервера {api.rate_limited}")
+    for kind, values in latencies.items():
+        if values:
+            print(f"    {kind:<12} p50={percentile(values, 50) * 1000:7.1f} ms  "
+                  f"p99={percentile(values, 99) * 1000:7.1f} ms")
+    if scheduler is not None:
+        print(f"    {scheduler.stats()}")
+
+    await bot.session.close()
+    await api.stop()
+
+
+async def main():
+    logging.disable(logging.WARNING)  # Предупреждения о каждом 429 не нужны
+    await run("напрямую", None)
+    await run("SendScheduler", SendScheduler(global_rate=GLOBAL_RATE))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,109 @@
+"""
+Масштабирование многопроцессного режима: от 1 до N воркеров.
+
+Супервизор запускает воркеров (в каждом - полный бот с FSM в SQLite и FakeSession
+вместо сети), ShardRouter раздает им апдейты по chat_id через Unix-сокеты.
+Каждый пользователь присылает /start и проходит регистрацию (5 апдейтов).
+Замеряется время до последнего ответа бота. Прирост возможен только при
+наличии свободных ядер: на одноядерной машине числа не растут.
+
+Запуск: python -m benchmarks.shard_bench [--max-workers N] [--users 2000]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+
+import benchmarks  # noqa: F401  (задает токен для bot.config)
+from benchmarks.fake_session import FakeSession
+from benchmarks.fakes import make_message_update
+from bot.sharding import Supervisor, ShardRouter
+
+
+class CountingSession(FakeSession):
+    """FakeSession, которая считает ответы бота в общем для процессов счетчике."""
+
+    def __init__(self, counter):
+        super().__init__()
+        self.counter = counter
+
+    async def make_request(self, bot, method, timeout=None):
+        result = await super().make_request(bot, method, timeout)
+        if method.__api_method__ == "sendMessage":
+            with self.counter.get_lock():
+                self.counter.value += 1
+        return result
+
+
+def setup_worker(counter, db_path):
+    """Вызывается в каждом воркере: отдельная БД бенчмарка и сессия без сети."""
+    from bot.db import database
+    from bot.services.outbound import SendScheduler
+    database.DB_PATH = db_path
+    logging.disable(logging.INFO)
+    # Лимиты Telegram не ограничивают замер: меряем сам бот
+    scheduler = SendScheduler(global_rate=1e9, chat_rate=1e9, group_rate=1e9, chat_burst=10 ** 9)
+    return {'session': CountingSession(counter), 'scheduler': scheduler, 'metrics_port': 0}
+
+
+def make_updates(users: int) -> list:
+    updates = []
+    update_id = 1
+    for user_id in range(1, users + 1):
+        for text in ("/start", "/register", f"Студент {user_id}", str(7 + user_id % 10), f"{1 + user_id % 11}А"):
+            updates.append(make_message_update(update_id, user_id, text))
+            update_id += 1
+    return updates
+
+
+async def run(workers: int, users: int) -> float:
+    context = multiprocessing.get_context('spawn')
+    counter = context.Value('q', 0)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'shard.db')
+        from bot.db import database
+        database.DB_PATH = db_path
+        await database.init_db()
+        await database.close_db()
+
+        supervisor = Supervisor(workers, tmp, setup=setup_worker, setup_args=(counter, db_path))
+        supervisor.start()
+        router = ShardRouter([supervisor.socket_path(i) for i in range(workers)], max_queue=100000)
+        router.start()
+        await router.wait_connected()
+
+        updates = make_updates(users)
+        payloads = [(json.dumps(update).encode(), update) for update in updates]
+        start = time.perf_counter()
+        for payload, update in payloads:
+            await router.put(payload, update)
+        while counter.value < len(updates):
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - start
+
+        await router.close()
+        await supervisor.stop()
+    return len(updates) / elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count())
+    parser.add_argument('--users', type=int, default=2000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    print(f"ядер: {os.cpu_count()}, пользователей: {args.users}, апдейтов: {args.users * 5}")
+    baseline = None
+    for workers in range(1, args.max_workers + 1):
+        rate = await run(workers, args.users)
+        baseline = baseline or rate
+        print(f"воркеров {workers}: {rate:7.0f} апдейтов/с  (x{rate / baseline:.2f})")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
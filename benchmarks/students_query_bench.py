@@ -0,0 +1,74 @@
+"""
+Поиск студентов: задержка запросов search_students при 10k, 100k и 1M строк.
+
+Запуск: python -m benchmarks.students_query_bench
+"""
+import asyncio
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+import benchmarks  # noqa: F401  (задает токен для bot.config)
+from benchmarks.fakes import percentile
+from bot.db import database
+
+SIZES = (10_000, 100_000, 1_000_000)
+REPEATS = 200
+FIRST_NAMES = ["Иван", "Мария", "Петр", "Анна", "Алексей", "Ольга", "Дмитрий", "Елена", "Сергей", "Наталья",
+               "Andrew", "Kate", "Юлия", "Павел", "Ирина", "Никита", "Софья", "Артем", "Дарья", "Егор"]
+LAST_NAMES = ["Иванов", "Петров", "Сидоров", "Смирнов", "Кузнецов", "Попов", "Волков", "Соколов", "Лебедев", "Козлов"]
+GRADES = [f"{n}{letter}" for n in range(1, 12) for letter in "АБВГ"]
+
+
+def fill(path, start, stop, rng):
+    """Быстро дописывает строки напрямую через sqlite3 (в обход очереди регистраций)."""
+    rows = []
+    for i in range(start, stop):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}"
+        rows.append((name, rng.randint(6, 18), rng.choice(GRADES), database.make_name_key(name)))
+    with sqlite3.connect(path) as db:
+        db.executemany('INSERT INTO students (name, age, grade, name_key) VALUES (?, ?, ?, ?)', rows)
+
+
+async def measure(query):
+    latencies = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        await query()
+        latencies.append(time.perf_counter() - start)
+    return percentile(latencies, 50) * 1000, percentile(latencies, 99) * 1000
+
+
+async def main():
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, 'students.db')
+        await database.init_db()
+        await database.close_db()
+
+        filled = 0
+        for size in SIZES:
+            fill(database.DB_PATH, filled, size, rng)
+            filled = size
+            await database.init_db()
+
+            middle = await database.search_students(grade="7Б", limit=size // len(GRADES) // 2)
+            cursor, cursor_key = middle[-1].id, database.make_name_key(middle[-1].name)
+            queries = {
+                "префикс 'Ив'": lambda: database.search_students(name_prefix="Ив", limit=10),
+                "класс 7Б, стр. 1": lambda: database.search_students(grade="7Б", limit=10),
+                "класс 7Б, середина": lambda: database.search_students(grade="7Б", after_id=cursor,
+                                                                        after_key=cursor_key, limit=10),
+                "префикс + возраст": lambda: database.search_students(name_prefix="ма", min_age=10, max_age=12,
+                                                                       limit=10),
+            }
+            for name, query in queries.items():
+                p50, p99 = await measure(query)
+                print(f"{size:>9} строк  {name:<20} p50={p50:6.3f} ms  p99={p99:6.3f} ms")
+            await database.close_db()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+"""
+Ограничение частоты и сброс нагрузки: user_router без middleware и с ThrottlingMiddleware.
+
+Сценарий "флуд": один пользователь присылает FLOOD_MESSAGES разных текстов разом,
+параллельно NORMAL_USERS обычных пользователей присылают по одному тексту.
+Сценарий "перегрузка": переводчик отвечает медленно, SATURATION_USERS пользователей
+одновременно присылают тексты, а HELP_USERS пользователей - /help.
+Апдейты подаются через dp.feed_update, ответы уходят в поддельный Bot API.
+
+Запуск: python -m benchmarks.throttle_bench
+"""
+import asyncio
+import time
+
+from aiogram import Dispatcher
+from aiogram.types import Update
+
+import benchmarks  # noqa: F401  (задает токен для bot.config)
+from benchmarks.fake_api import FakeTelegramAPI
+from benchmarks.fakes import FakeTranslator, make_message_update
+from bot.handlers import user_handlers
+from bot.middlewares.throttling import ThrottlingMiddleware
+from bot.services.translation import TranslationService
+
+FLOOD_MESSAGES = 300
+NORMAL_USERS = 50
+SATURATION_USERS = 200
+HELP_USERS = 50
+MAX_IN_FLIGHT = 40
+
+
+def build_dispatcher(middleware):
+    # Каждому прогону свежий роутер, чтобы middleware не накапливались
+    router = user_handlers.user_router
+    router.message.middleware._middlewares.clear()
+    router.callback_query.middleware._middlewares.clear()
+    if middleware is not None:
+        router.message.middleware(middleware)
+        router.callback_query.middleware(middleware)
+    if router.parent_router is not None:
+        router._parent_router = None
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+async def feed(dp, bot, updates):
+    start = time.perf_counter()
+    await asyncio.gather(*(dp.feed_update(bot, Update.model_validate(u, context={"bot": bot})) for u in updates))
+    return time.perf_counter() - start
+
+
+async def flood(api, middleware):
+    translator = FakeTranslator(latency=0.02)
+    user_handlers.translation_service = TranslationService(translator, max_workers=16, max_queue=1000, batch_window=0)
+    dp = build_dispatcher(middleware)
+    bot = api.make_bot()
+    api.sent.clear()
+
+    updates = [make_message_update(i + 1, 1, f"Флуд номер {i}") for i in range(FLOOD_MESSAGES)]
+    updates += [make_message_update(10000 + i, 100 + i, f"Привет от {i}") for i in range(NORMAL_USERS)]
+    elapsed = await feed(dp, bot, updates)
+
+    to_flooder = sum(1 for _, _, params in api.sent if params.get("chat_id") == "1")
+    to_normal = sum(1 for _, _, params in api.sent if params.get("chat_id") != "1")
+    name = "с middleware" if middleware else "без middleware"
+    print(f"флуд, {name}: {elapsed:.2f} с, вызовов переводчика {translator.calls}, "
+          f"сообщений флудеру {to_flooder}, обычным пользователям {to_normal} из {NORMAL_USERS}")
+    await user_handlers.translation_service.shutdown()
+    await bot.session.close()
+
+
+async def saturation(api, middleware):
+    translator = FakeTranslator(latency=0.5)
+    user_handlers.translation_service = TranslationService(translator, max_workers=8, max_queue=1000, batch_window=0)
+    dp = build_dispatcher(middleware)
+    bot = api.make_bot()
+    api.sent.clear()
+
+    help_latencies = []
+
+    async def ask_help(i):
+        start = time.perf_counter()
+        await dp.feed_update(bot, Update.model_validate(make_message_update(20000 + i, 5000 + i, "/help"),
+                                                        context={"bot": bot}))
+        help_latencies.append(time.perf_counter() - start)
+
+    texts = [make_message_update(30000 + i, 1000 + i, f"Текст {i}") for i in range(SATURATION_USERS)]
+    start = time.perf_counter()
+    texts_task = asyncio.create_task(feed(dp, bot, texts))
+    await asyncio.sleep(0.05)  # /help приходит, когда переводы уже заняли бота
+    await asyncio.gather(*(ask_help(i) for i in range(HELP_USERS)))
+    await texts_task
+    elapsed = time.perf_counter() - start
+
+    name = "с middleware" if middleware else "без middleware"
+    help_latencies.sort()
+    print(f"перегрузка, {name}: {elapsed:.2f} с, вызовов переводчика {translator.calls}, "
+          f"/help p50={help_latencies[len(help_latencies) // 2] * 1000:.0f} ms "
+          f"max={help_latencies[-1] * 1000:.0f} ms")
+    if middleware:
+        print(f"    {middleware.stats()}")
+    await user_handlers.translation_service.shutdown()
+    await bot.session.close()
+
+
+async def main():
+    api = await FakeTelegramAPI().start()
+    await flood(api, None)
+    await flood(api, ThrottlingMiddleware())
+    await saturation(api, None)
+    await saturation(api, ThrottlingMiddleware(max_in_flight=MAX_IN_FLIGHT))
+    await api.stop()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
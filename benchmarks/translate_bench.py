@@ -0,0 +1,58 @@
+"""
+Задержка handle_text_translate: блокирующий вызов переводчика против TranslationService.
+
+Запуск: python -m benchmarks.translate_bench
+"""
+import asyncio
+import time
+
+import benchmarks  # noqa: F401  (задает токен для bot.config)
+from benchmarks.fakes import FakeTranslator, FakeMessage, percentile
+from bot.handlers import user_handlers
+from bot.services.translation import TranslationService
+
+MESSAGES = 200
+BACKEND_LATENCY = 0.02
+
+
+async def blocking_handler(translator, message):
+    """Старый путь: синхронный перевод прямо в event loop."""
+    translation = translator.translate(message.text, dest='en')
+    await message.answer(f"<b>Перевод на английский:</b>\n{translation.text}")
+
+
+async def run(handler, messages):
+    """Все сообщения приходят одновременно; задержка считается от момента прихода."""
+    latencies = []
+    start = time.perf_counter()
+
+    async def one(message):
+        await handler(message)
+        latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(m) for m in messages))
+    return latencies, time.perf_counter() - start
+
+
+def report(name, latencies, total):
+    print(f"{name:<22} p50={percentile(latencies, 50) * 1000:8.1f} ms  "
+          f"p99={percentile(latencies, 99) * 1000:8.1f} ms  total={total:6.2f} s")
+
+
+async def main():
+    messages = [FakeMessage(f"Привет {i}", user_id=i) for i in range(MESSAGES)]
+
+    translator = FakeTranslator(latency=BACKEND_LATENCY)
+    latencies, total = await run(lambda m: blocking_handler(translator, m), messages)
+    report("blocking translator", latencies, total)
+
+    service = TranslationService(FakeTranslator(latency=BACKEND_LATENCY), max_workers=16, batch_window=0,
+                                 timeout=5, max_queue=MESSAGES)
+    user_handlers.translation_service = service
+    latencies, total = await run(user_handlers.handle_text_translate, messages)
+    report("TranslationService", latencies, total)
+    await service.shutdown()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
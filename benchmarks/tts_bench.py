@@ -0,0 +1,92 @@
+"""
+Озвучка /say: кэш синтеза на диске и отправка по file_id.
+
+Синтезатор заменен заглушкой, которая "думает" SYNTH_LATENCY секунд и пишет
+AUDIO_SIZE байт, как gTTS. Фразы выбираются по закону Ципфа: немногие популярные
+фразы повторяются часто. Размер кэша меньше суммарного объема фраз, так что
+работает и вытеснение. Ответы отправляются в поддельный Bot API.
+
+Запуск: python -m benchmarks.tts_bench
+"""
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+import benchmarks  # noqa: F401  (задает токен для bot.config)
+from benchmarks.fake_api import FakeTelegramAPI
+from benchmarks.fakes import percentile
+from bot.db import database
+from bot.services.media import MediaRegistry
+from bot.services.tts import TTSService
+
+REQUESTS = 2000
+PHRASES = 500
+CONCURRENCY = 20
+SYNTH_LATENCY = 0.2
+AUDIO_SIZE = 16 * 1024
+CACHE_BYTES = 200 * AUDIO_SIZE
+
+
+def stub_synthesize(text: str, lang: str, path: str):
+    time.sleep(SYNTH_LATENCY)
+    with open(path, 'wb') as f:
+        f.write(os.urandom(AUDIO_SIZE))
+
+
+def zipf_phrases(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, PHRASES + 1)]
+    return [f"фраза номер {i}" for i in rng.choices(range(PHRASES), weights=weights, k=count)]
+
+
+async def main():
+    api = await FakeTelegramAPI().start()
+    bot = api.make_bot()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, 'tts.db')
+        await database.init_db()
+        registry = MediaRegistry()
+
+        async def forget(path):
+            await registry.forget(path, 'audio')
+
+        service = TTSService(synthesizer=stub_synthesize, cache_dir=os.path.join(tmp, 'tts'),
+                             max_bytes=CACHE_BYTES, on_evict=forget)
+        queue = asyncio.Queue()
+        for text in zipf_phrases(REQUESTS):
+            queue.put_nowait(text)
+        latencies = []
+
+        async def worker(chat_id):
+            while not queue.empty():
+                text = queue.get_nowait()
+                start = time.perf_counter()
+                path = await service.synthesize(text, 'ru')
+                await registry.send(bot, chat_id, path, kind='audio')
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(i + 1) for i in range(CONCURRENCY)))
+        elapsed = time.perf_counter() - start
+
+        stats = service.stats()
+        print(f"запросов: {REQUESTS} за {elapsed:.2f} с ({REQUESTS / elapsed:.0f}/с)")
+        print(f"ответ: p50={percentile(latencies, 50) * 1000:.1f} ms  p99={percentile(latencies, 99) * 1000:.1f} ms")
+        print(f"кэш: попаданий {stats['hit_rate']:.1%}, синтезов {stats['misses']}, вытеснено {stats['evictions']}, "
+              f"занято {stats['bytes'] // 1024} КБ")
+        print(f"синтез: p50={stats['synth_p50_ms']:.1f} ms  max={stats['synth_max_ms']:.1f} ms")
+        print(f"Telegram: загрузок {registry.uploads}, по file_id {registry.sent_by_id}, "
+              f"загружено {api.uploaded_bytes // 1024} КБ")
+
+        service.shutdown()
+        await database.close_db()
+
+    await bot.session.close()
+    await api.stop()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+"""
+Пропускная способность: long polling против вебхука на локальном поддельном Bot API.
+
+Оба режима обрабатывают одинаковые текстовые апдейты через настоящий user_router
+с переводчиком-заглушкой. Поддельный API работает в том же процессе и делит с ботом
+процессор, поэтому абсолютные числа занижены; сравнивать стоит режимы между собой. Вебхук получает апдейты POST-запросами (как от Telegram,
+не более MAX_CONNECTIONS одновременно), polling забирает их через getUpdates.
+
+Запуск: python -m benchmarks.webhook_bench
+"""
+import asyncio
+import time
+
+import aiohttp
+from aiohttp import web
+from aiogram import Dispatcher
+
+import benchmarks  # noqa: F401  (задает токен для bot.config)
+from benchmarks.fake_api import FakeTelegramAPI
+from benchmarks.fakes import FakeTranslator, make_message_update
+from bot.config import WEBHOOK_PATH
+from bot.handlers import user_handlers
+from bot.services.translation import TranslationService
+from bot.webhook import create_webhook_app
+
+UPDATES = 2000
+MAX_CONNECTIONS = 40
+TRANSLATOR_LATENCY = 0.01
+
+
+def make_updates(offset):
+    return [make_message_update(offset + i, 1000 + i % 300, f"Текст {i}") for i in range(UPDATES)]
+
+
+async def bench_polling(api, dp):
+    bot = api.make_bot()
+    sent_before = len(api.sent)
+    api.push_updates(make_updates(1))
+    start = time.perf_counter()
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, polling_timeout=1))
+    await api.wait_sent(sent_before + UPDATES)
+    elapsed = time.perf_counter() - start
+    await dp.stop_polling()
+    await polling
+    await bot.session.close()
+    return elapsed
+
+
+async def bench_webhook(api, dp):
+    bot = api.make_bot()
+    app = create_webhook_app(bot, dp)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}{WEBHOOK_PATH}"
+
+    sent_before = len(api.sent)
+    updates = make_updates(UPDATES + 1)
+    semaphore = asyncio.Semaphore(MAX_CONNECTIONS)
+    start = time.perf_counter()
+    async with aiohttp.ClientSession() as client:
+        async def post(update):
+            async with semaphore:
+                async with client.post(url, json=update) as response:
+                    assert response.status == 200, response.status
+
+        await asyncio.gather(*(post(u) for u in updates))
+    await api.wait_sent(sent_before + UPDATES)
+    elapsed = time.perf_counter() - start
+    await runner.cleanup()
+    await bot.session.close()
+    return elapsed
+
+
+async def main():
+    user_handlers.translation_service = TranslationService(
+        FakeTranslator(latency=TRANSLATOR_LATENCY), max_workers=32, max_queue=UPDATES, batch_window=0
+    )
+    api = await FakeTelegramAPI().start()
+    dp = Dispatcher()
+    dp.include_router(user_handlers.user_router)
+
+    elapsed = await bench_polling(api, dp)
+    print(f"polling  {UPDATES / elapsed:7.0f} апдейтов/с  ({elapsed:.2f} с)")
+    elapsed = await bench_webhook(api, dp)
+    print(f"webhook  {UPDATES / elapsed:7.0f} апдейтов/с  ({elapsed:.2f} с)")
+
+    await user_handlers.translation_service.shutdown()
+    await api.stop()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -10,6 +10,26 @@ BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 if BOT_TOKEN is None:
     raise ValueError("Необходимо установить TELEGRAM_BOT_TOKEN в .env файле")
 
+# Telegram ID сотрудников с доступом к служебным командам (через запятую)
+ADMIN_IDS = {int(user_id) for user_id in os.getenv("ADMIN_IDS", "").replace(" ", "").split(",") if user_id}
+
+# --- Режим получения апдейтов ---
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()                    # polling или webhook
+# Сбрасывать ли накопившиеся апдейты при старте. По умолчанию нет: повторы отсекает журнал апдейтов
+DROP_PENDING_UPDATES = os.getenv("DROP_PENDING_UPDATES", "false").lower() in ("1", "true", "yes")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")                               # Публичный адрес за reverse proxy
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")                         # X-Telegram-Bot-Api-Secret-Token
+WEBAPP_HOST = os.getenv("WEBAPP_HOST", "127.0.0.1")
+WEBAPP_PORT = int(os.getenv("WEBAPP_PORT", "8080"))
+WEBHOOK_MAX_CONCURRENT = int(os.getenv("WEBHOOK_MAX_CONCURRENT", "50"))   # Одновременно обрабатываемых апдейтов
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "30"))   # Сколько ждать принятые апдейты при остановке
+# Многопроцессный режим: апдейты принимает один процесс и раздает воркерам по chat_id
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", "0"))                     # Процессов-воркеров (0 - один процесс)
+SHARD_SOCKET_DIR = os.getenv("SHARD_SOCKET_DIR", "")                     # Папка для Unix-сокетов (по умолчанию временная)
+SHARD_QUEUE_SIZE = int(os.getenv("SHARD_QUEUE_SIZE", "1000"))            # Апдейтов в очереди к одному воркеру
+# ------------------------------------
+
 # Базовая директория проекта (telegram_translator_bot)
 PROJECT_BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -17,14 +37,113 @@ PROJECT_BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 ASSETS_DIR = os.path.join(PROJECT_BASE_DIR, 'bot', 'assets')
 IMG_DIR = os.path.join(ASSETS_DIR, 'img')
 AUDIO_DIR = os.path.join(ASSETS_DIR, 'audio')
+TTS_DIR = os.path.join(ASSETS_DIR, 'tts')   # Кэш синтезированной речи
 
 # --- Новое: Настройки базы данных ---
 DB_DIR = os.path.join(PROJECT_BASE_DIR, 'bot', 'db') # Папка для БД
 DB_NAME = 'school_data.db'                          # Имя файла БД
 DB_PATH = os.path.join(DB_DIR, DB_NAME)             # Полный путь к БД
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "4"))  # Соединений в пуле
+DB_WRITE_BATCH_WINDOW = float(os.getenv("DB_WRITE_BATCH_WINDOW", "0"))    # Окно пакетной записи, сек
+DB_WRITE_BATCH_SIZE = int(os.getenv("DB_WRITE_BATCH_SIZE", "100"))         # Строк в одной транзакции
+# ------------------------------------
+
+# --- Журнал апдейтов (обработка после перезапуска без потерь и повторов) ---
+JOURNAL_RING_SIZE = int(os.getenv("JOURNAL_RING_SIZE", "10000"))        # Последних update_id в памяти для отсева повторов
+JOURNAL_FLUSH_DELAY = float(os.getenv("JOURNAL_FLUSH_DELAY", "0.05"))   # Задержка объединения отметок об обработке, сек
+JOURNAL_MAX_REPLAYS = int(os.getenv("JOURNAL_MAX_REPLAYS", "3"))        # Сколько раз повторять апдейт после падения бота
+JOURNAL_PRUNE_INTERVAL = float(os.getenv("JOURNAL_PRUNE_INTERVAL", "600"))  # Период очистки журнала, сек
+# ------------------------------------
+
+# --- Импорт и экспорт списков студентов ---
+ROSTER_BATCH_SIZE = int(os.getenv("ROSTER_BATCH_SIZE", "5000"))         # Строк в одной транзакции импорта
+ROSTER_MAX_ERRORS = int(os.getenv("ROSTER_MAX_ERRORS", "20"))           # Сколько ошибочных строк показывать в отчете
+ROSTER_MAX_FILE_MB = int(os.getenv("ROSTER_MAX_FILE_MB", "20"))         # Предельный размер файла, загружаемого в бота
+# ------------------------------------
+
+# --- Настройки хранилища FSM ---
+FSM_STATE_TTL = float(os.getenv("FSM_STATE_TTL", str(24 * 3600)))      # Через сколько секунд брошенный диалог удаляется
+FSM_FLUSH_DELAY = float(os.getenv("FSM_FLUSH_DELAY", "0.05"))          # Задержка объединения записей, сек
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "10000"))             # Записей в кэше состояний
+FSM_SWEEP_INTERVAL = float(os.getenv("FSM_SWEEP_INTERVAL", "600"))     # Период очистки брошенных диалогов, сек
+# ------------------------------------
+
+# --- Настройки сохранения фото ---
+PHOTO_WORKERS = int(os.getenv("PHOTO_WORKERS", "4"))                   # Одновременных скачиваний
+PHOTO_MAX_QUEUE = int(os.getenv("PHOTO_MAX_QUEUE", "200"))             # Фото в очереди на скачивание
+PHOTO_QUOTA_BYTES = int(os.getenv("PHOTO_QUOTA_MB", "1024")) * 1024 * 1024  # Квота папки img (0 - без квоты)
+PHOTO_PROCESS_WORKERS = int(os.getenv("PHOTO_PROCESS_WORKERS", "0"))   # Процессов обработки фото (0 - по числу ядер)
+PHOTO_PROCESS_MAX_QUEUE = int(os.getenv("PHOTO_PROCESS_MAX_QUEUE", "100"))  # Фото в очереди на обработку
+PHOTO_THUMB_SIZE = int(os.getenv("PHOTO_THUMB_SIZE", "320"))           # Длинная сторона превью, пикселей
+PHOTO_MAX_SIDE = int(os.getenv("PHOTO_MAX_SIDE", "1600"))              # Длинная сторона пережатой копии, пикселей
+PHOTO_JPEG_QUALITY = int(os.getenv("PHOTO_JPEG_QUALITY", "82"))        # Качество JPEG для копий
+# ------------------------------------
+
+# --- Настройки синтеза речи (gTTS) ---
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", "2"))                        # Одновременных синтезов
+TTS_TIMEOUT = float(os.getenv("TTS_TIMEOUT", "30"))                     # Таймаут одного синтеза, сек
+TTS_MAX_CHARS = int(os.getenv("TTS_MAX_CHARS", "500"))                  # Максимальная длина текста
+TTS_CACHE_BYTES = int(os.getenv("TTS_CACHE_MB", "200")) * 1024 * 1024   # Размер кэша озвучки на диске
+TTS_DEFAULT_LANG = os.getenv("TTS_DEFAULT_LANG", "ru")
+# ------------------------------------
+
+# --- Логирование ---
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.getenv("LOG_FILE", os.path.join(PROJECT_BASE_DIR, 'logs', 'bot.log'))  # JSON-строки ("" - не писать)
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_MB", "20")) * 1024 * 1024        # Размер файла до ротации
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))              # Сколько старых файлов хранить
+LOG_CONSOLE = os.getenv("LOG_CONSOLE", "true").lower() in ("1", "true", "yes")  # Дублировать логи в stderr
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))              # Записей в очереди к писателю
+LOG_MAX_FIELD_CHARS = int(os.getenv("LOG_MAX_FIELD_CHARS", "300"))      # Длиннее - обрезается
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))            # Доля INFO из частых логгеров
+LOG_SAMPLED_LOGGERS = tuple(name for name in os.getenv("LOG_SAMPLED_LOGGERS", "bot.handlers,aiogram.event")
+                            .replace(" ", "").split(",") if name)
+# ------------------------------------
+
+# --- Метрики ---
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))                      # Порт /metrics для Prometheus (0 - выключено)
+# ------------------------------------
+
+# --- Ограничение частоты запросов пользователей ---
+THROTTLE_USER_RATE = float(os.getenv("THROTTLE_USER_RATE", "1"))        # Сообщений в секунду от одного пользователя
+THROTTLE_USER_BURST = int(os.getenv("THROTTLE_USER_BURST", "5"))        # Сколько сообщений можно прислать подряд
+THROTTLE_HEAVY_RATE = float(os.getenv("THROTTLE_HEAVY_RATE", "0.5"))    # Перевод, фото, озвучка: запросов в секунду
+THROTTLE_HEAVY_BURST = int(os.getenv("THROTTLE_HEAVY_BURST", "3"))      # ... подряд
+THROTTLE_MAX_IN_FLIGHT = int(os.getenv("THROTTLE_MAX_IN_FLIGHT", "100"))  # Одновременно обрабатываемых апдейтов
+THROTTLE_HEAVY_SHARE = float(os.getenv("THROTTLE_HEAVY_SHARE", "0.7"))  # Доля слотов, доступная тяжелым обработчикам
+THROTTLE_NOTICE_INTERVAL = float(os.getenv("THROTTLE_NOTICE_INTERVAL", "10"))  # Не чаще одного предупреждения, сек
+# ------------------------------------
+
+# --- Настройки исходящих сообщений (лимиты Telegram) ---
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "30"))           # Сообщений в секунду на всего бота
+SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", "1"))                # Сообщений в секунду в личный чат
+SEND_GROUP_RATE = float(os.getenv("SEND_GROUP_RATE", str(20 / 60)))     # Сообщений в секунду в группу
+SEND_CHAT_BURST = int(os.getenv("SEND_CHAT_BURST", "3"))                # Сколько сообщений в чат можно отправить подряд
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", "3"))              # Повторов после 429 и неудачного соединения
+SEND_RETRY_JITTER = float(os.getenv("SEND_RETRY_JITTER", "0.5"))        # Случайная добавка к паузе перед повтором, сек
+# ------------------------------------
+
+# --- Настройки сервиса перевода ---
+TRANSLATE_MAX_WORKERS = int(os.getenv("TRANSLATE_MAX_WORKERS", "8"))    # Одновременных запросов к переводчику
+TRANSLATE_TIMEOUT = float(os.getenv("TRANSLATE_TIMEOUT", "10"))         # Таймаут одного перевода, сек
+TRANSLATE_MAX_QUEUE = int(os.getenv("TRANSLATE_MAX_QUEUE", "100"))      # Максимум ожидающих переводов
+# Окно сбора пачки, сек (0 - выкл.). У googletrans нет пакетного API: пачка только объединяет одинаковые тексты
+TRANSLATE_BATCH_WINDOW = float(os.getenv("TRANSLATE_BATCH_WINDOW", "0"))
+TRANSLATE_BATCH_SIZE = int(os.getenv("TRANSLATE_BATCH_SIZE", "20"))     # Максимум текстов в пачке
+TRANSLATE_CACHE_SIZE = int(os.getenv("TRANSLATE_CACHE_SIZE", "5000"))   # Записей в памяти (LRU)
+TRANSLATE_CACHE_TTL = float(os.getenv("TRANSLATE_CACHE_TTL", "3600"))   # Время жизни записи в памяти, сек
+TRANSLATE_CACHE_DB_TTL = float(os.getenv("TRANSLATE_CACHE_DB_TTL", str(30 * 24 * 3600)))  # ... в БД, сек
+# Определять язык локально: не отправлять переводчику английский текст, эмодзи и ссылки
+TRANSLATE_LOCAL_DETECT = os.getenv("TRANSLATE_LOCAL_DETECT", "true").lower() in ("1", "true", "yes")
+TRANSLATE_LONG_TEXT = int(os.getenv("TRANSLATE_LONG_TEXT", "1000"))      # Длиннее - перевод по фрагментам
+TRANSLATE_CHUNK_CHARS = int(os.getenv("TRANSLATE_CHUNK_CHARS", "600"))   # Максимальная длина фрагмента
+TRANSLATE_CHUNK_PARALLEL = int(os.getenv("TRANSLATE_CHUNK_PARALLEL", "3"))  # Одновременно переводимых фрагментов одного текста
+TRANSLATE_CHUNK_RETRIES = int(os.getenv("TRANSLATE_CHUNK_RETRIES", "2"))  # Повторов для фрагмента после ошибки
 # ------------------------------------
 
 # Убедимся, что директории существуют
 os.makedirs(IMG_DIR, exist_ok=True)
 os.makedirs(AUDIO_DIR, exist_ok=True)
+os.makedirs(TTS_DIR, exist_ok=True)
 os.makedirs(DB_DIR, exist_ok=True) # Создаем папку для БД
\ No newline at end of file
@@ -1,38 +1,534 @@
-import aiosqlite
 import logging
-from bot.config import DB_PATH # Импортируем путь к БД из конфига
+from collections import namedtuple
+from bot.config import DB_PATH, DB_POOL_SIZE, DB_WRITE_BATCH_WINDOW, DB_WRITE_BATCH_SIZE
+from bot.db.pool import ConnectionPool
+from bot.db.writer import BatchWriter
 
-async def init_db():
-    """Инициализирует базу данных и создает таблицу студентов, если она не существует."""
+# Пул соединений и пакетная запись студентов создаются в init_db() и закрываются в close_db()
+_pool = None
+_student_writer = None
+
+# Строка таблицы students для API чтения
+Student = namedtuple('Student', ['id', 'name', 'age', 'grade'])
+# Ячейка сводки student_stats: сколько студентов данного возраста в классе
+StudentStat = namedtuple('StudentStat', ['grade', 'age', 'count'])
+
+# Сводка по классам и возрастам обновляется триггерами при любой записи в students
+# (add_student, insert_students, ручные правки), поэтому отчет не сканирует students.
+# Пустые grade и age хранятся как '' и 0: в первичном ключе не может быть NULL.
+_STUDENT_STATS_DDL = (
+    '''
+    CREATE TABLE IF NOT EXISTS student_stats (
+        grade TEXT NOT NULL,
+        age INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (grade, age)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_student_stats_insert AFTER INSERT ON students
+    BEGIN
+        INSERT INTO student_stats (grade, age, count) VALUES (IFNULL(NEW.grade, ''), IFNULL(NEW.age, 0), 1)
+        ON CONFLICT (grade, age) DO UPDATE SET count = count + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_student_stats_delete AFTER DELETE ON students
+    BEGIN
+        UPDATE student_stats SET count = count - 1
+        WHERE grade = IFNULL(OLD.grade, '') AND age = IFNULL(OLD.age, 0);
+        DELETE FROM student_stats
+        WHERE grade = IFNULL(OLD.grade, '') AND age = IFNULL(OLD.age, 0) AND count <= 0;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_student_stats_update AFTER UPDATE OF grade, age ON students
+    WHEN OLD.grade IS NOT NEW.grade OR OLD.age IS NOT NEW.age
+    BEGIN
+        UPDATE student_stats SET count = count - 1
+        WHERE grade = IFNULL(OLD.grade, '') AND age = IFNULL(OLD.age, 0);
+        DELETE FROM student_stats
+        WHERE grade = IFNULL(OLD.grade, '') AND age = IFNULL(OLD.age, 0) AND count <= 0;
+        INSERT INTO student_stats (grade, age, count) VALUES (IFNULL(NEW.grade, ''), IFNULL(NEW.age, 0), 1)
+        ON CONFLICT (grade, age) DO UPDATE SET count = count + 1;
+    END
+    ''',
+)
+_STUDENT_STATS_FILL = '''
+    INSERT INTO student_stats (grade, age, count)
+    SELECT IFNULL(grade, ''), IFNULL(age, 0), COUNT(*) FROM students GROUP BY 1, 2
+'''
+
+
+def make_name_key(name: str) -> str:
+    """Ключ для поиска по началу имени без учета регистра (lower() в SQLite не знает кириллицу)."""
+    return name.strip().lower().replace('ё', 'е')
+
+
+def get_pool() -> ConnectionPool:
+    """Возвращает открытый пул соединений."""
+    if _pool is None or not _pool.is_open:
+        raise RuntimeError("База данных не инициализирована: вызовите init_db()")
+    return _pool
+
+
+async def init_db(create_schema: bool = True):
+    """
+    Открывает пул соединений с базой данных и создает таблицы, если они не существуют.
+    Вызывается один раз при старте бота. create_schema=False только открывает пул:
+    так запускаются воркеры шардов, схему и миграции для них применяет фронт.
+    """
+    global _pool, _student_writer
     try:
-        async with aiosqlite.connect(DB_PATH) as db:
-            # Создаем таблицу students, если она еще не существует
-            await db.execute('''
-                CREATE TABLE IF NOT EXISTS students (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    age INTEGER,
-                    grade TEXT
-                )
-            ''')
-            await db.commit()
-        logging.info(f"База данных инициализирована по пути: {DB_PATH}")
+        if _pool is None or not _pool.is_open:
+            _pool = ConnectionPool(DB_PATH, size=DB_POOL_SIZE)
+            await _pool.open()
+        if create_schema:
+            await _create_schema()
+        if _student_writer is None:
+            _student_writer = BatchWriter(
+                _pool,
+                # Повтор того же апдейта не создает второго студента (см. idx_students_update)
+                'INSERT INTO students (name, age, grade, name_key, update_id) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (update_id) WHERE update_id IS NOT NULL DO NOTHING',
+                window=DB_WRITE_BATCH_WINDOW,
+                max_size=DB_WRITE_BATCH_SIZE,
+                name="students",
+            )
+            _student_writer.start()
+        logging.info("База данных инициализирована по пути: %s", DB_PATH)
     except Exception as e:
-        logging.error(f"Ошибка при инициализации базы данных: {e}", exc_info=True)
+        logging.error("Ошибка при инициализации базы данных: %s", e, exc_info=True)
         raise # Поднимаем исключение дальше, чтобы бот не запустился с нерабочей БД
 
-async def add_student(name: str, age: int, grade: str):
-    """Добавляет нового студента в базу данных."""
-    try:
-        async with aiosqlite.connect(DB_PATH) as db:
-            # Вставляем данные студента
-            await db.execute(
-                'INSERT INTO students (name, age, grade) VALUES (?, ?, ?)',
-                (name, age, grade)
+async def _create_schema():
+    """Создает таблицы и индексы и применяет миграции."""
+    async with _pool.acquire() as db:
+        # Создаем таблицу students, если она еще не существует
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS students (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                age INTEGER,
+                grade TEXT
             )
-            await db.commit()
-        logging.info(f"Студент {name} (Возраст: {age}, Класс: {grade}) добавлен в базу данных.")
-        return True # Возвращаем True в случае успеха
+        ''')
+        await _migrate_students(db)
+        # Кэш переводов: ключ - нормализованный текст и язык перевода
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS translations (
+                source_text TEXT NOT NULL,
+                dest TEXT NOT NULL,
+                translated_text TEXT NOT NULL,
+                src TEXT,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (source_text, dest)
+            )
+        ''')
+        # Состояния FSM: одна строка на ключ чат/пользователь
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS fsm_states (
+                key TEXT PRIMARY KEY,
+                state TEXT,
+                data TEXT,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        await db.execute('CREATE INDEX IF NOT EXISTS idx_fsm_states_updated ON fsm_states (updated_at)')
+        # Фото: файлы хранятся по хэшу содержимого, file_unique_id ссылается на хэш
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS photo_blobs (
+                hash TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        await db.execute('CREATE INDEX IF NOT EXISTS idx_photo_blobs_access ON photo_blobs (last_access)')
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS photos (
+                file_unique_id TEXT PRIMARY KEY,
+                hash TEXT NOT NULL REFERENCES photo_blobs (hash) ON DELETE CASCADE,
+                created_at REAL NOT NULL
+            )
+        ''')
+        await db.execute('CREATE INDEX IF NOT EXISTS idx_photos_hash ON photos (hash)')
+        await _migrate_photo_blobs(db)
+        # Производные файлы фото (превью, пережатая копия) с размерами; удаляются вместе с оригиналом
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS photo_variants (
+                hash TEXT NOT NULL REFERENCES photo_blobs (hash) ON DELETE CASCADE,
+                kind TEXT NOT NULL,
+                path TEXT NOT NULL,
+                width INTEGER NOT NULL,
+                height INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (hash, kind)
+            )
+        ''')
+        # Статические файлы, уже загруженные в Telegram: отправляются повторно по file_id
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS media_files (
+                path TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                mtime REAL NOT NULL,
+                size INTEGER NOT NULL,
+                file_id TEXT NOT NULL,
+                uploaded_at REAL NOT NULL,
+                PRIMARY KEY (path, kind)
+            )
+        ''')
+        # Журнал апдейтов (bot/db/journal.py): JSON хранится, пока апдейт не обработан
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS update_journal (
+                update_id INTEGER PRIMARY KEY,
+                payload TEXT,
+                accepted_at REAL NOT NULL,
+                done_at REAL,
+                attempts INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        await db.execute('CREATE INDEX IF NOT EXISTS idx_update_journal_pending ON update_journal (update_id) '
+                         'WHERE payload IS NOT NULL')
+        await db.commit()
+
+async def _migrate_students(db):
+    """Добавляет колонки name_key и update_id в старые базы и создает индексы для поиска."""
+    async with db.execute('PRAGMA table_info(students)') as cursor:
+        columns = {row[1] for row in await cursor.fetchall()}
+    if 'name_key' not in columns:
+        await db.execute('ALTER TABLE students ADD COLUMN name_key TEXT')
+        async with db.execute('SELECT id, name FROM students') as cursor:
+            rows = await cursor.fetchall()
+        await db.executemany(
+            'UPDATE students SET name_key = ? WHERE id = ?',
+            [(make_name_key(name), student_id) for student_id, name in rows]
+        )
+        logging.info("Таблица students обновлена: заполнен name_key для %s записей", len(rows))
+    if 'update_id' not in columns:
+        await db.execute('ALTER TABLE students ADD COLUMN update_id INTEGER')
+    # Апдейт, которым зарегистрирован студент: одна регистрация на апдейт, даже если он обработан дважды.
+    # У импортированных из файла update_id нет
+    await db.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_students_update ON students (update_id) '
+                     'WHERE update_id IS NOT NULL')
+    # Индексы покрывают сортировку (name_key, id), поэтому страница читается без сортировки
+    await db.execute('CREATE INDEX IF NOT EXISTS idx_students_name_key ON students (name_key, id)')
+    await db.execute('CREATE INDEX IF NOT EXISTS idx_students_grade ON students (grade, name_key, id)')
+    await db.execute('CREATE INDEX IF NOT EXISTS idx_students_age ON students (age, name_key, id)')
+    # Сводка для /report: в старых базах заполняется один раз полным проходом
+    async with db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'student_stats'") as cursor:
+        stats_exist = await cursor.fetchone() is not None
+    for statement in _STUDENT_STATS_DDL:
+        await db.execute(statement)
+    if not stats_exist:
+        await db.execute(_STUDENT_STATS_FILL)
+        logging.info("Создана сводка student_stats по существующим записям students")
+
+async def _migrate_photo_blobs(db):
+    """Добавляет в старые базы колонки с размерами оригинала (заполняются после обработки фото)."""
+    async with db.execute('PRAGMA table_info(photo_blobs)') as cursor:
+        columns = {row[1] for row in await cursor.fetchall()}
+    for column in ('width', 'height'):
+        if column not in columns:
+            await db.execute(f'ALTER TABLE photo_blobs ADD COLUMN {column} INTEGER')
+
+async def close_db():
+    """Дописывает очередь регистраций и закрывает пул соединений. Вызывается при остановке бота."""
+    global _pool, _student_writer
+    if _student_writer is not None:
+        await _student_writer.close()
+        _student_writer = None
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+async def add_student(name: str, age: int, grade: str, update_id: int = None):
+    """
+    Добавляет нового студента в базу данных.
+    Запись ставится в очередь пакетной записи и сохраняется вместе с другими
+    регистрациями одной транзакцией; результат возвращается после commit.
+    update_id - апдейт, завершивший регистрацию: если он обрабатывается повторно
+    (после перезапуска), второй записи не будет, а результат - снова True.
+    """
+    try:
+        if _student_writer is None:
+            raise RuntimeError("База данных не инициализирована: вызовите init_db()")
+        success = await _student_writer.submit((name, age, grade, make_name_key(name), update_id))
     except Exception as e:
-        logging.error(f"Ошибка при добавлении студента {name}: {e}", exc_info=True)
-        return False # Возвращаем False в случае ошибки
\ No newline at end of file
+        logging.error("Ошибка при добавлении студента (апдейт %s): %s", update_id, e, exc_info=True)
+        return False # Возвращаем False в случае ошибки
+
+    if success:
+        logging.info("Студент (апдейт %s) добавлен в базу данных.", update_id)
+    else:
+        logging.error("Студент (апдейт %s) не сохранен в базе данных.", update_id)
+    return success
+
+async def insert_students(rows) -> int:
+    """
+    Вставляет пачку студентов [(name, age, grade), ...] одной транзакцией через executemany.
+    Для массового импорта: в отличие от add_student, строки не проходят через очередь регистраций.
+    """
+    params = [(name, age, grade, make_name_key(name)) for name, age, grade in rows]
+    async with get_pool().acquire() as db:
+        await db.executemany('INSERT INTO students (name, age, grade, name_key) VALUES (?, ?, ?, ?)', params)
+        await db.commit()
+    return len(params)
+
+async def iter_student_batches(batch_size: int = 5000):
+    """
+    Все студенты по порядку id, пачками по batch_size (списки Student).
+    Соединение занимается только на время чтения пачки, память не зависит от размера таблицы.
+    """
+    after_id = 0
+    while True:
+        async with get_pool().acquire() as db:
+            async with db.execute('SELECT id, name, age, grade FROM students WHERE id > ? ORDER BY id LIMIT ?',
+                                  (after_id, batch_size)) as cursor:
+                rows = await cursor.fetchall()
+        if not rows:
+            return
+        yield [Student(*row) for row in rows]
+        after_id = rows[-1][0]
+
+async def search_students(name_prefix: str = None, grade: str = None, min_age: int = None,
+                          max_age: int = None, after_id: int = None, after_key: str = None, limit: int = 10):
+    """
+    Ищет студентов по началу имени, классу и диапазону возраста.
+    Результат отсортирован по имени; для следующей страницы передайте
+    after_id и after_key - id и make_name_key(name) последнего студента предыдущей
+    страницы (keyset-пагинация). Ключ берется из самой записи, пока она есть,
+    так что after_key может быть обрезан; если запись удалена, сравнение идет с after_key.
+    Возвращает список Student.
+    """
+    conditions = []
+    params = []
+    if name_prefix:
+        # Диапазон по ключу вместо LIKE, чтобы использовался индекс
+        key = make_name_key(name_prefix)
+        conditions.append('name_key >= ? AND name_key < ?')
+        params += [key, key + '\U0010ffff']
+    if grade:
+        conditions.append('grade = ?')
+        params.append(grade.strip())
+    if min_age is not None:
+        conditions.append('age >= ?')
+        params.append(min_age)
+    if max_age is not None:
+        conditions.append('age <= ?')
+        params.append(max_age)
+    if after_id is not None:
+        conditions.append('(name_key, id) > (COALESCE((SELECT name_key FROM students WHERE id = ?), ?), ?)')
+        params += [after_id, after_key, after_id]
+
+    sql = 'SELECT id, name, age, grade FROM students'
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    sql += ' ORDER BY name_key, id LIMIT ?'
+    params.append(limit)
+
+    async with get_pool().acquire() as db:
+        async with db.execute(sql, params) as cursor:
+            return [Student(*row) for row in await cursor.fetchall()]
+
+async def get_student_stats(grade: str = None):
+    """
+    Сводка по студентам: список StudentStat (класс, возраст, число студентов).
+    Читается из student_stats, поэтому время не зависит от числа студентов.
+    """
+    sql = 'SELECT grade, age, count FROM student_stats'
+    params = ()
+    if grade:
+        sql += ' WHERE grade = ?'
+        params = (grade.strip(),)
+    async with get_pool().acquire() as db:
+        async with db.execute(sql, params) as cursor:
+            return [StudentStat(*row) for row in await cursor.fetchall()]
+
+async def rebuild_student_stats():
+    """
+    Пересчитывает student_stats полным проходом по students (проверка согласованности).
+    Возвращает (ячеек в сводке, сколько ячеек расходилось с пересчетом).
+    """
+    async with get_pool().acquire() as db:
+        # IMMEDIATE: регистрации ждут окончания пересчета, и сравнение идет с той же таблицей
+        await db.execute('BEGIN IMMEDIATE')
+        async with db.execute('SELECT grade, age, count FROM student_stats') as cursor:
+            before = {(grade, age): count for grade, age, count in await cursor.fetchall()}
+        await db.execute('DELETE FROM student_stats')
+        await db.execute(_STUDENT_STATS_FILL)
+        async with db.execute('SELECT grade, age, count FROM student_stats') as cursor:
+            after = {(grade, age): count for grade, age, count in await cursor.fetchall()}
+        await db.commit()
+    mismatched = sum(before.get(key) != after.get(key) for key in before.keys() | after.keys())
+    if mismatched:
+        logging.warning("Сводка student_stats расходилась с таблицей students в %s ячейках и пересчитана", mismatched)
+    return len(after), mismatched
+
+async def get_cached_translation(source_text: str, dest: str):
+    """Возвращает (translated_text, src, created_at) из кэша переводов или None."""
+    async with get_pool().acquire() as db:
+        async with db.execute(
+            'SELECT translated_text, src, created_at FROM translations WHERE source_text = ? AND dest = ?',
+            (source_text, dest)
+        ) as cursor:
+            return await cursor.fetchone()
+
+async def save_cached_translation(source_text: str, dest: str, translated_text: str, src: str, created_at: float):
+    """Сохраняет перевод в постоянный кэш, перезаписывая старую запись."""
+    async with get_pool().acquire() as db:
+        await db.execute(
+            'INSERT OR REPLACE INTO translations (source_text, dest, translated_text, src, created_at) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (source_text, dest, translated_text, src, created_at)
+        )
+        await db.commit()
+
+async def get_photo_blob(file_unique_id: str):
+    """Возвращает (hash, path) сохраненного фото по file_unique_id или None."""
+    async with get_pool().acquire() as db:
+        async with db.execute(
+            'SELECT b.hash, b.path FROM photos p JOIN photo_blobs b ON b.hash = p.hash WHERE p.file_unique_id = ?',
+            (file_unique_id,)
+        ) as cursor:
+            return await cursor.fetchone()
+
+async def touch_photo_blob(file_hash: str, accessed_at: float):
+    """Обновляет время последнего обращения к файлу (для вытеснения по LRU)."""
+    async with get_pool().acquire() as db:
+        await db.execute('UPDATE photo_blobs SET last_access = ? WHERE hash = ?', (accessed_at, file_hash))
+        await db.commit()
+
+async def save_photo(file_unique_id: str, file_hash: str, path: str, size: int, saved_at: float) -> bool:
+    """
+    Записывает фото в индекс. Возвращает True, если файл с таким хэшем появился впервые,
+    и False, если такой файл уже был сохранен (например, из другого пересланного сообщения).
+    """
+    async with get_pool().acquire() as db:
+        cursor = await db.execute(
+            'INSERT OR IGNORE INTO photo_blobs (hash, path, size, last_access) VALUES (?, ?, ?, ?)',
+            (file_hash, path, size, saved_at)
+        )
+        is_new = cursor.rowcount == 1
+        if not is_new:
+            await db.execute('UPDATE photo_blobs SET last_access = ? WHERE hash = ?', (saved_at, file_hash))
+        await db.execute(
+            'INSERT OR REPLACE INTO photos (file_unique_id, hash, created_at) VALUES (?, ?, ?)',
+            (file_unique_id, file_hash, saved_at)
+        )
+        await db.commit()
+        return is_new
+
+async def get_photo_storage_size() -> int:
+    """Суммарный размер сохраненных фото и их производных файлов в байтах."""
+    async with get_pool().acquire() as db:
+        async with db.execute(
+            'SELECT (SELECT COALESCE(SUM(size), 0) FROM photo_blobs) + (SELECT COALESCE(SUM(size), 0) FROM photo_variants)'
+        ) as cursor:
+            row = await cursor.fetchone()
+            return row[0]
+
+async def pop_photo_blobs_over_quota(quota: int, limit: int):
+    """
+    Если фото и их производные файлы занимают больше quota байт, удаляет из индекса давно
+    не использовавшиеся файлы (не больше limit за раз, но не больше, чем нужно для
+    возврата в квоту) вместе со ссылками на них и производными файлами.
+    Возвращает (занято байт после удаления, список (hash, paths, size)): пути оригинала
+    и производных файлов и их суммарный размер; сами файлы удаляет вызывающий.
+    """
+    async with get_pool().acquire() as db:
+        # IMMEDIATE: занятое место считается и освобождается в одной транзакции, так что
+        # процессы шардов, сохраняющие фото в ту же папку, не удаляют лишнего
+        await db.execute('BEGIN IMMEDIATE')
+        async with db.execute(
+            'SELECT (SELECT COALESCE(SUM(size), 0) FROM photo_blobs) + (SELECT COALESCE(SUM(size), 0) FROM photo_variants)'
+        ) as cursor:
+            used = (await cursor.fetchone())[0]
+        if used <= quota:
+            await db.commit()
+            return used, []
+        blobs = {}
+        freed = 0
+        async with db.execute(
+            'SELECT b.hash, b.path, b.size, (SELECT COALESCE(SUM(v.size), 0) FROM photo_variants v WHERE v.hash = b.hash) '
+            'FROM photo_blobs b ORDER BY b.last_access LIMIT ?', (limit,)
+        ) as cursor:
+            async for file_hash, path, size, variants_size in cursor:
+                blobs[file_hash] = ([path], size)
+                freed += size + variants_size
+                if used - freed <= quota:
+                    break
+        if blobs:
+            placeholders = ', '.join('?' * len(blobs))
+            async with db.execute(
+                f'SELECT hash, path, size FROM photo_variants WHERE hash IN ({placeholders})', list(blobs)
+            ) as cursor:
+                for file_hash, path, size in await cursor.fetchall():
+                    paths, total = blobs[file_hash]
+                    paths.append(path)
+                    blobs[file_hash] = (paths, total + size)
+            await db.executemany('DELETE FROM photo_blobs WHERE hash = ?', [(file_hash,) for file_hash in blobs])
+        await db.commit()
+        popped = [(file_hash, paths, size) for file_hash, (paths, size) in blobs.items()]
+        return used - sum(size for _, _, size in popped), popped
+
+async def save_photo_variants(file_hash: str, width: int, height: int, variants, created_at: float):
+    """
+    Записывает размеры оригинала и производные файлы фото (список Variant из bot.services.imaging).
+    Возвращает, на сколько байт выросло место под производные файлы (при повторной обработке
+    учитываются замененные копии), или None, если оригинал уже удален из индекса
+    (например, вытеснен по квоте).
+    """
+    async with get_pool().acquire() as db:
+        cursor = await db.execute('UPDATE photo_blobs SET width = ?, height = ? WHERE hash = ?',
+                                  (width, height, file_hash))
+        if cursor.rowcount == 0:
+            return None
+        async with db.execute(
+            f'SELECT COALESCE(SUM(size), 0) FROM photo_variants WHERE hash = ? AND kind IN ({", ".join("?" * len(variants))})',
+            (file_hash, *(v.kind for v in variants))
+        ) as cursor:
+            replaced = (await cursor.fetchone())[0]
+        await db.executemany(
+            'INSERT OR REPLACE INTO photo_variants (hash, kind, path, width, height, size, created_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [(file_hash, v.kind, v.path, v.width, v.height, v.size, created_at) for v in variants]
+        )
+        await db.commit()
+        return sum(v.size for v in variants) - replaced
+
+async def get_photo_variants(file_hash: str) -> dict:
+    """Производные файлы фото: {вид: (path, width, height, size)}; пустой словарь, если фото еще не обработано."""
+    async with get_pool().acquire() as db:
+        async with db.execute(
+            'SELECT kind, path, width, height, size FROM photo_variants WHERE hash = ?', (file_hash,)
+        ) as cursor:
+            return {row[0]: tuple(row[1:]) for row in await cursor.fetchall()}
+
+async def get_media_file(path: str, kind: str):
+    """Возвращает (content_hash, mtime, size, file_id) загруженного файла или None."""
+    async with get_pool().acquire() as db:
+        async with db.execute(
+            'SELECT content_hash, mtime, size, file_id FROM media_files WHERE path = ? AND kind = ?',
+            (path, kind)
+        ) as cursor:
+            return await cursor.fetchone()
+
+async def save_media_file(path: str, kind: str, content_hash: str, mtime: float, size: int, file_id: str,
+                          uploaded_at: float):
+    """Запоминает file_id, полученный от Telegram после загрузки файла."""
+    async with get_pool().acquire() as db:
+        await db.execute(
+            'INSERT OR REPLACE INTO media_files (path, kind, content_hash, mtime, size, file_id, uploaded_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (path, kind, content_hash, mtime, size, file_id, uploaded_at)
+        )
+        await db.commit()
+
+async def delete_media_file(path: str, kind: str):
+    """Забывает file_id (например, если Telegram его отклонил)."""
+    async with get_pool().acquire() as db:
+        await db.execute('DELETE FROM media_files WHERE path = ? AND kind = ?', (path, kind))
+        await db.commit()
@@ -0,0 +1,183 @@
+import json
+import time
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StorageKey, StateType
+
+from bot.services.cache import LRUCache
+
+# Пустая запись: пользователь не находится ни в каком состоянии
+EMPTY_RECORD = (None, {})
+
+
+def storage_key_to_str(key: StorageKey) -> str:
+    return f"{key.bot_id}:{key.chat_id}:{key.user_id}:{key.thread_id or ''}:{key.destiny}"
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    FSM-хранилище aiogram в таблице fsm_states локальной SQLite.
+
+    Перед базой стоит кэш с объединением записей: изменения копятся в памяти
+    flush_delay секунд и сбрасываются одной транзакцией, поэтому пара
+    update_data + set_state в одном обработчике стоит одну запись.
+    Отсутствующие записи тоже кэшируются, так что проверка состояния
+    для пользователей вне диалога не ходит в базу.
+    Брошенные состояния удаляются фоновой задачей по истечении ttl.
+    """
+
+    def __init__(self, pool, ttl: float, flush_delay: float = 0.05, cache_size: int = 10000,
+                 sweep_interval: float = 600):
+        self.pool = pool
+        self.ttl = ttl
+        self.flush_delay = flush_delay
+        self.sweep_interval = sweep_interval
+        self._cache = LRUCache(max_size=cache_size, ttl=ttl)
+        self._dirty = {}      # key -> (state, data), еще не записано
+        self._flushing = {}   # key -> (state, data), записывается прямо сейчас
+        self._flush_handle = None
+        self._flush_tasks = set()
+        self._flush_lock = asyncio.Lock()
+        self._sweeper = None
+        self.writes = 0
+        self.flushes = 0
+
+    def start(self):
+        """Запускает фоновое удаление брошенных состояний."""
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_loop(), name="fsm-sweeper")
+
+    # --- Интерфейс BaseStorage ---
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state = state.state if isinstance(state, State) else state
+        _, data = await self._get_record(key)
+        self._put(key, (state, data))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self._get_record(key)
+        return state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        state, _ = await self._get_record(key)
+        self._put(key, (state, data.copy()))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data = await self._get_record(key)
+        return data.copy()
+
+    async def close(self) -> None:
+        """Останавливает удаление по ttl и записывает все накопленные изменения."""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+        await self.flush()
+        logging.info("FSM-хранилище закрыто: %s изменений записано за %s транзакций", self.writes, self.flushes)
+
+    # --- Кэш и запись ---
+    async def _get_record(self, key: StorageKey):
+        key_str = storage_key_to_str(key)
+        record = self._dirty.get(key_str) or self._flushing.get(key_str) or self._cache.get(key_str)
+        if record is not None:
+            return record
+
+        async with self.pool.acquire() as db:
+            async with db.execute(
+                'SELECT state, data, updated_at FROM fsm_states WHERE key = ?', (key_str,)
+            ) as cursor:
+                row = await cursor.fetchone()
+        if row is None or time.time() - row[2] > self.ttl:
+            record = EMPTY_RECORD
+        else:
+            record = (row[0], json.loads(row[1]) if row[1] else {})
+        self._cache.set(key_str, record)
+        return record
+
+    def _put(self, key: StorageKey, record):
+        self._dirty[storage_key_to_str(key)] = record
+        if self._flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(self.flush_delay, self._schedule_flush)
+
+    def _schedule_flush(self):
+        self._flush_handle = None
+        task = asyncio.create_task(self.flush())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def flush(self):
+        """Записывает накопленные изменения одной транзакцией."""
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            self._flushing, self._dirty = self._dirty, {}
+            now = time.time()
+            upserts = []
+            deletes = []
+            for key_str, (state, data) in self._flushing.items():
+                if state is None and not data:
+                    deletes.append((key_str,))
+                else:
+                    upserts.append((key_str, state, json.dumps(data, ensure_ascii=False), now))
+            try:
+                async with self.pool.acquire() as db:
+                    if upserts:
+                        await db.executemany(
+                            'INSERT INTO fsm_states (key, state, data, updated_at) VALUES (?, ?, ?, ?) '
+                            'ON CONFLICT(key) DO UPDATE SET state = excluded.state, data = excluded.data, '
+                            'updated_at = excluded.updated_at',
+                            upserts
+                        )
+                    if deletes:
+                        await db.executemany('DELETE FROM fsm_states WHERE key = ?', deletes)
+                    await db.commit()
+            except Exception as e:
+                logging.error("Ошибка записи FSM-состояний: %s", e, exc_info=True)
+                # Возвращаем несохраненные изменения, если их не перезаписали новые
+                for key_str, record in self._flushing.items():
+                    self._dirty.setdefault(key_str, record)
+                self._flushing = {}
+                if self._flush_handle is None:
+                    loop = asyncio.get_running_loop()
+                    self._flush_handle = loop.call_later(max(self.flush_delay, 1.0), self._schedule_flush)
+                return
+
+            for key_str, record in self._flushing.items():
+                self._cache.set(key_str, record)
+            self.writes += len(self._flushing)
+            self.flushes += 1
+            self._flushing = {}
+
+    async def state_counts(self) -> Dict[str, int]:
+        """Сколько пользователей сейчас в каждом состоянии (для метрик)."""
+        await self.flush()
+        async with self.pool.acquire() as db:
+            cursor = await db.execute(
+                'SELECT state, COUNT(*) FROM fsm_states WHERE state IS NOT NULL GROUP BY state'
+            )
+            return dict(await cursor.fetchall())
+
+    # --- Удаление брошенных состояний ---
+    async def sweep(self) -> int:
+        """Удаляет состояния, которые не менялись дольше ttl. Возвращает число удаленных."""
+        async with self.pool.acquire() as db:
+            cursor = await db.execute('DELETE FROM fsm_states WHERE updated_at < ?', (time.time() - self.ttl,))
+            await db.commit()
+            return cursor.rowcount
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                removed = await self.sweep()
+                if removed:
+                    logging.info("Удалено брошенных FSM-состояний: %s", removed)
+            except Exception as e:
+                logging.error("Ошибка при удалении брошенных FSM-состояний: %s", e)
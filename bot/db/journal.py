@@ -0,0 +1,289 @@
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+
+from bot.db.writer import BatchWriter
+
+# Telegram нумерует апдейты подряд, но после недели без апдейтов следующий номер выбирается
+# случайно: старые номера больше ничего не говорят о новых
+ID_RESET_AFTER = 7 * 24 * 3600
+
+
+class UpdateJournal(BaseMiddleware):
+    """
+    Журнал апдейтов в таблице update_journal: при перезапуске апдейты не теряются
+    и не обрабатываются дважды.
+
+    accept() записывает апдейт вместе с JSON до того, как Telegram получит
+    подтверждение (следующий offset в getUpdates или ответ на вебхук); записи
+    разных апдейтов идут одной транзакцией (group commit). Подключенный как
+    outer-middleware на dp.update, журнал отмечает апдейт обработанным, когда
+    диспетчер с ним закончил; отметки копятся flush_delay секунд и пишутся пачкой.
+    После падения replay() заново передает в обработку принятые, но не
+    обработанные апдейты, а полинг продолжается с resume_offset().
+
+    Повторы (Telegram переотправил вебхук, не дождавшись ответа, или снова выдал
+    апдейт, принятый до падения) отсекаются за O(1): в памяти хранится кольцо
+    последних ring_size принятых update_id и граница - номера не больше нее уже
+    вытеснены из кольца, то есть давно приняты. В таблице остаются только
+    необработанные апдейты и последние ring_size записей: из них кольцо
+    восстанавливается при старте.
+
+    Принимает апдейты, повторяет и чистит журнал только процесс, вызвавший
+    start(). Без start() журнал лишь отмечает обработку - так работают воркеры
+    шардов, пока журналом владеет фронт.
+    """
+
+    def __init__(self, pool, ring_size: int = 10000, flush_delay: float = 0.05, max_replays: int = 3,
+                 prune_interval: float = 600, batch_size: int = 100):
+        self.pool = pool
+        self.ring_size = ring_size
+        self.flush_delay = flush_delay
+        self.max_replays = max_replays
+        self.prune_interval = prune_interval
+        self._ring = deque()
+        self._seen = set()
+        self._floor = None            # Номера не больше этого вытеснены из кольца
+        self.high_water = None        # Наибольший принятый update_id
+        self._last_accepted_at = 0.0
+        self._writer = BatchWriter(
+            pool,
+            'INSERT OR IGNORE INTO update_journal (update_id, payload, accepted_at) VALUES (?, ?, ?)',
+            window=0,
+            max_size=batch_size,
+            name="update_journal",
+        )
+        self._done = []               # (done_at, update_id), еще не записано
+        self._flush_handle = None
+        self._flush_tasks = set()
+        self._flush_lock = asyncio.Lock()
+        self._pruner = None
+        self._started = False
+        self.accepted = 0
+        self.duplicates = 0
+        self.completed = 0
+        self.replayed = 0
+        self.dropped = 0
+
+    async def start(self):
+        """Восстанавливает кольцо и границу из таблицы и запускает запись журнала."""
+        async with self.pool.acquire() as db:
+            async with db.execute('SELECT MAX(accepted_at) FROM update_journal') as cursor:
+                self._last_accepted_at = (await cursor.fetchone())[0] or 0.0
+            if time.time() - self._last_accepted_at > ID_RESET_AFTER:
+                # Номера могли начаться заново: обработанные записи больше не защищают от повторов
+                cursor = await db.execute('DELETE FROM update_journal WHERE payload IS NULL')
+                await db.commit()
+                if cursor.rowcount:
+                    logging.info("Журнал апдейтов не пополнялся больше недели, очищено записей: %s", cursor.rowcount)
+            async with db.execute(
+                'SELECT update_id FROM update_journal ORDER BY update_id DESC LIMIT ?', (self.ring_size,)
+            ) as cursor:
+                ids = [row[0] for row in await cursor.fetchall()]
+        for update_id in reversed(ids):
+            self._remember(update_id)
+        if len(ids) == self.ring_size:
+            # Более старые записи удалены очисткой: все они давно приняты
+            self._floor = ids[-1] - 1
+        self._writer.start()
+        self._started = True
+        if self._pruner is None:
+            self._pruner = asyncio.create_task(self._prune_loop(), name="journal-pruner")
+        logging.info("Журнал апдейтов: последний принятый апдейт %s, в кольце %s", self.high_water, len(ids))
+
+    # --- Прием апдейтов ---
+    def seen(self, update_id: int) -> bool:
+        """Принят ли апдейт раньше (O(1), без обращения к базе)."""
+        return update_id in self._seen or (self._floor is not None and update_id <= self._floor)
+
+    async def _reset(self):
+        """Забывает старые номера: кольцо, границу и обработанные записи в таблице."""
+        self._ring.clear()
+        self._seen.clear()
+        self._floor = None
+        self.high_water = None
+        self._last_accepted_at = time.time()   # Одновременные accept() не сбрасывают журнал повторно
+        async with self.pool.acquire() as db:
+            cursor = await db.execute('DELETE FROM update_journal WHERE payload IS NULL')
+            await db.commit()
+        logging.info("Апдейтов не было больше недели, журнал сброшен, очищено записей: %s", cursor.rowcount)
+
+    def _remember(self, update_id: int):
+        self._seen.add(update_id)
+        self._ring.append(update_id)
+        if len(self._ring) > self.ring_size:
+            evicted = self._ring.popleft()
+            self._seen.discard(evicted)
+            if self._floor is None or evicted > self._floor:
+                self._floor = evicted
+        if self.high_water is None or update_id > self.high_water:
+            self.high_water = update_id
+
+    async def accept(self, update_id: int, payload: str) -> bool:
+        """
+        Записывает апдейт в журнал; возвращается после commit.
+        False - апдейт уже принят раньше и обрабатывать его не нужно.
+        """
+        if self._last_accepted_at and time.time() - self._last_accepted_at > ID_RESET_AFTER:
+            # Бот работал, но апдейтов не было больше недели: Telegram мог начать нумерацию
+            # заново, и новый номер не должен отсеяться как повтор старого
+            await self._reset()
+        if self.seen(update_id):
+            self.duplicates += 1
+            return False
+        # Запоминаем до записи: повтор, пришедший во время commit, уже считается дубликатом
+        self._remember(update_id)
+        self._last_accepted_at = time.time()
+        self.accepted += 1
+        if not await self._writer.submit((update_id, payload, self._last_accepted_at)):
+            # Апдейт все равно обрабатывается, но при падении бота он будет потерян
+            logging.error("Апдейт %s не записан в журнал", update_id)
+        return True
+
+    def resume_offset(self):
+        """offset для первого getUpdates: следующий после последнего принятого апдейта (None - с начала очереди)."""
+        if self.high_water is None or time.time() - self._last_accepted_at > ID_RESET_AFTER:
+            return None
+        return self.high_water + 1
+
+    async def replay(self, bot, handle) -> int:
+        """
+        Передает в handle(update, data) апдейты, принятые до перезапуска, но не обработанные,
+        по возрастанию update_id. Апдейт, который повторялся уже max_replays раз
+        (скорее всего, он и роняет бота), отбрасывается. Возвращает число апдейтов.
+        """
+        now = time.time()
+        async with self.pool.acquire() as db:
+            async with db.execute(
+                'SELECT update_id FROM update_journal WHERE payload IS NOT NULL AND attempts >= ?', (self.max_replays,)
+            ) as cursor:
+                dropped = [row[0] for row in await cursor.fetchall()]
+            if dropped:
+                await db.execute(
+                    'UPDATE update_journal SET payload = NULL, done_at = ? WHERE payload IS NOT NULL AND attempts >= ?',
+                    (now, self.max_replays)
+                )
+            await db.execute('UPDATE update_journal SET attempts = attempts + 1 WHERE payload IS NOT NULL')
+            async with db.execute(
+                'SELECT payload FROM update_journal WHERE payload IS NOT NULL ORDER BY update_id'
+            ) as cursor:
+                payloads = [row[0] for row in await cursor.fetchall()]
+            await db.commit()
+
+        if dropped:
+            logging.error("Апдейты не обработаны за %s попыток и отброшены: %s", self.max_replays, dropped)
+            self.dropped += len(dropped)
+        if payloads:
+            logging.info("Повторяем %s апдейтов, не обработанных до перезапуска", len(payloads))
+        for payload in payloads:
+            data = json.loads(payload)
+            await handle(Update.model_validate(data, context={"bot": bot}), data)
+        self.replayed += len(payloads)
+        return len(payloads)
+
+    # --- Отметки об обработке ---
+    async def __call__(self, handler, event: Update, data):
+        try:
+            result = await handler(event, data)
+        except asyncio.CancelledError:
+            # Обработка прервана при остановке: апдейт останется в журнале и повторится после перезапуска
+            raise
+        except Exception:
+            # Ошибка обработчика повторилась бы и при повторе
+            self.complete(event.update_id)
+            raise
+        self.complete(event.update_id)
+        return result
+
+    def complete(self, update_id: int):
+        """Отмечает апдейт обработанным (запись - через flush_delay секунд вместе с другими)."""
+        self._done.append((time.time(), update_id))
+        self.completed += 1
+        if self._flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(self.flush_delay, self._schedule_flush)
+
+    def _schedule_flush(self):
+        self._flush_handle = None
+        task = asyncio.create_task(self.flush())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def flush(self):
+        """Записывает накопленные отметки одной транзакцией; JSON обработанных апдейтов больше не нужен."""
+        async with self._flush_lock:
+            if not self._done:
+                return
+            done, self._done = self._done, []
+            try:
+                async with self.pool.acquire() as db:
+                    await db.executemany(
+                        'UPDATE update_journal SET payload = NULL, done_at = ? WHERE update_id = ?', done
+                    )
+                    await db.commit()
+            except Exception as e:
+                logging.error("Ошибка записи журнала апдейтов: %s", e, exc_info=True)
+                self._done[:0] = done
+                if self._flush_handle is None:
+                    loop = asyncio.get_running_loop()
+                    self._flush_handle = loop.call_later(max(self.flush_delay, 1.0), self._schedule_flush)
+
+    # --- Очистка и статистика ---
+    async def prune(self) -> int:
+        """Удаляет обработанные записи старше последних ring_size. Возвращает число удаленных."""
+        async with self.pool.acquire() as db:
+            cursor = await db.execute(
+                'DELETE FROM update_journal WHERE payload IS NULL AND update_id < ('
+                'SELECT MIN(update_id) FROM (SELECT update_id FROM update_journal ORDER BY update_id DESC LIMIT ?))',
+                (self.ring_size,)
+            )
+            await db.commit()
+            return cursor.rowcount
+
+    async def _prune_loop(self):
+        while True:
+            await asyncio.sleep(self.prune_interval)
+            try:
+                await self.prune()
+            except Exception as e:
+                logging.error("Ошибка очистки журнала апдейтов: %s", e)
+
+    async def stats(self) -> dict:
+        """Счетчики для метрик; pending - принятые и еще не обработанные апдейты (по всем процессам)."""
+        async with self.pool.acquire() as db:
+            async with db.execute('SELECT COUNT(*) FROM update_journal WHERE payload IS NOT NULL') as cursor:
+                pending = (await cursor.fetchone())[0]
+        return {
+            'accepted': self.accepted,
+            'duplicates': self.duplicates,
+            'completed': self.completed,
+            'replayed': self.replayed,
+            'dropped': self.dropped,
+            'pending': pending,
+        }
+
+    async def close(self):
+        """Записывает принятые апдейты и отметки об обработке, очищает журнал (если он запущен start())."""
+        if self._pruner is not None:
+            self._pruner.cancel()
+            self._pruner = None
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+        await self._writer.close()
+        await self.flush()
+        if not self._started:
+            return
+        try:
+            await self.prune()
+        except Exception as e:
+            logging.error("Ошибка очистки журнала апдейтов: %s", e)
+        logging.info("Журнал апдейтов закрыт: принято %s, обработано %s, повторов отсеяно %s, повторено после перезапуска %s",
+                     self.accepted, self.completed, self.duplicates, self.replayed)
@@ -0,0 +1,69 @@
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+import aiosqlite
+
+from bot.services.metrics import metrics
+
+# Настройки соединения: WAL позволяет читать во время записи,
+# synchronous=NORMAL в режиме WAL делает fsync только при чекпоинте
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-8000",      # ~8 МБ страничного кэша на соединение
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA foreign_keys=ON",
+)
+
+# Сколько подготовленных выражений sqlite3 держит в кэше каждого соединения.
+# Соединения долгоживущие, поэтому одинаковые запросы не компилируются повторно.
+CACHED_STATEMENTS = 256
+
+
+class ConnectionPool:
+    """
+    Небольшой пул долгоживущих соединений aiosqlite.
+    Открывается один раз при старте бота и закрывается при остановке.
+    """
+
+    def __init__(self, path: str, size: int = 4):
+        self.path = path
+        self.size = size
+        self._connections = []
+        self._idle = asyncio.Queue()
+
+    @property
+    def is_open(self) -> bool:
+        return bool(self._connections)
+
+    async def open(self):
+        for _ in range(self.size):
+            db = await aiosqlite.connect(self.path, cached_statements=CACHED_STATEMENTS)
+            for pragma in PRAGMAS:
+                await db.execute(pragma)
+            self._connections.append(db)
+            self._idle.put_nowait(db)
+        logging.info("Открыт пул из %s соединений с БД %s", self.size, self.path)
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Выдает свободное соединение; незавершенная транзакция откатывается при возврате."""
+        db = await self._idle.get()
+        start = time.perf_counter()
+        try:
+            yield db
+        finally:
+            if db.in_transaction:
+                await db.rollback()
+            self._idle.put_nowait(db)
+            metrics.observe_external('db', time.perf_counter() - start)
+
+    async def close(self):
+        connections, self._connections = self._connections, []
+        self._idle = asyncio.Queue()
+        for db in connections:
+            await db.close()
+        logging.info("Пул соединений с БД %s закрыт", self.path)
@@ -0,0 +1,106 @@
+import asyncio
+import logging
+
+
+class BatchWriter:
+    """
+    Отложенная пакетная запись (write-behind).
+
+    Строки копятся в очереди и записываются одной транзакцией через executemany:
+    через window секунд после первой строки пачки или как только наберется max_size строк.
+    При window=0 пачка не ждет: в нее попадает все, что накопилось, пока шла
+    предыдущая транзакция (group commit), поэтому одиночная запись не задерживается.
+    Каждый вызывающий получает свой результат: True, если его строка сохранена.
+    При закрытии очередь записывается полностью.
+    """
+
+    def __init__(self, pool, sql: str, window: float, max_size: int, name: str = "writer"):
+        self.pool = pool
+        self.sql = sql
+        self.window = window
+        self.max_size = max_size
+        self.name = name
+        self._queue = asyncio.Queue()
+        self._task = None
+        self._closed = False
+        self.batches_written = 0
+        self.rows_written = 0
+
+    def start(self):
+        self._task = asyncio.create_task(self._run(), name=f"batch-writer-{self.name}")
+
+    async def submit(self, params) -> bool:
+        if self._closed or self._task is None:
+            raise RuntimeError(f"Пакетная запись {self.name} не запущена")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((params, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_size:
+                # Все, что уже лежит в очереди, забираем без ожидания
+                if self._queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self._queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._write(batch)
+
+    async def _write(self, batch):
+        rows = [params for params, _ in batch]
+        results = [False] * len(rows)
+        try:
+            async with self.pool.acquire() as db:
+                try:
+                    await db.executemany(self.sql, rows)
+                    await db.commit()
+                    results = [True] * len(rows)
+                except Exception as e:
+                    # Пачка не прошла целиком: пишем по одной строке, чтобы найти виновную
+                    logging.warning("Пакетная запись %s не удалась (%s), пишем построчно", self.name, e)
+                    await db.rollback()
+                    for i, params in enumerate(rows):
+                        try:
+                            await db.execute(self.sql, params)
+                            results[i] = True
+                        except Exception as row_error:
+                            # Сами значения не пишем: в них могут быть персональные данные
+                            logging.error("Пакетная запись %s: не удалось записать строку %s из %s: %s",
+                                          self.name, i + 1, len(rows), row_error)
+                    await db.commit()
+        except Exception as e:
+            logging.error("Ошибка транзакции пакетной записи %s: %s", self.name, e, exc_info=True)
+            results = [False] * len(rows)
+
+        self.batches_written += 1
+        self.rows_written += sum(results)
+        for (_, future), ok in zip(batch, results):
+            if not future.done():
+                future.set_result(ok)
+
+    async def close(self):
+        """Записывает все накопленные строки и останавливает фоновую задачу."""
+        if self._task is None or self._closed:
+            return
+        self._closed = True
+        self._queue.put_nowait(None)
+        await self._task
+        logging.info("Пакетная запись %s остановлена: %s строк в %s транзакциях",
+                     self.name, self.rows_written, self.batches_written)
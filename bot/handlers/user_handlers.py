@@ -1,23 +1,36 @@
 import os
+import html
+import time
+import asyncio
 import logging
+import tempfile
+from collections import Counter
 from aiogram import Router, F
-from aiogram.filters import CommandStart, Command
+from aiogram.filters import CommandStart, Command, CommandObject
 from aiogram.types import (
     Message,
-    FSInputFile,
     ReplyKeyboardMarkup,
     KeyboardButton,
     InlineKeyboardMarkup,
     InlineKeyboardButton,
-    CallbackQuery
+    CallbackQuery,
+    FSInputFile,
+    Update,
     # ReplyKeyboardRemove
 )
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
+from gtts.lang import tts_langs
 
-from bot.config import IMG_DIR, AUDIO_DIR
-from bot.db.database import add_student
-from googletrans import Translator
+from bot.config import AUDIO_DIR, ADMIN_IDS, TTS_MAX_CHARS, TTS_DEFAULT_LANG, TRANSLATE_LONG_TEXT, ROSTER_MAX_FILE_MB
+from bot.db.database import add_student, search_students, get_student_stats, rebuild_student_stats, make_name_key
+from bot.services.translation import translation_service, TranslationOverloaded, NOTHING_TO_TRANSLATE, SAME_LANGUAGE
+from bot.services.photos import photo_ingestor, PhotoQueueFull
+from bot.services.media import media_registry
+from bot.services.tts import tts_service
+from bot.services.metrics import metrics
+from bot.roster import import_students, export_students, detect_format, RosterFormatError
+from bot.validation import clean_name, clean_age, clean_grade, InvalidStudent, OUT_OF_RANGE, MIN_AGE, MAX_AGE
 
 
 # Класс состояний для регистрации студента
@@ -27,12 +40,18 @@ class RegistrationStates(StatesGroup):
     waiting_for_grade = State()
 
 
-# Инициализация переводчика
-translator = Translator()
-
 # Создаем роутер для пользовательских команд
 user_router = Router()
 
+# Логгер bot.handlers.*: частые INFO-записи отсюда попадают в лог выборочно (LOG_SAMPLE_RATE)
+logger = logging.getLogger(__name__)
+
+# Сколько студентов показывать на одной странице /students
+STUDENTS_PAGE_SIZE = 10
+
+# Языки, которые умеет озвучивать gTTS
+TTS_LANGUAGES = tts_langs()
+
 
 # --- Обработчики команд ---
 @user_router.message(CommandStart())
@@ -62,7 +81,7 @@ async def handle_start(message: Message, state: FSMContext):
         f"/dynamic - динамическая клавиатура",  # Можно добавить сюда, если уже планируем
         reply_markup=start_keyboard
     )
-    logging.info(f"Пользователь {message.from_user.id} запустил /start. Показано меню. Состояние FSM очищено.")
+    logger.info("Пользователь %s запустил /start. Показано меню. Состояние FSM очищено.", message.from_user.id)
 
 
 @user_router.message(Command('help'))
@@ -80,7 +99,13 @@ async def handle_help(message: Message):
         "- Отправьте `/dynamic` для работы с динамически изменяемой клавиатурой.\n"
         "- Отправьте фото, и я его сохраню в папку 'img'.\n"
         "- Отправьте `/sendvoice` для получения тестового голосового сообщения.\n"
+        "- Отправьте `/say текст` (или `/say en text`), и я озвучу текст.\n"
         "- Отправьте любой другой текст, и я переведу его на английский язык.\n"
+        "- Сотрудникам: `/students [класс или начало имени]` - список студентов.\n"
+        "- Сотрудникам: `/stats` - статистика работы бота.\n"
+        "- Сотрудникам: `/report [класс]` - число студентов по классам и возрастам.\n"
+        "- Сотрудникам: `/export` - выгрузить студентов в CSV; пришлите файл .csv или .jsonl "
+        "(колонки name, age, grade), чтобы загрузить список.\n"
         "\nОсновные команды:\n"
         "/start - начало работы, показать меню\n"
         "/help - это сообщение"
@@ -102,7 +127,7 @@ async def cmd_register_start(message: Message, state: FSMContext):
         "Пожалуйста, введите имя студента.\n\n"
         "Для отмены регистрации в любой момент отправьте /cancel."
     )
-    logging.info(f"Пользователь {message.from_user.id} начал регистрацию. Установлено состояние waiting_for_name.")
+    logger.info("Пользователь %s начал регистрацию. Установлено состояние waiting_for_name.", message.from_user.id)
 
 
 @user_router.message(Command("cancel"))
@@ -115,7 +140,7 @@ async def cmd_cancel_registration(message: Message, state: FSMContext):
         await message.answer("Нет активной операции для отмены.")
         return
 
-    logging.info(f"Пользователь {message.from_user.id} отменил операцию из состояния {current_state}.")
+    logger.info("Пользователь %s отменил операцию из состояния %s.", message.from_user.id, current_state)
     await state.clear()
     await message.answer(
         "Действие отменено. Все введенные данные сброшены.\n"
@@ -162,7 +187,7 @@ async def cmd_links(message: Message):
         "Вот несколько полезных ссылок:",
         reply_markup=links_keyboard
     )
-    logging.info(f"Пользователь {message.from_user.id} запросил ссылки (/links).")
+    logger.info("Пользователь %s запросил ссылки (/links).", message.from_user.id)
 
 # --- Обработчики кнопок ReplyKeyboard (должны быть до FSM состояний и общего F.text) ---
 @user_router.message(F.text == "Привет 👋")
@@ -172,7 +197,7 @@ async def handle_hello_button(message: Message):
     """
     user_name = message.from_user.first_name
     await message.answer(f"Привет, {user_name}!")
-    logging.info(f"Пользователь {message.from_user.id} нажал кнопку 'Привет 👋'.")
+    logger.info("Пользователь %s нажал кнопку 'Привет 👋'.", message.from_user.id)
 
 @user_router.message(F.text == "Пока Bye")
 async def handle_bye_button(message: Message):
@@ -184,7 +209,7 @@ async def handle_bye_button(message: Message):
     # Для удаления клавиатуры:
     # from aiogram.types import ReplyKeyboardRemove
     # await message.answer(f"До свидания, {user_name}!", reply_markup=ReplyKeyboardRemove())
-    logging.info(f"Пользователь {message.from_user.id} нажал кнопку 'Пока Bye'.")
+    logger.info("Пользователь %s нажал кнопку 'Пока Bye'.", message.from_user.id)
 
 @user_router.message(Command("dynamic"))
 async def cmd_dynamic(message: Message):
@@ -202,7 +227,7 @@ async def cmd_dynamic(message: Message):
         "Нажмите кнопку ниже, чтобы увидеть больше опций:",
         reply_markup=dynamic_keyboard
     )
-    logging.info(f"Пользователь {message.from_user.id} запросил динамическую клавиатуру (/dynamic).")
+    logger.info("Пользователь %s запросил динамическую клавиатуру (/dynamic).", message.from_user.id)
 
 @user_router.callback_query(F.data == "show_more_options")
 async def cq_show_more_options(callback_query: CallbackQuery):
@@ -228,9 +253,9 @@ async def cq_show_more_options(callback_query: CallbackQuery):
             "Выберите одну из опций:",
             reply_markup=options_keyboard
         )
-        logging.info(f"Пользователь {callback_query.from_user.id} нажал 'Показать больше'. Клавиатура обновлена.")
+        logger.info("Пользователь %s нажал 'Показать больше'. Клавиатура обновлена.", callback_query.from_user.id)
     except Exception as e: # Может быть ошибка, если сообщение слишком старое для редактирования
-        logging.error(f"Ошибка при редактировании сообщения для callback 'show_more_options': {e}")
+        logger.error("Ошибка при редактировании сообщения для callback 'show_more_options': %s", e)
         # Можно отправить новое сообщение, если редактирование не удалось
         await callback_query.message.answer("Не удалось обновить предыдущее меню. Пожалуйста, попробуйте /dynamic снова.")
 
@@ -250,7 +275,7 @@ async def cq_select_option_1(callback_query: CallbackQuery):
     # Можно просто отправить новое сообщение
     await callback_query.message.answer(response_text)
 
-    logging.info(f"Пользователь {callback_query.from_user.id} выбрал Опцию 1.")
+    logger.info("Пользователь %s выбрал Опцию 1.", callback_query.from_user.id)
     await callback_query.answer(text="Вы выбрали Опцию 1!", show_alert=False)  # Можно показать короткое уведомление
 
 
@@ -263,9 +288,227 @@ async def cq_select_option_2(callback_query: CallbackQuery):
     response_text = f"{user_name}, вы выбрали Опцию 2!"
     await callback_query.message.answer(response_text)
 
-    logging.info(f"Пользователь {callback_query.from_user.id} выбрал Опцию 2.")
+    logger.info("Пользователь %s выбрал Опцию 2.", callback_query.from_user.id)
     await callback_query.answer(text="Вы выбрали Опцию 2!", show_alert=False)
 
+
+# --- Просмотр списка студентов (только для сотрудников) ---
+# callback_data ограничена 64 байтами: "students:grade:" + id до 19 цифр + ":" + длина запроса
+# + ":" + запрос + ключ имени последнего студента (сколько поместится)
+STUDENTS_QUERY_MAX_BYTES = 64 - len("students:grade:::") - 19 - 2
+
+
+def _students_callback(mode: str, value: str, after_id: int = 0, after_key: str = "") -> str:
+    """
+    Собирает callback_data для страницы списка; длина value ограничена в cmd_students.
+    Ключ имени обрезается до оставшегося места: пока запись студента есть, он не нужен.
+    """
+    data = f"students:{mode}:{after_id}:{len(value)}:{value}"
+    room = 64 - len(data.encode())
+    return data + after_key.encode()[:room].decode(errors='ignore')
+
+
+def _parse_students_callback(data: str):
+    """Разбирает callback_data из _students_callback: (mode, value, after_id, after_key)."""
+    _, mode, after_id, value_len, rest = data.split(":", 4)
+    value_len = int(value_len)
+    return mode, rest[:value_len], int(after_id) or None, rest[value_len:]
+
+
+async def _build_students_page(mode: str, value: str, after_id: int = None, after_key: str = None):
+    """Возвращает текст и клавиатуру одной страницы списка студентов."""
+    filters = {'grade': value} if mode == 'grade' else {'name_prefix': value} if mode == 'name' else {}
+    students = await search_students(after_id=after_id, after_key=after_key,
+                                     limit=STUDENTS_PAGE_SIZE + 1, **filters)
+    has_next = len(students) > STUDENTS_PAGE_SIZE
+    students = students[:STUDENTS_PAGE_SIZE]
+
+    if mode == 'grade':
+        title = f"Студенты класса {html.escape(value)}"
+    elif mode == 'name':
+        title = f"Студенты, чье имя начинается на «{html.escape(value)}»"
+    else:
+        title = "Все студенты"
+
+    if not students:
+        return f"<b>{title}</b>\nНикого не найдено.", None
+
+    lines = [f"<b>{title}:</b>"]
+    for student in students:
+        lines.append(f"{html.escape(student.name)}, {student.age} лет, класс {html.escape(student.grade or '-')}")
+
+    buttons = []
+    if after_id is not None:
+        buttons.append(InlineKeyboardButton(text="⏮ В начало", callback_data=_students_callback(mode, value)))
+    if has_next:
+        buttons.append(InlineKeyboardButton(
+            text="Далее ▶️",
+            callback_data=_students_callback(mode, value, students[-1].id, make_name_key(students[-1].name))
+        ))
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
+    return "\n".join(lines), keyboard
+
+
+@user_router.message(Command("students"))
+async def cmd_students(message: Message, command: CommandObject):
+    """
+    Обработчик команды /students. Показывает список студентов постранично.
+    /students - все, /students 5А - класс, /students Ив - поиск по началу имени.
+    """
+    if message.from_user.id not in ADMIN_IDS:
+        await message.answer("Эта команда доступна только сотрудникам.")
+        return
+
+    query = (command.args or "").strip()
+    if not query:
+        mode = 'all'
+    elif query[0].isdigit():
+        mode = 'grade'
+    else:
+        mode = 'name'
+    if len(query.encode()) > STUDENTS_QUERY_MAX_BYTES:
+        # Запрос хранится в кнопках листания: длиннее он не поместится в callback_data
+        await message.answer("Слишком длинный запрос. Укажите класс или начало имени покороче.")
+        return
+
+    try:
+        text, keyboard = await _build_students_page(mode, query)
+    except Exception as e:
+        # Запрос - начало имени студента: в лог пишем только режим и длину
+        logger.error("Ошибка при поиске студентов (%s, запрос %s символов): %s", mode, len(query), e, exc_info=True)
+        await message.answer("Не удалось получить список студентов. Попробуйте позже.")
+        return
+
+    await message.answer(text, reply_markup=keyboard)
+    logger.info("Пользователь %s запросил список студентов (%s, запрос %s символов).",
+                message.from_user.id, mode, len(query))
+
+
+@user_router.message(Command("stats"))
+async def cmd_stats(message: Message):
+    """
+    Обработчик команды /stats. Показывает сотрудникам задержки обработчиков,
+    время внешних вызовов и состояние сервисов.
+    """
+    if message.from_user.id not in ADMIN_IDS:
+        await message.answer("Эта команда доступна только сотрудникам.")
+        return
+
+    summary = await metrics.summary()
+    # Ограничение Telegram - 4096 символов в сообщении
+    await message.answer(f"<pre>{html.escape(summary[:4000])}</pre>")
+    logger.info("Пользователь %s запросил статистику.", message.from_user.id)
+
+
+def _grade_sort_key(grade: str):
+    """Сортировка классов по номеру, затем по букве: 2А, 10Б, 11А."""
+    digits = len(grade) - len(grade.lstrip('0123456789'))
+    return (int(grade[:digits]) if digits else 0, grade[digits:])
+
+
+async def _build_report(grade: str = None) -> str:
+    """Текст отчета по классам и возрастам; строится по сводке student_stats."""
+    stats = await get_student_stats(grade)
+    if not stats:
+        return f"В классе {html.escape(grade)} студентов нет." if grade else "Студентов пока нет."
+
+    by_grade = Counter()
+    by_age = Counter()
+    for stat in stats:
+        by_grade[stat.grade] += stat.count
+        by_age[stat.age] += stat.count
+    total = sum(by_grade.values())
+
+    title = f"Класс {html.escape(grade)}" if grade else "Все студенты"
+    lines = [f"<b>{title}: {total}</b>"]
+    if not grade:
+        lines.append("\n<b>По классам:</b>")
+        for name in sorted(by_grade, key=_grade_sort_key):
+            lines.append(f"{html.escape(name or 'без класса')}: {by_grade[name]}")
+    lines.append("\n<b>По возрасту:</b>")
+    for age in sorted(by_age):
+        lines.append(f"{age or 'не указан'}: {by_age[age]} ({by_age[age] / total:.0%})")
+    return "\n".join(lines)
+
+
+@user_router.message(Command("report"))
+async def cmd_report(message: Message, command: CommandObject):
+    """
+    Обработчик команды /report. Показывает сотрудникам число студентов по классам и возрастам.
+    /report - вся школа, /report 5А - один класс, /report rebuild - пересчитать сводку.
+    """
+    if message.from_user.id not in ADMIN_IDS:
+        await message.answer("Эта команда доступна только сотрудникам.")
+        return
+
+    query = (command.args or "").strip()
+    try:
+        if query.lower() == 'rebuild':
+            cells, mismatched = await rebuild_student_stats()
+            text = f"Сводка пересчитана: {cells} записей, расхождений {mismatched}."
+        else:
+            text = await _build_report(query or None)
+    except Exception as e:
+        logger.error("Ошибка при построении отчета (/report %s): %s", query, e, exc_info=True)
+        await message.answer("Не удалось построить отчет. Попробуйте позже.")
+        return
+
+    # Ограничение Telegram - 4096 символов в сообщении
+    await message.answer(text[:4096])
+    logger.info("Пользователь %s запросил отчет (/report %s).", message.from_user.id, query)
+
+
+@user_router.message(Command("export"), flags={'cost': 'heavy'})
+async def cmd_export(message: Message):
+    """
+    Обработчик команды /export. Отправляет сотруднику всех студентов файлом CSV.
+    """
+    if message.from_user.id not in ADMIN_IDS:
+        await message.answer("Эта команда доступна только сотрудникам.")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'students.csv')
+        try:
+            # utf-8-sig - чтобы Excel правильно открыл кириллицу
+            with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+                count = await export_students(f)
+        except Exception as e:
+            logger.error("Ошибка при выгрузке студентов: %s", e, exc_info=True)
+            await message.answer("Не удалось выгрузить список студентов. Попробуйте позже.")
+            return
+        filename = f"students_{time.strftime('%Y-%m-%d')}.csv"
+        await message.answer_document(FSInputFile(path, filename=filename), caption=f"Студентов: {count}")
+    logger.info("Пользователь %s выгрузил список студентов (%s строк).", message.from_user.id, count)
+
+
+@user_router.callback_query(F.data.startswith("students:"))
+async def cq_students_page(callback_query: CallbackQuery):
+    """
+    Обрабатывает кнопки перелистывания списка студентов.
+    Заменяет текст и клавиатуру сообщения следующей страницей.
+    """
+    if callback_query.from_user.id not in ADMIN_IDS:
+        await callback_query.answer("Эта команда доступна только сотрудникам.", show_alert=True)
+        return
+
+    try:
+        mode, value, after_id, after_key = _parse_students_callback(callback_query.data)
+    except ValueError:
+        logger.warning("Некорректные данные кнопки списка студентов (%s байт)", len(callback_query.data.encode()))
+        await callback_query.answer("Кнопка устарела. Пожалуйста, попробуйте /students снова.", show_alert=True)
+        return
+
+    try:
+        text, keyboard = await _build_students_page(mode, value, after_id, after_key)
+        await callback_query.message.edit_text(text, reply_markup=keyboard)
+        logger.info("Пользователь %s перелистнул список студентов (%s).", callback_query.from_user.id, mode)
+    except Exception as e: # Может быть ошибка, если сообщение слишком старое для редактирования
+        logger.error("Ошибка при перелистывании списка студентов: %s", e)
+        await callback_query.message.answer("Не удалось обновить список. Пожалуйста, попробуйте /students снова.")
+
+    await callback_query.answer()
+
 # --- Обработчики состояний FSM ---
 @user_router.message(RegistrationStates.waiting_for_name, F.text)
 async def process_name(message: Message, state: FSMContext):
@@ -274,14 +517,15 @@ async def process_name(message: Message, state: FSMContext):
     Сохраняет имя в FSM, переключает состояние на waiting_for_age
     и запрашивает возраст.
     """
-    if not message.text or message.text.startswith('/'):
+    try:
+        student_name = clean_name(message.text)
+    except InvalidStudent:
         await message.answer(
             "Пожалуйста, введите корректное имя (не команду и не пустое сообщение).\n"
             "Попробуйте еще раз или отмените регистрацию командой /cancel."
         )
         return
 
-    student_name = message.text.strip()
     await state.update_data(name=student_name)
 
     await state.set_state(RegistrationStates.waiting_for_age)
@@ -289,8 +533,7 @@ async def process_name(message: Message, state: FSMContext):
         f"Отлично, имя студента: {student_name}.\n"
         "Теперь, пожалуйста, введите возраст студента (только цифры)."
     )
-    logging.info(
-        f"Пользователь {message.from_user.id} ввел имя: {student_name}. Установлено состояние waiting_for_age.")
+    logger.info("Пользователь %s ввел имя. Установлено состояние waiting_for_age.", message.from_user.id)
 
 
 @user_router.message(RegistrationStates.waiting_for_age, F.text)
@@ -301,20 +544,20 @@ async def process_age(message: Message, state: FSMContext):
     Сохраняет возраст в FSM, переключает состояние на waiting_for_grade
     и запрашивает класс.
     """
-    if not message.text or not message.text.isdigit():
-        await message.answer(
-            "Возраст должен быть числом. Пожалуйста, введите корректный возраст.\n"
-            "Например: 10\n\n"
-            "Или отмените регистрацию командой /cancel."
-        )
-        return
-
-    student_age = int(message.text)
-    if not (5 <= student_age <= 100):
-        await message.answer(
-            "Пожалуйста, введите реалистичный возраст (например, от 5 до 100 лет).\n"
-            "Попробуйте еще раз или отмените регистрацию командой /cancel."
-        )
+    try:
+        student_age = clean_age(message.text)
+    except InvalidStudent as e:
+        if e.reason == OUT_OF_RANGE:
+            await message.answer(
+                f"Пожалуйста, введите реалистичный возраст (например, от {MIN_AGE} до {MAX_AGE} лет).\n"
+                "Попробуйте еще раз или отмените регистрацию командой /cancel."
+            )
+        else:
+            await message.answer(
+                "Возраст должен быть числом. Пожалуйста, введите корректный возраст.\n"
+                "Например: 10\n\n"
+                "Или отмените регистрацию командой /cancel."
+            )
         return
 
     await state.update_data(age=student_age)
@@ -324,18 +567,21 @@ async def process_age(message: Message, state: FSMContext):
         f"Возраст студента: {student_age}.\n"
         "Теперь введите класс (например, '5А', '10Б', '11')."
     )
-    logging.info(
-        f"Пользователь {message.from_user.id} ввел возраст: {student_age}. Установлено состояние waiting_for_grade.")
+    logger.info("Пользователь %s ввел возраст: %s. Установлено состояние waiting_for_grade.",
+                message.from_user.id, student_age)
 
 
 @user_router.message(RegistrationStates.waiting_for_grade, F.text)
-async def process_grade_and_finish(message: Message, state: FSMContext):
+async def process_grade_and_finish(message: Message, state: FSMContext, event_update: Update):
     """
     Обрабатывает введенный класс студента.
     Сохраняет класс, извлекает все данные из FSM, добавляет студента в БД
-    и завершает процесс регистрации.
+    и завершает процесс регистрации. Запись привязана к update_id: если апдейт
+    обработается повторно (после перезапуска бота), студент не задвоится.
     """
-    if not message.text or message.text.startswith('/'):
+    try:
+        student_grade = clean_grade(message.text)
+    except InvalidStudent:
         await message.answer(
             "Пожалуйста, введите корректный класс (не команду и не пустое сообщение).\n"
             "Например: '7Б' или '11'\n\n"
@@ -343,7 +589,6 @@ async def process_grade_and_finish(message: Message, state: FSMContext):
         )
         return
 
-    student_grade = message.text.strip()
     await state.update_data(grade=student_grade)
 
     user_data = await state.get_data()
@@ -352,7 +597,7 @@ async def process_grade_and_finish(message: Message, state: FSMContext):
     # student_grade уже есть в переменной student_grade
 
     if not all([student_name, student_age, student_grade]):
-        logging.error(f"Не все данные были собраны для пользователя {message.from_user.id} в FSM: {user_data}")
+        logger.error("Не все данные были собраны для пользователя %s в FSM: %s", message.from_user.id, user_data)
         await message.answer(
             "Произошла ошибка: не все данные были собраны. "
             "Пожалуйста, начните регистрацию заново с /register."
@@ -360,7 +605,8 @@ async def process_grade_and_finish(message: Message, state: FSMContext):
         await state.clear()
         return
 
-    success = await add_student(name=student_name, age=student_age, grade=student_grade)
+    success = await add_student(name=student_name, age=student_age, grade=student_grade,
+                                update_id=event_update.update_id)
 
     if success:
         await message.answer(
@@ -370,40 +616,88 @@ async def process_grade_and_finish(message: Message, state: FSMContext):
             f"Класс: {student_grade}\n\n"
             "Спасибо!"
         )
-        logging.info(
-            f"Пользователь {message.from_user.id} успешно зарегистрировал студента: "
-            f"Имя={student_name}, Возраст={student_age}, Класс={student_grade}"
-        )
+        # Имя студента - персональные данные, в лог не пишем
+        logger.info("Пользователь %s успешно зарегистрировал студента: Класс=%s",
+                    message.from_user.id, student_grade, extra={'always': True})
     else:
         await message.answer(
             "Произошла ошибка при сохранении данных в базу. "
             "Пожалуйста, попробуйте позже или свяжитесь с администратором."
         )
-        logging.error(
-            f"Ошибка БД при регистрации студента от пользователя {message.from_user.id}: "
-            f"Имя={student_name}, Возраст={student_age}, Класс={student_grade}"
-        )
+        logger.error("Ошибка БД при регистрации студента от пользователя %s: Класс=%s",
+                     message.from_user.id, student_grade)
 
     await state.clear()
 
 
 # --- Общие обработчики (должны идти ПОСЛЕ специфичных команд и состояний FSM) ---
-@user_router.message(F.photo)
+@user_router.message(F.photo, flags={'cost': 'heavy'})
 async def handle_photo(message: Message):
     """
     Обработчик для сохранения полученных фотографий.
+    Фото скачивается в фоне; уже известные фото повторно не скачиваются.
     """
     photo = message.photo[-1]
-    file_name = f"{photo.file_id}.jpg"
-    save_path = os.path.join(IMG_DIR, file_name)
 
     try:
-        await message.bot.download(file=photo, destination=save_path)
-        await message.answer(f"Фото сохранено как {file_name}!")
-        logging.info(f"Фото {file_name} успешно сохранено по пути: {save_path}")
+        saved_path = await photo_ingestor.submit(message.bot, photo, message.chat.id)
+    except PhotoQueueFull as e:
+        logger.warning("Фото %s от пользователя %s отклонено: %s", photo.file_id, message.from_user.id, e)
+        await message.answer("Сейчас слишком много фото в обработке. Попробуйте пожалуйста позже.")
+        return
     except Exception as e:
-        logging.error(f"Ошибка при сохранении фото {photo.file_id}: {e}")
+        logger.error("Ошибка при сохранении фото %s: %s", photo.file_id, e)
         await message.answer("Произошла ошибка при сохранении фото. Попробуйте пожалуйста позже.")
+        return
+
+    if saved_path:
+        await message.answer("Это фото уже сохранено!")
+        logger.info("Фото %s уже сохранено по пути: %s", photo.file_unique_id, saved_path)
+    else:
+        await message.answer("Фото получено и сохраняется!")
+        logger.info("Фото %s поставлено в очередь на сохранение", photo.file_unique_id)
+
+
+@user_router.message(F.document, flags={'cost': 'heavy'})
+async def handle_roster_upload(message: Message):
+    """
+    Загрузка списка студентов сотрудником: файл .csv или .jsonl с колонками name, age, grade.
+    Строки проверяются так же, как при /register; в ответ приходит отчет об импорте.
+    """
+    if message.from_user.id not in ADMIN_IDS:
+        return
+
+    document = message.document
+    fmt = detect_format(document.file_name or '')
+    if fmt is None:
+        await message.answer("Чтобы загрузить студентов, пришлите файл .csv или .jsonl.")
+        return
+    if document.file_size and document.file_size > ROSTER_MAX_FILE_MB * 1024 * 1024:
+        await message.answer(f"Файл слишком большой: не больше {ROSTER_MAX_FILE_MB} МБ.")
+        return
+
+    await message.answer("Загружаю список студентов...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'roster')
+        try:
+            await message.bot.download(document, destination=path)
+            with open(path, encoding='utf-8-sig', newline='') as f:
+                report = await import_students(f, fmt)
+        except RosterFormatError as e:
+            await message.answer(f"Файл не подходит для импорта: {html.escape(str(e))}")
+            return
+        except UnicodeDecodeError:
+            await message.answer("Не удалось прочитать файл: сохраните его в кодировке UTF-8.")
+            return
+        except Exception as e:
+            logger.error("Ошибка при импорте студентов из %s: %s", document.file_name, e, exc_info=True)
+            await message.answer("Не удалось загрузить список студентов. Попробуйте позже.")
+            return
+
+    # Ограничение Telegram - 4096 символов в сообщении
+    await message.answer(f"<pre>{html.escape(report.summary()[:4000])}</pre>")
+    logger.info("Пользователь %s загрузил список студентов %s: добавлено %s, отклонено %s.",
+                message.from_user.id, document.file_name, report.imported, report.rejected)
 
 
 @user_router.message(Command('sendvoice'))  # Эту команду можно было бы и выше с другими командами
@@ -413,22 +707,133 @@ async def handle_send_voice(message: Message):
     """
     voice_file_path = os.path.join(AUDIO_DIR, "sample.ogg")
 
-    if not os.path.exists(voice_file_path):
-        logging.error(f"Аудиофайл {voice_file_path} не найден.")
+    try:
+        # Файл загружается в Telegram один раз, дальше отправляется по file_id
+        await media_registry.send(message.bot, message.chat.id, voice_file_path, kind='voice')
+        logger.info("Голосовое сообщение %s отправлено пользователю %s", voice_file_path, message.from_user.id)
+    except FileNotFoundError:
+        logger.error("Аудиофайл %s не найден.", voice_file_path)
         await message.answer("Не удалось найти аудиофайл для отправки. Пожалуйста, сообщите администратору.")
+    except Exception as e:
+        logger.error("Ошибка при отправке голосового сообщения: %s", e)
+        await message.answer("Произошла ошибка при отправке голосового сообщения.")
+
+
+async def _send_speech(message: Message, chat_id: int, text: str, lang: str):
+    """Озвучивает текст и отправляет аудио; готовые фразы берутся из кэша и отправляются по file_id."""
+    path = await tts_service.synthesize(text, lang)
+    try:
+        await media_registry.send(message.bot, chat_id, path, kind='audio', title="Озвучка")
+    except FileNotFoundError:
+        # Файл успели вытеснить из кэша между синтезом и отправкой - синтезируем заново
+        path = await tts_service.synthesize(text, lang)
+        await media_registry.send(message.bot, chat_id, path, kind='audio', title="Озвучка")
+
+
+@user_router.message(Command('say'), flags={'cost': 'heavy'})
+async def cmd_say(message: Message, command: CommandObject):
+    """
+    Обработчик команды /say [язык] <текст>. Озвучивает текст с помощью gTTS.
+    Например: /say Привет! или /say en Hello!
+    """
+    args = (command.args or "").strip()
+    lang = TTS_DEFAULT_LANG
+    parts = args.split(maxsplit=1)
+    if len(parts) == 2 and parts[0].lower() in TTS_LANGUAGES:
+        lang, args = parts[0].lower(), parts[1]
+
+    if not args:
+        await message.answer("Напишите текст после команды, например: /say Привет! или /say en Hello!")
+        return
+    if len(args) > TTS_MAX_CHARS:
+        await message.answer(f"Слишком длинный текст для озвучки (максимум {TTS_MAX_CHARS} символов).")
         return
 
     try:
-        voice_to_send = FSInputFile(path=voice_file_path, filename="sample.ogg")
-        await message.answer_voice(voice=voice_to_send)
-        logging.info(f"Голосовое сообщение {voice_file_path} отправлено пользователю {message.from_user.id}")
+        await _send_speech(message, message.chat.id, args, lang)
+        logger.info("Пользователь %s запросил озвучку (%s, %s символов).", message.from_user.id, lang, len(args))
+    except asyncio.TimeoutError:
+        logger.error("Таймаут синтеза речи для пользователя %s", message.from_user.id)
+        await message.answer("Синтез речи занял слишком много времени. Попробуйте еще раз.")
     except Exception as e:
-        logging.error(f"Ошибка при отправке голосового сообщения: {e}")
-        await message.answer("Произошла ошибка при отправке голосового сообщения.")
+        logger.error("Ошибка синтеза речи: %s", e)
+        await message.answer("Не удалось озвучить текст. Попробуйте позже.")
+
+
+@user_router.callback_query(F.data == "say_translation", flags={'cost': 'heavy'})
+async def cq_say_translation(callback_query: CallbackQuery):
+    """
+    Обрабатывает кнопку 'Озвучить' под переводом: озвучивает текст перевода на английском.
+    """
+    # Текст сообщения: заголовок "Перевод на английский:" и сам перевод со следующей строки
+    _, _, translated_text = (callback_query.message.text or "").partition("\n")
+    if not translated_text:
+        await callback_query.answer("Нечего озвучивать.")
+        return
+    await callback_query.answer("Озвучиваю...")
+
+    try:
+        await _send_speech(callback_query.message, callback_query.message.chat.id, translated_text[:TTS_MAX_CHARS], 'en')
+        logger.info("Пользователь %s озвучил перевод.", callback_query.from_user.id)
+    except Exception as e:
+        logger.error("Ошибка озвучки перевода: %s", e)
+        await callback_query.message.answer("Не удалось озвучить перевод. Попробуйте позже.")
+
+
+# Ограничение Telegram на длину текста сообщения
+MESSAGE_LIMIT = 4096
+# Кусок перевода, который после экранирования HTML гарантированно помещается в сообщение
+TRANSLATION_SLICE = 800
+LONG_TRANSLATION_TITLES = ("<b>Перевод на английский:</b>\n", "<b>Перевод на английский (продолжение):</b>\n")
+
+
+async def _send_long_translation(message: Message, text: str, reply_markup: InlineKeyboardMarkup):
+    """
+    Перевод длинного текста по частям: первое сообщение отправляется, как только готов
+    первый фрагмент, дальше оно дополняется через edit_text, а когда место кончается,
+    начинается следующее сообщение. Пока перевод не закончен, в конце стоит "…".
+    """
+    bodies = []   # Тексты сообщений без заголовков
+    sent = []     # (отправленное сообщение, текст, с которым оно показано)
+
+    def add(piece: str):
+        # +2 - место под " …" в конце незаконченного сообщения
+        title = LONG_TRANSLATION_TITLES[min(len(bodies) - 1, 1)]
+        if bodies and len(title) + len(bodies[-1]) + len(piece) + 2 <= MESSAGE_LIMIT:
+            bodies[-1] += piece
+        elif piece.strip():
+            bodies.append(piece.lstrip())
+
+    async def show(finished: bool):
+        for index, body in enumerate(bodies):
+            rendered = LONG_TRANSLATION_TITLES[min(index, 1)] + body.rstrip()
+            if not finished and index == len(bodies) - 1:
+                rendered += " …"
+            if index == len(sent):
+                sent.append((await message.answer(rendered, reply_markup=reply_markup), rendered))
+            elif sent[index][1] != rendered:
+                await sent[index][0].edit_text(rendered, reply_markup=reply_markup)
+                sent[index] = (sent[index][0], rendered)
+
+    chunks = failed = 0
+    async for ready in translation_service.translate_chunks(text, dest='en'):
+        for chunk in ready:
+            chunks += 1
+            failed += not chunk.ok
+            for start in range(0, len(chunk.text), TRANSLATION_SLICE):
+                piece = html.escape(chunk.text[start:start + TRANSLATION_SLICE], quote=False)
+                if not chunk.ok and start == 0:
+                    piece = "<i>[не удалось перевести]</i> " + piece
+                add(piece)
+            add(chunk.separator)
+        await show(finished=False)
+    await show(finished=True)
+    logger.info("Длинный перевод для пользователя %s: %s символов, %s фрагментов, %s сообщений, не переведено %s",
+                message.from_user.id, len(text), chunks, len(sent), failed)
 
 
 # Универсальный текстовый обработчик (должен быть одним из последних для текстовых сообщений)
-@user_router.message(F.text)
+@user_router.message(F.text, flags={'cost': 'heavy'})
 async def handle_text_translate(message: Message):
     """
     Обработчик для перевода любого полученного текста на английский язык.
@@ -445,13 +850,33 @@ async def handle_text_translate(message: Message):
     #     # ... (код пропуска команд, если он был)
     #     return
 
+    say_keyboard = InlineKeyboardMarkup(
+        inline_keyboard=[[InlineKeyboardButton(text="🔊 Озвучить", callback_data="say_translation")]]
+    )
     try:
-        translation = translator.translate(original_text, dest='en')
-        translated_text = translation.text
-
-        await message.answer(f"<b>Перевод на английский:</b>\n{translated_text}")
-        logging.info(
-            f"Текст '{original_text}' ({translation.src}) переведен на английский: '{translated_text}' для пользователя {message.from_user.id}")
+        if len(original_text) > TRANSLATE_LONG_TEXT:
+            # Длинный текст: по фрагментам, ответ появляется по мере перевода
+            await _send_long_translation(message, original_text, say_keyboard)
+            return
+
+        translation = await translation_service.translate(original_text, dest='en')
+        reason = getattr(translation, 'reason', None)
+        if reason == NOTHING_TO_TRANSLATE:
+            # Эмодзи, числа, ссылки: отвечаем сразу, переводчик не вызывался
+            await message.answer("В сообщении нет слов, которые нужно переводить.")
+            return
+        translated_text = html.escape(translation.text)
+        title = "Текст уже на английском:" if reason == SAME_LANGUAGE else "Перевод на английский:"
+        await message.answer(f"<b>{title}</b>\n{translated_text}", reply_markup=say_keyboard)
+        # Сами тексты не пишем: только язык и длину
+        logger.info("Перевод для пользователя %s: %s -> en, %s символов",
+                    message.from_user.id, translation.src, len(original_text))
+    except TranslationOverloaded as e:
+        logger.warning("Перевод для пользователя %s отклонен: %s", message.from_user.id, e)
+        await message.answer("Сейчас слишком много запросов на перевод. Попробуйте чуть позже.")
+    except asyncio.TimeoutError:
+        logger.error("Таймаут при переводе текста (%s символов)", len(original_text))
+        await message.answer("Переводчик не ответил вовремя. Попробуйте еще раз.")
     except Exception as e:
-        logging.error(f"Ошибка при переводе текста '{original_text}': {e}")
+        logger.error("Ошибка при переводе текста (%s символов): %s", len(original_text), e)
         await message.answer("К сожалению, не удалось перевести текст. Попробуйте еще раз или измените ваш запрос.")
\ No newline at end of file
@@ -0,0 +1,213 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from bot.config import (
+    LOG_LEVEL,
+    LOG_FILE,
+    LOG_MAX_BYTES,
+    LOG_BACKUP_COUNT,
+    LOG_CONSOLE,
+    LOG_QUEUE_SIZE,
+    LOG_MAX_FIELD_CHARS,
+    LOG_SAMPLE_RATE,
+    LOG_SAMPLED_LOGGERS,
+)
+
+TEXT_FORMAT = "%(asctime)s - %(processName)s - %(levelname)s - %(name)s - %(message)s"
+
+# Стандартные атрибуты LogRecord; все остальное пришло через extra=... и попадает в JSON
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'always'}
+
+
+def truncate(value, limit: int = LOG_MAX_FIELD_CHARS):
+    """Обрезает длинные строки и bytes, чтобы в лог не попадали целые сообщения пользователей."""
+    if isinstance(value, str) and len(value) > limit:
+        return f"{value[:limit]}…(+{len(value) - limit})"
+    if isinstance(value, (bytes, bytearray)) and len(value) > limit:
+        return f"<{len(value)} байт>"
+    return value
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись - одна строка JSON: время, уровень, логгер, процесс, сообщение, поля из extra."""
+
+    def __init__(self, max_chars: int = LOG_MAX_FIELD_CHARS):
+        super().__init__()
+        self.max_chars = max_chars
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'process': record.processName,
+            'msg': truncate(_message(record, self.max_chars), self.max_chars * 4),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = truncate(value, self.max_chars)
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Привычный текстовый формат для консоли, с теми же ограничениями длины."""
+
+    def __init__(self, max_chars: int = LOG_MAX_FIELD_CHARS):
+        super().__init__(TEXT_FORMAT)
+        self.max_chars = max_chars
+
+    def format(self, record: logging.LogRecord) -> str:
+        record.message = truncate(_message(record, self.max_chars), self.max_chars * 4)
+        record.asctime = self.formatTime(record)
+        text = self.formatMessage(record)
+        if record.exc_info:
+            text += '\n' + self.formatException(record.exc_info)
+        return text
+
+
+def _message(record: logging.LogRecord, max_chars: int) -> str:
+    """record.getMessage(), но длинные аргументы обрезаются до подстановки."""
+    args = record.args
+    if isinstance(args, tuple):
+        args = tuple(truncate(arg, max_chars) for arg in args)
+    elif isinstance(args, dict):
+        args = {key: truncate(value, max_chars) for key, value in args.items()}
+    msg = str(record.msg)
+    return msg % args if args else msg
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Пропускает лишь долю rate записей уровня INFO и ниже от частых логгеров
+    (например, по записи на каждый апдейт). Предупреждения и ошибки не трогаются,
+    как и записи с extra={'always': True}.
+    """
+
+    def __init__(self, rate: float = LOG_SAMPLE_RATE, loggers=LOG_SAMPLED_LOGGERS):
+        super().__init__()
+        self.rate = rate
+        self.loggers = tuple(loggers)
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if (self.rate >= 1 or record.levelno > logging.INFO or not record.name.startswith(self.loggers)
+                or getattr(record, 'always', False)):
+            return True
+        if random.random() < self.rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class AsyncQueueHandler(QueueHandler):
+    """
+    QueueHandler, который ничего не форматирует в вызывающем потоке: запись кладется
+    в очередь как есть, а строку собирает поток писателя. Если писатель не успевает
+    и очередь заполнена, запись отбрасывается - цикл событий не ждет диск.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.queued = 0
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+            self.queued += 1
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        # Очередь может быть заполнена: маркер остановки ждет места, а не теряется
+        self.queue.put(self._sentinel)
+
+
+class LoggingPipeline:
+    """Очередь, фильтр выборки и поток-писатель; stop() дописывает очередь и закрывает файлы."""
+
+    def __init__(self, handler: AsyncQueueHandler, sampler: SamplingFilter, listener: _Listener):
+        self.handler = handler
+        self.sampler = sampler
+        self.listener = listener
+        self._lock = threading.Lock()
+        self._stopped = False
+
+    def stop(self):
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+        logging.getLogger().removeHandler(self.handler)
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
+
+    def stats(self) -> dict:
+        return {
+            'queued': self.handler.queued,
+            'dropped': self.handler.dropped,
+            'sampled_out': self.sampler.sampled_out,
+            'backlog': self.handler.queue.qsize(),
+        }
+
+
+def setup_logging(log_file: str = LOG_FILE, level: str = LOG_LEVEL, console: bool = LOG_CONSOLE,
+                  sample_rate: float = LOG_SAMPLE_RATE, queue_size: int = LOG_QUEUE_SIZE) -> LoggingPipeline:
+    """
+    Направляет все логи процесса через очередь в фоновый поток, который пишет JSON-строки
+    в log_file с ротацией по размеру и (если console) текст в stderr. Заменяет basicConfig.
+    """
+    handlers = []
+    if log_file:
+        os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+        file_handler = RotatingFileHandler(log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT,
+                                           encoding='utf-8')
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+    if console or not handlers:
+        console_handler = logging.StreamHandler(sys.stderr)
+        console_handler.setFormatter(TextFormatter())
+        handlers.append(console_handler)
+
+    queue_handler = AsyncQueueHandler(queue.Queue(maxsize=queue_size))
+    sampler = SamplingFilter(rate=sample_rate)
+    queue_handler.addFilter(sampler)
+    listener = _Listener(queue_handler.queue, *handlers, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener.start()
+    pipeline = LoggingPipeline(queue_handler, sampler, listener)
+    atexit.register(pipeline.stop)
+    return pipeline
+
+
+def worker_log_file(log_file: str, index: int) -> str:
+    """Отдельный файл для каждого воркера: ротация одного файла из нескольких процессов небезопасна."""
+    if not log_file:
+        return log_file
+    root, ext = os.path.splitext(log_file)
+    return f"{root}.worker-{index}{ext}"
@@ -2,55 +2,176 @@ import asyncio
 import logging
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
-from aiogram.fsm.storage.memory import MemoryStorage # <--- Импортируем MemoryStorage
 
-from bot.config import BOT_TOKEN
+from bot.config import (
+    BOT_TOKEN,
+    BOT_MODE,
+    DB_WRITE_BATCH_SIZE,
+    FSM_STATE_TTL,
+    FSM_FLUSH_DELAY,
+    FSM_CACHE_SIZE,
+    FSM_SWEEP_INTERVAL,
+    JOURNAL_RING_SIZE,
+    JOURNAL_FLUSH_DELAY,
+    JOURNAL_MAX_REPLAYS,
+    JOURNAL_PRUNE_INTERVAL,
+    METRICS_HOST,
+    METRICS_PORT,
+    SHARD_WORKERS,
+)
 from bot.handlers.user_handlers import user_router
-from bot.db.database import init_db
+from bot.db.database import init_db, close_db, get_pool
+from bot.db.fsm_storage import SQLiteStorage
+from bot.db.journal import UpdateJournal
+from bot.services.translation import translation_service
+from bot.services.photos import photo_ingestor, photo_processor
+from bot.services.tts import tts_service
+from bot.services.outbound import send_scheduler
+from bot.middlewares.throttling import throttling_middleware
+from bot.services.media import media_registry
+from bot.services.metrics import metrics, metrics_middleware, ApiMetricsMiddleware, start_metrics_server
+from bot.webhook import run_webhook
+from bot.polling import run_polling
+from bot.sharding import run_sharded
+from bot.log import setup_logging
 
-async def main():
-    # Настройка логирования
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
+def create_bot(session=None, scheduler=send_scheduler) -> Bot:
+    """Создает бота; все исходящие запросы проходят через планировщик с лимитами Telegram."""
+    bot = Bot(token=BOT_TOKEN, parse_mode=ParseMode.HTML, session=session)
+    bot.session.middleware(scheduler)
+    # Время самих запросов к Telegram, без ожидания в планировщике
+    bot.session.middleware(ApiMetricsMiddleware(metrics))
+    return bot
+
+
+def create_storage() -> SQLiteStorage:
+    """FSM Storage в SQLite: незавершенные регистрации переживают перезапуск."""
+    return SQLiteStorage(
+        get_pool(),
+        ttl=FSM_STATE_TTL,
+        flush_delay=FSM_FLUSH_DELAY,
+        cache_size=FSM_CACHE_SIZE,
+        sweep_interval=FSM_SWEEP_INTERVAL,
+    )
+
+
+def create_journal() -> UpdateJournal:
+    """Журнал апдейтов: принятые апдейты переживают перезапуск, повторы отсекаются."""
+    return UpdateJournal(
+        get_pool(),
+        ring_size=JOURNAL_RING_SIZE,
+        flush_delay=JOURNAL_FLUSH_DELAY,
+        max_replays=JOURNAL_MAX_REPLAYS,
+        prune_interval=JOURNAL_PRUNE_INTERVAL,
+        batch_size=DB_WRITE_BATCH_SIZE,
     )
+
+
+def create_dispatcher(storage: SQLiteStorage, journal: UpdateJournal = None) -> Dispatcher:
+    """Собирает диспетчер с user_router и всеми middleware. Вызывается один раз на процесс."""
+    dp = Dispatcher(storage=storage)
+    if journal is not None:
+        # Отметка об обработке - после всех обработчиков; способ получения апдейтов берет журнал из dp
+        dp.update.outer_middleware(journal)
+        dp['update_journal'] = journal
+        metrics.add_collector('update_journal', journal.stats)
+
+    # Метрики: внешняя middleware замеряет всю обработку, внутренняя запоминает обработчик
+    for observer in (user_router.message, user_router.callback_query):
+        observer.outer_middleware(metrics_middleware)
+        observer.middleware(metrics_middleware.tag_handler)
+        # Ограничение частоты запросов: после фильтров, когда уже известен обработчик
+        observer.middleware(throttling_middleware)
+
+    metrics.add_collector('fsm_states', storage.state_counts, label='state')
+    metrics.add_collector('translation', translation_service.stats)
+    metrics.add_collector('translation_cache', translation_service.cache.stats)
+    metrics.add_collector('photos', photo_ingestor.stats)
+    metrics.add_collector('photo_processing', photo_processor.stats)
+    metrics.add_collector('tts', tts_service.stats)
+    metrics.add_collector('media', lambda: {'uploads': media_registry.uploads, 'sent_by_id': media_registry.sent_by_id})
+    metrics.add_collector('outbound', send_scheduler.stats)
+    metrics.add_collector('throttling', throttling_middleware.stats)
+
+    # Подключение роутеров
+    dp.include_router(user_router)
+    return dp
+
+
+async def run_bot(ingest, scheduler=send_scheduler, metrics_port: int = METRICS_PORT, session=None,
+                  init_schema: bool = True, own_journal: bool = True):
+    """
+    Поднимает БД и сервисы, собирает бота и диспетчер и вызывает ingest(bot, dp),
+    который получает апдейты (полинг, вебхук или шард). После его завершения все останавливает.
+    Воркеры шардов запускаются с init_schema=False и own_journal=False: миграции,
+    прием апдейтов в журнал и его очистку выполняет только фронт.
+    """
     logger = logging.getLogger(__name__)
-    logger.info("Бот запускается...")
 
     # --- Новое: Инициализация базы данных ---
     try:
-        await init_db()
+        await init_db(create_schema=init_schema)
     except Exception as e:
-        logger.critical(f"Критическая ошибка при инициализации БД: {e}. Бот не может стартовать.")
+        logger.critical("Критическая ошибка при инициализации БД: %s. Бот не может стартовать.", e)
         return # Останавливаем запуск, если БД не инициализирована
     # ------------------------------------------
 
-    # Инициализация бота и диспетчера
-    bot = Bot(token=BOT_TOKEN, parse_mode=ParseMode.HTML)
-    dp = Dispatcher() # Пока без FSM Storage, добавим на след. шаге
-
-    # --- Новое: Инициализация FSM Storage ---
-    storage = MemoryStorage()
-    dp = Dispatcher(storage=storage)
-
-    # Подключение роутеров
-    dp.include_router(user_router)
+    # Фоновое сохранение фото
+    await photo_ingestor.start()
 
-    # Удаление вебхука перед запуском
-    await bot.delete_webhook(drop_pending_updates=True)
+    # Инициализация бота и диспетчера
+    bot = create_bot(session=session, scheduler=scheduler)
+    storage = create_storage()
+    storage.start()
+    journal = create_journal()
+    if own_journal:
+        await journal.start()
+    dp = create_dispatcher(storage, journal)
+    metrics_runner = None
 
-    # Запуск полинга
     try:
-        logger.info("Начало полинга...")
-        await dp.start_polling(bot)
+        if metrics_port:
+            metrics_runner = await start_metrics_server(metrics, METRICS_HOST, metrics_port)
+        await ingest(bot, dp)
     finally:
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await photo_ingestor.close()
+        await translation_service.shutdown()
+        tts_service.shutdown()
+        logging.info("Статистика отправки: %s", scheduler.stats())
+        logging.info("Статистика ограничения запросов: %s", throttling_middleware.stats())
+        await storage.close()
+        await journal.close()
+        await close_db()
         await bot.session.close()
         logger.info("Бот остановлен.")
 
+
+async def ingest_updates(bot: Bot, dp: Dispatcher):
+    """Получает апдейты в одном процессе: вебхуком или полингом."""
+    if BOT_MODE == 'webhook':
+        await run_webhook(bot, dp)
+    else:
+        await run_polling(bot, dp)
+
+
+async def main():
+    # Логи пишет фоновый поток: цикл событий не ждет диск
+    log_pipeline = setup_logging()
+    metrics.add_collector('logging', log_pipeline.stats)
+    logging.info("Бот запускается...")
+
+    if SHARD_WORKERS > 0:
+        # Апдейты принимает этот процесс, а обрабатывают SHARD_WORKERS процессов-воркеров
+        await run_sharded(SHARD_WORKERS)
+    else:
+        await run_bot(ingest_updates)
+
 if __name__ == '__main__':
     try:
         asyncio.run(main())
     except (KeyboardInterrupt, SystemExit):
         logging.info("Выполнение программы прервано пользователем.")
     except Exception as e:
-        logging.critical(f"Непредвиденная ошибка в main: {e}", exc_info=True)
\ No newline at end of file
+        logging.critical("Непредвиденная ошибка в main: %s", e, exc_info=True)
\ No newline at end of file
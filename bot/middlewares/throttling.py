@@ -0,0 +1,161 @@
+import time
+import logging
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, Message
+
+from bot.config import (
+    THROTTLE_USER_RATE,
+    THROTTLE_USER_BURST,
+    THROTTLE_HEAVY_RATE,
+    THROTTLE_HEAVY_BURST,
+    THROTTLE_MAX_IN_FLIGHT,
+    THROTTLE_HEAVY_SHARE,
+    THROTTLE_NOTICE_INTERVAL,
+)
+
+THROTTLED_NOTICE = "Вы отправляете сообщения слишком часто. Подождите немного, лишние сообщения пропущены."
+OVERLOADED_NOTICE = "Бот сейчас перегружен. Попробуйте повторить запрос через минуту."
+
+
+class _Bucket:
+    """Token bucket: tokens пополняются со скоростью rate в секунду, не больше burst."""
+
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, rate: float, burst: float, now: float) -> bool:
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def is_full(self, rate: float, burst: float, now: float) -> bool:
+        return self.tokens + (now - self.updated) * rate >= burst
+
+
+class _UserState:
+    __slots__ = ('bucket', 'handlers', 'notified_at')
+
+    def __init__(self, burst: float, now: float):
+        self.bucket = _Bucket(burst, now)
+        self.handlers = {}      # имя тяжелого обработчика -> _Bucket
+        self.notified_at = 0.0
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Ограничение частоты запросов и сброс нагрузки (внутренняя middleware роутера).
+
+    Каждому пользователю разрешено user_rate апдейтов в секунду, а тяжелым
+    обработчикам (флаг cost='heavy': перевод, фото, озвучка) - еще и heavy_rate
+    запросов в секунду на каждый обработчик. Лишние апдейты пропускаются.
+    Когда одновременно обрабатывается max_in_flight апдейтов, новые отклоняются,
+    причем тяжелые - уже при заполнении heavy_share слотов, чтобы /start, /help
+    и кнопки работали и под нагрузкой. Пользователь получает одно предупреждение
+    за notice_interval секунд, сколько бы сообщений ни было пропущено.
+    Состояние неактивных пользователей периодически удаляется.
+    """
+
+    def __init__(self, user_rate: float = THROTTLE_USER_RATE, user_burst: int = THROTTLE_USER_BURST,
+                 heavy_rate: float = THROTTLE_HEAVY_RATE, heavy_burst: int = THROTTLE_HEAVY_BURST,
+                 max_in_flight: int = THROTTLE_MAX_IN_FLIGHT, heavy_share: float = THROTTLE_HEAVY_SHARE,
+                 notice_interval: float = THROTTLE_NOTICE_INTERVAL, sweep_interval: float = 60):
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.heavy_rate = heavy_rate
+        self.heavy_burst = heavy_burst
+        self.max_in_flight = max_in_flight
+        self.max_heavy_in_flight = max(1, int(max_in_flight * heavy_share))
+        self.notice_interval = notice_interval
+        self.sweep_interval = sweep_interval
+        self._users = {}        # user_id -> _UserState
+        self._last_sweep = time.monotonic()
+        self.in_flight = 0
+        self.passed = 0
+        self.throttled = 0
+        self.shed = 0
+        self.notices = 0
+
+    async def __call__(self, handler, event, data):
+        user = data.get('event_from_user')
+        if user is None:
+            return await handler(event, data)
+
+        now = time.monotonic()
+        self._sweep(now)
+        state = self._users.get(user.id)
+        if state is None:
+            state = self._users[user.id] = _UserState(self.user_burst, now)
+
+        is_heavy = get_flag(data, 'cost') == 'heavy'
+        if self.in_flight >= (self.max_heavy_in_flight if is_heavy else self.max_in_flight):
+            self.shed += 1
+            await self._notify(event, state, now, OVERLOADED_NOTICE)
+            return None
+
+        allowed = state.bucket.take(self.user_rate, self.user_burst, now)
+        if allowed and is_heavy:
+            name = data['handler'].callback.__name__
+            bucket = state.handlers.get(name)
+            if bucket is None:
+                bucket = state.handlers[name] = _Bucket(self.heavy_burst, now)
+            allowed = bucket.take(self.heavy_rate, self.heavy_burst, now)
+        if not allowed:
+            self.throttled += 1
+            await self._notify(event, state, now, THROTTLED_NOTICE)
+            return None
+
+        self.passed += 1
+        self.in_flight += 1
+        try:
+            return await handler(event, data)
+        finally:
+            self.in_flight -= 1
+
+    async def _notify(self, event, state: _UserState, now: float, text: str):
+        """Одно предупреждение за notice_interval; на нажатие кнопки отвечаем всегда, чтобы убрать "часики"."""
+        should_notify = now - state.notified_at >= self.notice_interval
+        if should_notify:
+            state.notified_at = now
+            self.notices += 1
+        try:
+            if isinstance(event, CallbackQuery):
+                await event.answer(text if should_notify else None)
+            elif isinstance(event, Message) and should_notify:
+                await event.answer(text)
+        except Exception as e:
+            logging.error("Не удалось отправить предупреждение об ограничении: %s", e)
+
+    def _sweep(self, now: float):
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        idle = [
+            user_id for user_id, state in self._users.items()
+            if now - state.notified_at >= self.notice_interval
+            and state.bucket.is_full(self.user_rate, self.user_burst, now)
+            and all(bucket.is_full(self.heavy_rate, self.heavy_burst, now) for bucket in state.handlers.values())
+        ]
+        for user_id in idle:
+            del self._users[user_id]
+
+    def stats(self) -> dict:
+        return {
+            'in_flight': self.in_flight,
+            'active_users': len(self._users),
+            'passed': self.passed,
+            'throttled': self.throttled,
+            'shed': self.shed,
+            'notices': self.notices,
+        }
+
+
+# Общий экземпляр; подключается к user_router в main
+throttling_middleware = ThrottlingMiddleware()
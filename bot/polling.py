@@ -0,0 +1,143 @@
+"""
+Полинг с журналом апдейтов вместо dp.start_polling.
+
+Telegram считает апдейты доставленными, как только следующий getUpdates пришел
+с большим offset, а aiogram делает этот запрос, не дожидаясь обработки: если бот
+упал посреди обработки, апдейты потеряны. Здесь каждая пачка сначала
+записывается в журнал (bot/db/journal.py) и только потом подтверждается;
+после перезапуска необработанные апдейты повторяются из журнала, а полинг
+продолжается с последнего принятого апдейта.
+"""
+import json
+import signal
+import asyncio
+import logging
+
+from aiogram import Bot, Dispatcher
+from aiogram.dispatcher.dispatcher import DEFAULT_BACKOFF_CONFIG
+from aiogram.exceptions import TelegramRetryAfter, TelegramUnauthorizedError
+from aiogram.types import Update
+from aiogram.utils.backoff import Backoff, BackoffConfig
+
+from bot.config import DROP_PENDING_UPDATES, WEBHOOK_MAX_CONCURRENT, WEBHOOK_DRAIN_TIMEOUT
+
+
+class DispatcherFeed:
+    """
+    Передает апдейты в диспетчер фоновыми задачами, не больше max_concurrent сразу:
+    пока слотов нет, put() ждет, и следующий getUpdates не запрашивается.
+    При остановке дорабатывает принятые апдейты.
+    """
+
+    def __init__(self, bot: Bot, dp: Dispatcher, max_concurrent: int = WEBHOOK_MAX_CONCURRENT,
+                 drain_timeout: float = WEBHOOK_DRAIN_TIMEOUT):
+        self.bot = bot
+        self.dp = dp
+        self.drain_timeout = drain_timeout
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._tasks = set()
+
+    async def put(self, update: Update, data: dict = None):
+        await self._slots.acquire()
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, update: Update):
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception as e:
+            logging.error("Ошибка обработки апдейта %s: %s", update.update_id, e, exc_info=True)
+        finally:
+            self._slots.release()
+
+    async def close(self):
+        tasks = set(self._tasks)
+        if not tasks:
+            return
+        logging.info("Дорабатываем %s принятых апдейтов...", len(tasks))
+        _, pending = await asyncio.wait(tasks, timeout=self.drain_timeout)
+        if pending:
+            logging.warning("Не успели обработать %s апдейтов за %s с", len(pending), self.drain_timeout)
+            for task in pending:
+                task.cancel()
+
+
+async def poll_updates(bot: Bot, allowed_updates: list, handle, journal=None, timeout: int = 25,
+                       backoff_config: BackoffConfig = DEFAULT_BACKOFF_CONFIG):
+    """
+    Забирает апдейты через getUpdates, пока не придет SIGTERM/SIGINT, и передает
+    каждый новый в handle(update, data), где data - апдейт в виде словаря для JSON.
+    С журналом пачка записывается в него до подтверждения, а повторы пропускаются.
+
+    Ошибки getUpdates не останавливают полинг: повтор - с растущей паузой
+    (backoff_config, как в dp.start_polling), при флуд-контроле - через retry_after.
+    Наружу выходит только отозванный или неверный токен.
+    """
+    await bot.delete_webhook(drop_pending_updates=DROP_PENDING_UPDATES)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
+    stopped = asyncio.create_task(stop.wait())
+    backoff = Backoff(config=backoff_config)
+
+    offset = journal.resume_offset() if journal is not None and not DROP_PENDING_UPDATES else None
+    if offset is not None:
+        logging.info("Продолжаем полинг с апдейта %s", offset)
+    while not stop.is_set():
+        request = asyncio.create_task(bot.get_updates(offset=offset, timeout=timeout, allowed_updates=allowed_updates))
+        await asyncio.wait({request, stopped}, return_when=asyncio.FIRST_COMPLETED)
+        if not request.done():
+            request.cancel()
+            break
+        try:
+            updates = request.result()
+        except TelegramUnauthorizedError:
+            stopped.cancel()
+            raise   # Токен отозван: повторять бесполезно
+        except TelegramRetryAfter as e:
+            logging.warning("getUpdates: флуд-контроль, повтор через %s с", e.retry_after)
+            await asyncio.wait({stopped}, timeout=e.retry_after)
+            continue
+        except Exception as e:
+            delay = next(backoff)
+            logging.warning("Ошибка getUpdates (%s: %s), попытка %s, повтор через %.1f с",
+                            type(e).__name__, e, backoff.counter, delay)
+            await asyncio.wait({stopped}, timeout=delay)
+            continue
+        if backoff.counter:
+            logging.info("getUpdates снова работает после %s неудачных попыток", backoff.counter)
+            backoff.reset()
+        if not updates:
+            continue
+        batch = [(update, update.model_dump(mode='json', exclude_none=True)) for update in updates]
+        if journal is not None:
+            # Вся пачка - одна транзакция журнала; подтверждение - следующим getUpdates
+            accepted = await asyncio.gather(*(
+                journal.accept(update.update_id, json.dumps(data, ensure_ascii=False)) for update, data in batch
+            ))
+        else:
+            accepted = [True] * len(batch)
+        for (update, data), is_new in zip(batch, accepted):
+            if is_new:
+                await handle(update, data)
+        offset = updates[-1].update_id + 1
+    stopped.cancel()
+    logging.info("Получен сигнал остановки, завершаем полинг...")
+
+
+async def run_polling(bot: Bot, dp: Dispatcher):
+    """Полинг в одном процессе: повторяет необработанные до перезапуска апдейты и получает новые."""
+    journal = dp.get('update_journal')
+    feed = DispatcherFeed(bot, dp)
+    try:
+        if journal is not None:
+            await journal.replay(bot, feed.put)
+        logging.info("Начало полинга...")
+        await poll_updates(bot, dp.resolve_used_update_types(), feed.put, journal)
+    finally:
+        await feed.close()
@@ -0,0 +1,253 @@
+"""
+Массовый импорт и экспорт списка студентов (CSV и JSONL).
+
+Файл читается построчно, поэтому память не зависит от его размера; строки
+проверяются теми же правилами, что и при регистрации через /register
+(bot/validation.py), и вставляются большими транзакциями через executemany.
+
+Запуск из командной строки:
+    python -m bot.roster [--db school_data.db] import students.csv [--format csv|jsonl]
+    python -m bot.roster [--db school_data.db] export students.csv   (или '-' для вывода в stdout)
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import sys
+import time
+
+from bot.config import ROSTER_BATCH_SIZE, ROSTER_MAX_ERRORS
+from bot.db import database
+from bot.validation import clean_student, InvalidStudent
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'jsonl')
+# Расширение файла -> формат
+EXTENSIONS = {'.csv': 'csv', '.txt': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+# Допустимые названия колонок (без учета регистра)
+COLUMNS = {
+    'name': ('name', 'имя', 'фио'),
+    'age': ('age', 'возраст'),
+    'grade': ('grade', 'класс'),
+}
+EXPORT_HEADER = ('id', 'name', 'age', 'grade')
+# Через сколько строк разбор уступает цикл событий: импорт из бота не задерживает другие апдейты
+YIELD_EVERY = 200
+
+
+class RosterFormatError(ValueError):
+    """Файл целиком не подходит для импорта: нет нужных колонок, неизвестный формат."""
+
+
+class ImportReport:
+    """Итог импорта: сколько строк прочитано, добавлено, отклонено и первые ошибки."""
+
+    def __init__(self, max_errors: int = ROSTER_MAX_ERRORS):
+        self.rows = 0
+        self.imported = 0
+        self.rejected = 0
+        self.errors = []   # [(номер строки, причина), ...], не больше max_errors
+        self.elapsed = 0.0
+        self.max_errors = max_errors
+
+    def reject(self, line: int, reason: str):
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((line, reason))
+
+    def summary(self) -> str:
+        lines = [f"Строк в файле: {self.rows}, добавлено: {self.imported}, с ошибками: {self.rejected} "
+                 f"({self.elapsed:.1f} с)."]
+        if self.errors:
+            lines.append("Ошибки:")
+            lines.extend(f"  строка {line}: {reason}" for line, reason in self.errors)
+            if self.rejected > len(self.errors):
+                lines.append(f"  ... и еще {self.rejected - len(self.errors)}")
+        return '\n'.join(lines)
+
+
+def detect_format(filename: str):
+    """Формат по расширению файла ('csv', 'jsonl') или None."""
+    dot = filename.rfind('.')
+    return EXTENSIONS.get(filename[dot:].lower()) if dot != -1 else None
+
+
+def iter_records(stream, fmt: str):
+    """
+    Построчно разбирает файл. Отдает (номер строки, (name, age, grade), ошибка):
+    значения еще не проверены; если строку не удалось разобрать, вместо значений None.
+    """
+    if fmt == 'csv':
+        return _iter_csv(stream)
+    if fmt == 'jsonl':
+        return _iter_jsonl(stream)
+    raise RosterFormatError(f"неизвестный формат {fmt!r}, ожидается один из: {', '.join(FORMATS)}")
+
+
+def _find_columns(names) -> list:
+    """Индексы (или ключи) колонок name, age, grade среди названий из заголовка."""
+    lowered = [str(name).strip().lower() for name in names]
+    found = []
+    for field, aliases in COLUMNS.items():
+        index = next((i for i, name in enumerate(lowered) if name in aliases), None)
+        if index is None:
+            raise RosterFormatError(f"нет колонки {field!r} (допустимые названия: {', '.join(aliases)})")
+        found.append(index)
+    return found
+
+
+def _iter_csv(stream):
+    header_line = stream.readline()
+    if not header_line:
+        return
+    # Excel в русской локали сохраняет CSV через ';'
+    delimiter = max(',;\t', key=header_line.count)
+    columns = _find_columns(next(csv.reader([header_line], delimiter=delimiter)))
+    width = max(columns) + 1
+    reader = csv.reader(stream, delimiter=delimiter)
+    for row in reader:
+        if not any(row):
+            continue
+        line = reader.line_num + 1   # +1 - заголовок прочитан отдельно
+        if len(row) < width:
+            yield line, None, f"ожидалось не меньше {width} колонок, получено {len(row)}"
+            continue
+        yield line, tuple(row[i] for i in columns), None
+
+
+def _iter_jsonl(stream):
+    for line, text in enumerate(stream, 1):
+        if not text.strip():
+            continue
+        try:
+            record = json.loads(text)
+        except ValueError as e:
+            yield line, None, f"некорректный JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line, None, "ожидался объект JSON"
+            continue
+        record = {str(key).lower(): value for key, value in record.items()}
+        yield line, tuple(next((record[key] for key in aliases if key in record), None)
+                          for aliases in COLUMNS.values()), None
+
+
+async def import_students(stream, fmt: str, batch_size: int = ROSTER_BATCH_SIZE,
+                          max_errors: int = ROSTER_MAX_ERRORS, dry_run: bool = False) -> ImportReport:
+    """
+    Импортирует студентов из открытого текстового файла.
+
+    Строки с ошибками пропускаются и попадают в отчет; остальные вставляются
+    транзакциями по batch_size строк. dry_run - только проверить файл.
+    Ошибка базы данных прерывает импорт: уже записанные пачки остаются в базе.
+
+    Пока пачка пишется в базу (в потоке соединения), разбирается следующая:
+    разбор и запись идут одновременно, а в памяти не больше двух пачек.
+    Каждые YIELD_EVERY строк разбор уступает цикл событий другим задачам.
+    """
+    report = ImportReport(max_errors)
+    start = time.perf_counter()
+    batch = []
+    pending = None   # Вставка предыдущей пачки
+
+    async def flush(rows):
+        nonlocal pending
+        if pending is not None:
+            report.imported += await pending
+            pending = None
+        if rows:
+            pending = asyncio.ensure_future(_insert(rows, dry_run))
+
+    try:
+        for line, values, error in iter_records(stream, fmt):
+            report.rows += 1
+            if report.rows % YIELD_EVERY == 0:
+                await asyncio.sleep(0)
+            if error is None:
+                try:
+                    batch.append(clean_student(*values))
+                except InvalidStudent as e:
+                    error = str(e)
+            if error is not None:
+                report.reject(line, error)
+            elif len(batch) >= batch_size:
+                await flush(batch)
+                batch = []
+        await flush(batch)
+        await flush(None)
+    finally:
+        if pending is not None:
+            # Импорт прерван: дожидаемся начатой вставки, чтобы не бросать соединение посреди транзакции
+            await asyncio.gather(pending, return_exceptions=True)
+    report.elapsed = time.perf_counter() - start
+    logger.info("Импорт студентов: строк %s, добавлено %s, отклонено %s за %.2f с",
+                report.rows, report.imported, report.rejected, report.elapsed)
+    return report
+
+
+async def _insert(rows, dry_run: bool) -> int:
+    return len(rows) if dry_run else await database.insert_students(rows)
+
+
+async def export_students(stream, batch_size: int = ROSTER_BATCH_SIZE) -> int:
+    """Пишет всех студентов в CSV пачками по batch_size; возвращает число строк."""
+    writer = csv.writer(stream)
+    writer.writerow(EXPORT_HEADER)
+    count = 0
+    async for batch in database.iter_student_batches(batch_size):
+        writer.writerows(batch)
+        count += len(batch)
+    return count
+
+
+async def _run_cli(args) -> int:
+    if args.db:
+        database.DB_PATH = args.db
+    await database.init_db()
+    try:
+        if args.command == 'import':
+            fmt = args.format or detect_format(args.file)
+            if fmt is None:
+                print("Не удалось определить формат по расширению, укажите --format", file=sys.stderr)
+                return 2
+            with open(args.file, encoding=args.encoding, newline='') as f:
+                report = await import_students(f, fmt, batch_size=args.batch_size, dry_run=args.dry_run)
+            print(report.summary())
+            return 0 if not report.rejected else 1
+        if args.file == '-':
+            count = await export_students(sys.stdout, batch_size=args.batch_size)
+        else:
+            with open(args.file, 'w', encoding=args.encoding, newline='') as f:
+                count = await export_students(f, batch_size=args.batch_size)
+        print(f"Выгружено студентов: {count}", file=sys.stderr)
+        return 0
+    finally:
+        await database.close_db()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m bot.roster', description="Импорт и экспорт списка студентов")
+    parser.add_argument('--db', help="путь к базе данных (по умолчанию DB_PATH)")
+    parser.add_argument('--batch-size', type=int, default=ROSTER_BATCH_SIZE, help="строк в одной транзакции")
+    parser.add_argument('--encoding', default='utf-8-sig')
+    commands = parser.add_subparsers(dest='command', required=True)
+    import_parser = commands.add_parser('import', help="загрузить студентов из CSV или JSONL")
+    import_parser.add_argument('file')
+    import_parser.add_argument('--format', choices=FORMATS, help="по умолчанию - по расширению файла")
+    import_parser.add_argument('--dry-run', action='store_true', help="только проверить файл")
+    export_parser = commands.add_parser('export', help="выгрузить студентов в CSV")
+    export_parser.add_argument('file', help="путь к файлу или '-' для stdout")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s - %(name)s - %(message)s")
+    try:
+        sys.exit(asyncio.run(_run_cli(args)))
+    except (RosterFormatError, UnicodeDecodeError, OSError) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        sys.exit(2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+import asyncio
+
+
+class MicroBatcher:
+    """
+    Собирает одновременные запросы в пачки.
+
+    Запросы с одинаковым ключом группы копятся в течение window секунд
+    или пока их не наберется max_size, после чего вызывается handler(group, items)
+    с уникальными элементами. handler возвращает список результатов в том же порядке,
+    результаты раздаются всем ожидающим; исключение на месте результата достается
+    только ожидающим этого элемента. Одинаковые элементы внутри окна
+    объединяются и отправляются один раз.
+    """
+
+    def __init__(self, handler, window: float, max_size: int):
+        self.handler = handler
+        self.window = window
+        self.max_size = max_size
+        self._batches = {}  # group -> {item: future}
+        self._timers = {}   # group -> TimerHandle
+        self._tasks = set()
+        self.batches_sent = 0
+        self.items_sent = 0
+        self.items_deduplicated = 0
+
+    async def submit(self, group, item):
+        batch = self._batches.setdefault(group, {})
+        future = batch.get(item)
+        if future is not None:
+            self.items_deduplicated += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            batch[item] = future
+            if len(batch) >= self.max_size:
+                self._flush(group)
+            elif group not in self._timers:
+                self._timers[group] = asyncio.get_running_loop().call_later(self.window, self._flush, group)
+        # shield: отмена одного ожидающего не должна отменять результат для остальных
+        return await asyncio.shield(future)
+
+    def _flush(self, group):
+        timer = self._timers.pop(group, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._batches.pop(group, None)
+        if not batch:
+            return
+        task = asyncio.create_task(self._run(group, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, group, batch):
+        items = list(batch)
+        self.batches_sent += 1
+        self.items_sent += len(items)
+        try:
+            results = await self.handler(group, items)
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for item, result in zip(items, results):
+            future = batch[item]
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def drain(self):
+        """Отправляет все накопленные пачки и дожидается их выполнения."""
+        for group in list(self._batches):
+            self._flush(group)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            'batches': self.batches_sent,
+            'items': self.items_sent,
+            'deduplicated': self.items_deduplicated,
+            'avg_batch': self.items_sent / self.batches_sent if self.batches_sent else 0.0,
+        }
@@ -0,0 +1,71 @@
+"""
+Обработка сохраненных фото: превью и пережатая копия без EXIF.
+
+Функции модуля выполняются в процессах ProcessPoolExecutor (см. PhotoProcessor
+в bot/services/photos.py), поэтому модуль не импортирует ничего, кроме Pillow:
+каждый процесс пула импортирует его заново.
+"""
+import os
+import signal
+from collections import namedtuple
+
+from PIL import Image, ImageOps
+
+# Производный файл: вид ('thumb', 'normalized'), путь относительно папки фото, размеры и вес в байтах
+Variant = namedtuple('Variant', ['kind', 'path', 'width', 'height', 'size'])
+# Итог обработки: размеры оригинала и производные файлы
+ProcessedImage = namedtuple('ProcessedImage', ['width', 'height', 'variants'])
+
+
+def init_worker():
+    """Инициализация процесса пула: Ctrl+C получает только основной процесс, он и останавливает пул."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def warm_up() -> int:
+    """Пустое задание: заставляет пул заранее запустить процесс и импортировать Pillow."""
+    return os.getpid()
+
+
+def variant_path(rel_path: str, kind: str) -> str:
+    """Путь производного файла рядом с оригиналом: ab/cd/<hash>.jpg -> ab/cd/<hash>_thumb.jpg."""
+    base, _ = os.path.splitext(rel_path)
+    return f"{base}_{kind}.jpg"
+
+
+def process_image(root: str, rel_path: str, thumb_size: int, max_side: int, quality: int) -> ProcessedImage:
+    """
+    Создает для фото root/rel_path две копии в JPEG:
+    normalized - не больше max_side по длинной стороне, thumb - не больше thumb_size.
+    Копии поворачиваются по EXIF Orientation и сохраняются без EXIF и других метаданных.
+    Оригинал не меняется.
+    """
+    with Image.open(os.path.join(root, rel_path)) as image:
+        width, height = image.size
+        # JPEG декодируется сразу в уменьшенном масштабе (1/2, 1/4, 1/8), если после этого
+        # длинная сторона остается не меньше max_side
+        scale = min(1.0, max_side / max(width, height))
+        image.draft('RGB', (round(width * scale), round(height * scale)))
+        # Сначала уменьшение, потом поворот: поворачивать меньшую картинку дешевле
+        image.thumbnail((max_side, max_side), Image.BICUBIC)
+        normalized = ImageOps.exif_transpose(image)
+    if normalized.mode != 'RGB':
+        normalized = normalized.convert('RGB')
+
+    thumb = normalized.copy()
+    thumb.thumbnail((thumb_size, thumb_size), Image.BICUBIC)
+
+    variants = [
+        _save(normalized, root, variant_path(rel_path, 'normalized'), 'normalized', quality, progressive=True),
+        _save(thumb, root, variant_path(rel_path, 'thumb'), 'thumb', quality, progressive=False),
+    ]
+    return ProcessedImage(width, height, variants)
+
+
+def _save(image, root: str, rel_path: str, kind: str, quality: int, progressive: bool) -> Variant:
+    full_path = os.path.join(root, rel_path)
+    tmp_path = f"{full_path}.{os.getpid()}.part"
+    # exif не передается, поэтому метаданные оригинала в копию не попадают
+    image.save(tmp_path, 'JPEG', quality=quality, progressive=progressive)
+    os.replace(tmp_path, full_path)
+    return Variant(kind, rel_path, image.width, image.height, os.path.getsize(full_path))
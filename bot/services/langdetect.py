@@ -0,0 +1,258 @@
+import re
+import unicodedata
+from collections import Counter, namedtuple
+from functools import lru_cache
+
+# lang - код языка в обозначениях googletrans или None, если язык не ясен (годится как подсказка переводчику);
+# letters - сколько букв в тексте без ссылок и упоминаний (0 - переводить нечего);
+# confident - язык определен надежно: своя письменность или явное большинство английских служебных слов.
+# Только такому результату можно верить настолько, чтобы не отправлять текст переводчику
+Detection = namedtuple('Detection', ['lang', 'letters', 'confident'])
+
+# Голые домены: ссылки без схемы вроде example.com/page
+_DOMAIN_RE = re.compile(r'[\w-]+(?:\.[\w-]+)*\.(?:com|org|net|ru|io|me|ly|gl|be|info|dev)(?:/\S*)?', re.IGNORECASE)
+_LETTER_RE = re.compile(r'[^\W\d_]')
+_WORD_RE = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)?")
+_CYRILLIC_RE = re.compile(r'[\u0400-\u04ff]')
+
+# Сколько символов текста разбирать: для определения языка начала хватает
+SAMPLE_CHARS = 200
+# Доля букв основной письменности, ниже которой текст считается смешанным
+MIN_SCRIPT_SHARE = 0.6
+# Доля служебных слов языка среди слов текста, начиная с которой язык считается определенным
+MIN_WORD_SHARE = 0.2
+# Сколько разных совпадений (служебных слов и характерных букв) нужно языку и насколько
+# он должен опережать язык с наибольшим числом совпадений, которых у него нет
+MIN_HITS = 2
+MIN_MARGIN = 2
+# Доля английских служебных слов, с которой текст считается английским без переводчика
+MIN_ENGLISH_SHARE = 0.5
+
+# Письменности, по которым язык определяется однозначно (кроме отмеченных в _SHARED_SCRIPTS)
+_SCRIPT_LANGS = {
+    'GREEK': 'el',
+    'HEBREW': 'iw',
+    'HANGUL': 'ko',
+    'HIRAGANA': 'ja',
+    'KATAKANA': 'ja',
+    'THAI': 'th',
+    'GEORGIAN': 'ka',
+    'ARMENIAN': 'hy',
+    'DEVANAGARI': 'hi',
+    'CJK': 'zh-cn',
+}
+# Письменности нескольких языков: результат - только подсказка (иврит и идиш, хинди и маратхи,
+# китайский и японский без каны)
+_SHARED_SCRIPTS = {'HEBREW', 'DEVANAGARI', 'CJK'}
+
+# Частые короткие слова языков на латинице
+_LATIN_WORDS = {
+    'en': frozenset(
+        "the a an and or but is are was were be been am i you he she it we they me my your this that these "
+        "of to in on for with at by from not do does did don't have has had what how why where when who "
+        "can will would there here hello hi hey thanks thank please yes no ok okay good bye sorry just about "
+        "so if all like get go know it's i'm".split()),
+    'de': frozenset(
+        "der die das und ist nicht ich du er sie es wir ihr ein eine einen mit von zu den dem auf für sind "
+        "war auch wie was hallo danke bitte ja nein guten tag aber oder noch".split()),
+    'fr': frozenset(
+        "le la les un une des et est je tu il elle nous vous ils pas ne de du en que qui pour dans avec "
+        "sur bonjour merci oui non c'est mais ou très ça".split()),
+    'es': frozenset(
+        "el la los las un una y es que de en no por para con yo tú él ella hola gracias sí pero como qué "
+        "muy está son del al lo".split()),
+    'it': frozenset(
+        "il lo la gli le un una e è che di da in non per con io tu lui lei noi ciao grazie sì ma come "
+        "molto sono del della".split()),
+    'pt': frozenset(
+        "o a os as um uma e é que de em não por para com eu você ele ela nós olá obrigado obrigada sim "
+        "mas como muito são do da".split()),
+    'nl': frozenset(
+        "de het een en is niet ik je jij hij zij wij van op voor met dat die dit hallo dank bedankt ja "
+        "nee maar zijn ook".split()),
+    'pl': frozenset(
+        "i w z na nie to jest się że do jak ale co ja ty on ona my wy cześć dziękuję tak czy dla od po".split()),
+    'tr': frozenset(
+        "ve bir bu da de ne için ile ben sen o biz siz değil var yok merhaba teşekkürler evet hayır çok "
+        "mi mı ama".split()),
+}
+
+# Частые короткие слова языков на кириллице
+_CYRILLIC_WORDS = {
+    'ru': frozenset(
+        "и в не на я что как это ты он она мы вы они с по да нет а у так все мне меня привет спасибо "
+        "пожалуйста сегодня завтра где когда есть был была для его или если еще уже только дела хорошо".split()),
+    'uk': frozenset(
+        "і в не на я що як це ти він вона ми ви вони з та так ні привіт дякую будь ласка сьогодні завтра "
+        "де коли є для його або якщо ще вже тільки справи добре нового".split()),
+    'be': frozenset(
+        "і у не на я што як гэта ты ён яна мы вы яны з па так дзякуй сёння заўтра дзе калі ёсць".split()),
+    'bg': frozenset(
+        "и в не на аз че как това ти той тя ние вие те с по да а така всички здравей благодаря моля днес "
+        "утре къде кога има или ако още вече само добре какво съм си е са ще".split()),
+    'sr': frozenset(
+        "и у не на ја да како је ти он она ми ви они са шта хвала молим данас сутра где када има добро".split()),
+    'mk': frozenset(
+        "и во не на јас дека како ова ти тој таа ние вие тие со да здраво благодарам денес утре каде кога "
+        "има добро што е".split()),
+    'kk': frozenset(
+        "және мен бұл сен ол не қалай рахмет бүгін ертең қайда бар жоқ сәлем".split()),
+}
+
+# Частые короткие слова языков на арабском письме
+_ARABIC_WORDS = {
+    'ar': frozenset(
+        "في من على إلى أن هذا هذه كيف ما لا نعم شكرا مرحبا حالك أنا هو هي مع عن".split()),
+    'fa': frozenset(
+        "و در به از که این را با است من تو سلام خوب چطور ممنون مرسی هست نه شما".split()),
+    'ur': frozenset(
+        "اور کے کی ہے میں سے کو یہ نہیں آپ کیا شکریہ ہیں".split()),
+}
+
+
+def _index(words_by_lang: dict, marker_groups) -> tuple:
+    """Таблицы "слово -> языки" и "буква -> языки" для голосования в _vote."""
+    word_langs = {}
+    for lang, vocabulary in words_by_lang.items():
+        for word in vocabulary:
+            word_langs.setdefault(word, []).append(lang)
+    marker_langs = {}
+    for chars, langs in marker_groups:
+        for char in chars:
+            marker_langs[char] = langs
+    return word_langs, marker_langs
+
+
+# Буквы, которых нет в английском (у кириллицы и арабского письма - в соседних языках);
+# каждая - голос за перечисленные языки
+_LATIN_INDEX = _index(_LATIN_WORDS, (
+    ('äöüß', ('de',)), ('ñ¿¡', ('es',)), ('ãõ', ('pt',)), ('œëêûîï', ('fr',)),
+    ('èàù', ('fr', 'it')), ('ç', ('fr', 'pt', 'tr')), ('áíóú', ('es', 'pt')),
+    ('ąęłśźżćń', ('pl',)), ('şğı', ('tr',))))
+_CYRILLIC_INDEX = _index(_CYRILLIC_WORDS, (
+    ('ыэё', ('ru', 'be')), ('ъ', ('ru', 'bg')), ('і', ('uk', 'be', 'kk')), ('їєґ', ('uk',)), ('ў', ('be',)),
+    ('ђћ', ('sr',)), ('џљњј', ('sr', 'mk')), ('ѓќѕ', ('mk',)), ('әғқңұһүө', ('kk',))))
+_ARABIC_INDEX = _index(_ARABIC_WORDS, (
+    ('يكة', ('ar',)), ('یک', ('fa', 'ur')), ('پچژگ', ('fa', 'ur')), ('ٹڈڑںےہ', ('ur',))))
+
+
+@lru_cache(maxsize=4096)
+def _script(char: str) -> str:
+    """Письменность буквы: первое слово ее имени в Unicode (LATIN, CYRILLIC, CJK...)."""
+    return unicodedata.name(char, 'UNKNOWN').split(' ', 1)[0]
+
+
+def detect_language(text: str) -> Detection:
+    """
+    Быстрое офлайн-определение языка без обращения к переводчику.
+
+    Сначала выбрасываются ссылки и упоминания; если букв не осталось (эмодзи,
+    числа, одна ссылка), переводить нечего. Дальше язык определяется по
+    письменности, а для латиницы, кириллицы и арабского письма - по частым
+    служебным словам и характерным буквам (см. _vote). Если уверенности нет,
+    lang равен None, и язык определит сам переводчик: текст на кириллице без
+    явных признаков - не обязательно русский, а на арабском письме - арабский.
+    """
+    cleaned = _strip_noise(text[:SAMPLE_CHARS])
+    if not _LETTER_RE.search(cleaned):
+        return Detection(None, 0, False)
+
+    # Частые случаи - латиница без диакритики и кириллица - решаются без разбора
+    # имени каждой буквы
+    letters = sum(map(str.isalpha, cleaned))
+    if cleaned.isascii():
+        lang, confident = _detect_latin(cleaned.lower())
+        return Detection(lang, letters, confident)
+    if len(_CYRILLIC_RE.findall(cleaned)) >= letters * MIN_SCRIPT_SHARE:
+        return Detection(_detect_by_vote(cleaned.lower(), _CYRILLIC_INDEX), letters, False)
+
+    scripts = Counter(_script(char) for char in cleaned if char.isalpha())
+    # Японский текст пишется вперемешку иероглифами и каной: любая кана - уже японский
+    if scripts['HIRAGANA'] or scripts['KATAKANA']:
+        return Detection('ja', letters, True)
+    script, count = scripts.most_common(1)[0]
+    if count < letters * MIN_SCRIPT_SHARE:
+        return Detection(None, letters, False)
+
+    if script == 'LATIN':
+        lang, confident = _detect_latin(cleaned.lower())
+        return Detection(lang, letters, confident)
+    if script == 'ARABIC':
+        return Detection(_detect_by_vote(cleaned, _ARABIC_INDEX), letters, False)
+    lang = _SCRIPT_LANGS.get(script)
+    return Detection(lang, letters, lang is not None and script not in _SHARED_SCRIPTS)
+
+
+def _strip_noise(text: str) -> str:
+    """Убирает ссылки, почту и упоминания: они не переводятся и не говорят о языке."""
+    if '.' not in text and '@' not in text:
+        return text
+    return ' '.join(word for word in text.split() if not _is_noise(word))
+
+
+def _is_noise(word: str) -> bool:
+    if '@' in word or '://' in word or word[:4].lower() == 'www.':
+        return True
+    return '.' in word.rstrip('.,!?:;)') and _DOMAIN_RE.fullmatch(word.rstrip('.,!?:;)')) is not None
+
+
+def _vote(text: str, index: tuple):
+    """
+    Голосование служебных слов и характерных букв. Возвращает (язык, слова текста,
+    совпадения языка, найденные буквы, перевес соперника) или None, если ни один
+    язык не набрал решающего перевеса.
+
+    Языку нужно не меньше MIN_HITS разных совпадений, среди них хотя бы одно
+    слово (одна характерная буква ничего не решает: "naïve", финское "ä"), и
+    перевес над соперниками: у него совпадений строго больше, чем у любого
+    другого языка, и на MIN_MARGIN больше, чем у языка с совпадениями, которых
+    у него нет ("a to je": en - "a", "to", но "je" - французское).
+    """
+    word_langs, marker_langs = index
+    words = _WORD_RE.findall(text)
+    if not words:
+        return None
+    hits = {}   # язык -> совпавшие слова и буквы
+    for word in set(words):
+        for lang in word_langs.get(word, ()):
+            hits.setdefault(lang, set()).add(word)
+    markers = marker_langs.keys() & set(text) if not text.isascii() else set()
+    for char in markers:
+        for lang in marker_langs[char]:
+            hits.setdefault(lang, set()).add(char)
+    if not hits:
+        return None
+
+    best, *others = sorted(hits, key=lambda lang: len(hits[lang]), reverse=True)
+    found = hits[best]
+    runner_up = max((len(hits[lang]) for lang in others), default=0)
+    rival = max((len(hits[lang] - found) for lang in others), default=0)
+    if (len(found) < MIN_HITS or not found - markers
+            or len(found) <= runner_up or len(found) - rival < MIN_MARGIN):
+        return None
+    if sum(word in found for word in words) < len(words) * MIN_WORD_SHARE:
+        return None
+    return best, words, found, markers, rival
+
+
+def _detect_by_vote(text: str, index: tuple):
+    vote = _vote(text, index)
+    return vote[0] if vote is not None else None
+
+
+def _detect_latin(text: str) -> tuple:
+    """
+    Язык текста на латинице: (lang, confident). Уверенным бывает только английский
+    без диакритики и без чужих слов, когда служебных слов не меньше MIN_ENGLISH_SHARE.
+    """
+    vote = _vote(text, _LATIN_INDEX)
+    if vote is None:
+        return None, False
+    best, words, found, markers, rival = vote
+    if best != 'en':
+        return best, False
+    if markers:
+        # В английском нет таких букв: скорее всего, это другой язык с английскими вкраплениями
+        return None, False
+    english = sum(word in found for word in words)
+    return 'en', rival == 0 and english >= len(words) * MIN_ENGLISH_SHARE
@@ -0,0 +1,161 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+from collections import namedtuple
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import FSInputFile
+
+from bot.db.database import get_media_file, save_media_file, delete_media_file
+
+# Запись реестра: по mtime и size понимаем, что файл не менялся, не читая его
+MediaRecord = namedtuple('MediaRecord', ['content_hash', 'mtime', 'size', 'file_id'])
+
+# Метод отправки и способ достать file_id из ответа для каждого типа файла
+SENDERS = {
+    'voice': ('send_voice', lambda message: message.voice.file_id),
+    'audio': ('send_audio', lambda message: message.audio.file_id),
+    'photo': ('send_photo', lambda message: message.photo[-1].file_id),
+    'document': ('send_document', lambda message: message.document.file_id),
+    'video': ('send_video', lambda message: message.video.file_id),
+}
+
+# Ошибки Telegram, после которых file_id больше не годится и файл нужно загрузить заново.
+# Остальные BadRequest (нет чата, неверная подпись...) повторная загрузка не исправит
+STALE_FILE_ID_ERRORS = (
+    'wrong file identifier',
+    'wrong remote file identifier',
+    'file reference expired',
+    'file_reference_expired',
+    'type of file mismatch',
+    "can't use file of type",
+)
+
+
+def is_stale_file_id(error: TelegramBadRequest) -> bool:
+    message = error.message.lower()
+    return any(marker in message for marker in STALE_FILE_ID_ERRORS)
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class MediaRegistry:
+    """
+    Реестр статических файлов, загруженных в Telegram.
+
+    Каждый файл загружается один раз, полученный file_id сохраняется в таблице media_files
+    (вместе с хэшем содержимого, mtime и размером), и дальше файл отправляется по file_id.
+    Если файл изменился или Telegram отклонил file_id (устарел, неверный), файл загружается заново.
+    """
+
+    def __init__(self):
+        self._records = {}   # (path, kind) -> MediaRecord
+        self._locks = {}     # (path, kind) -> asyncio.Lock, чтобы файл не загружали параллельно
+        self._lock_users = {}  # (path, kind) -> сколько обработчиков держат или ждут блокировку
+        self.uploads = 0
+        self.sent_by_id = 0
+
+    async def send(self, bot, chat_id: int, path: str, kind: str = 'document', **kwargs):
+        """
+        Отправляет файл path в чат. Возвращает отправленное сообщение.
+        Если файла нет - FileNotFoundError.
+        """
+        method_name, _ = SENDERS[kind]
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        key = (path, kind)
+
+        record = await self._get_record(key, stat)
+        if record is not None:
+            try:
+                message = await getattr(bot, method_name)(chat_id, record.file_id, **kwargs)
+                self.sent_by_id += 1
+                return message
+            except TelegramBadRequest as e:
+                if not is_stale_file_id(e):
+                    raise
+                logging.warning("Telegram отклонил file_id для %s: %s. Загружаем файл заново.", path, e)
+                await self._forget(key)
+
+        # Блокировка удаляется, когда ее больше никто не держит и не ждет,
+        # иначе следующий обработчик получил бы новую и загрузил файл параллельно
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._lock_users[key] = self._lock_users.get(key, 0) + 1
+        try:
+            async with lock:
+                # Пока ждали, файл мог загрузить другой обработчик
+                record = self._records.get(key)
+                if record is not None and (record.mtime, record.size) == (stat.st_mtime, stat.st_size):
+                    try:
+                        message = await getattr(bot, method_name)(chat_id, record.file_id, **kwargs)
+                        self.sent_by_id += 1
+                        return message
+                    except TelegramBadRequest as e:
+                        if not is_stale_file_id(e):
+                            raise
+                        logging.warning("Telegram отклонил file_id для %s: %s. Загружаем файл заново.", path, e)
+                        await self._forget(key)
+                return await self._upload(bot, chat_id, key, stat, **kwargs)
+        finally:
+            self._lock_users[key] -= 1
+            if not self._lock_users[key]:
+                del self._lock_users[key]
+                del self._locks[key]
+
+    async def _get_record(self, key, stat):
+        """Возвращает актуальную запись реестра или None, если файл нужно загрузить."""
+        record = self._records.get(key)
+        if record is None:
+            row = await get_media_file(*key)
+            if row is None:
+                return None
+            record = MediaRecord(*row)
+            self._records[key] = record
+
+        if (record.mtime, record.size) == (stat.st_mtime, stat.st_size):
+            return record
+
+        # mtime или размер изменились - проверяем, изменилось ли содержимое
+        content_hash = await asyncio.to_thread(file_sha256, key[0])
+        if content_hash != record.content_hash:
+            logging.info("Файл %s изменился, он будет загружен заново.", key[0])
+            return None
+        record = record._replace(mtime=stat.st_mtime, size=stat.st_size)
+        self._records[key] = record
+        await save_media_file(*key, record.content_hash, record.mtime, record.size, record.file_id, time.time())
+        return record
+
+    async def _upload(self, bot, chat_id, key, stat, **kwargs):
+        path, kind = key
+        method_name, extract_file_id = SENDERS[kind]
+        content_hash = await asyncio.to_thread(file_sha256, path)
+        message = await getattr(bot, method_name)(
+            chat_id, FSInputFile(path=path, filename=os.path.basename(path)), **kwargs
+        )
+        file_id = extract_file_id(message)
+        record = MediaRecord(content_hash, stat.st_mtime, stat.st_size, file_id)
+        self._records[key] = record
+        await save_media_file(path, kind, content_hash, stat.st_mtime, stat.st_size, file_id, time.time())
+        self.uploads += 1
+        logging.info("Файл %s загружен в Telegram, file_id сохранен.", path)
+        return message
+
+    async def forget(self, path: str, kind: str):
+        """Забывает file_id файла, например, когда файл удален с диска."""
+        await self._forget((os.path.abspath(path), kind))
+
+    async def _forget(self, key):
+        self._records.pop(key, None)
+        await delete_media_file(*key)
+
+
+# Общий реестр для обработчиков
+media_registry = MediaRegistry()
@@ -0,0 +1,246 @@
+import time
+import inspect
+import logging
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from aiohttp import web
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+# Границы корзин гистограмм задержек, сек
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Гистограмма в формате Prometheus: счетчики по корзинам, сумма и количество."""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # Последняя корзина - +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля сверху: граница корзины, в которую он попал."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class _Span:
+    __slots__ = ('handler',)
+
+    def __init__(self):
+        self.handler = None
+
+
+class Metrics:
+    """
+    Метрики бота в памяти процесса.
+
+    Для каждого обработчика считаются вызовы, ошибки и гистограмма задержки,
+    для внешних вызовов (переводчик, БД, скачивание файлов, Telegram API) -
+    гистограмма времени. Кроме того, при каждом запросе метрик опрашиваются
+    зарегистрированные коллекторы - stats() сервисов и число FSM-состояний.
+    """
+
+    def __init__(self):
+        self.handler_calls = {}
+        self.handler_errors = {}
+        self.handler_latency = {}
+        self.external = {}
+        self._collectors = []   # (имя, функция, имя метки или None)
+        self.started_at = time.time()
+
+    # --- Обработчики ---
+    def observe_handler(self, name: str, elapsed: float, error: bool):
+        histogram = self.handler_latency.get(name)
+        if histogram is None:
+            histogram = self.handler_latency[name] = Histogram()
+            self.handler_calls[name] = 0
+            self.handler_errors[name] = 0
+        histogram.observe(elapsed)
+        self.handler_calls[name] += 1
+        if error:
+            self.handler_errors[name] += 1
+
+    # --- Внешние вызовы ---
+    def observe_external(self, target: str, elapsed: float):
+        histogram = self.external.get(target)
+        if histogram is None:
+            histogram = self.external[target] = Histogram()
+        histogram.observe(elapsed)
+
+    @contextmanager
+    def track(self, target: str):
+        """Замеряет время блока как внешний вызов target."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_external(target, time.perf_counter() - start)
+
+    # --- Коллекторы ---
+    def add_collector(self, name: str, collect, label: str = None):
+        """
+        Регистрирует функцию (обычную или async), возвращающую словарь чисел.
+        Без label ключи становятся именами метрик bot_<name>_<ключ>,
+        с label - значениями метки у метрики bot_<name>.
+        """
+        self._collectors.append((name, collect, label))
+
+    async def collect(self) -> list:
+        results = []
+        for name, collect, label in self._collectors:
+            try:
+                values = collect()
+                if inspect.isawaitable(values):
+                    values = await values
+            except Exception as e:
+                logging.error("Ошибка сбора метрик %s: %s", name, e)
+                continue
+            results.append((name, label, values))
+        return results
+
+    # --- Вывод ---
+    async def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus."""
+        lines = [
+            '# TYPE bot_uptime_seconds gauge',
+            f'bot_uptime_seconds {time.time() - self.started_at:.0f}',
+            '# TYPE bot_handler_calls_total counter',
+        ]
+        lines += [f'bot_handler_calls_total{{handler="{name}"}} {count}' for name, count in self.handler_calls.items()]
+        lines.append('# TYPE bot_handler_errors_total counter')
+        lines += [f'bot_handler_errors_total{{handler="{name}"}} {count}' for name, count in self.handler_errors.items()]
+        lines.append('# TYPE bot_handler_latency_seconds histogram')
+        for name, histogram in self.handler_latency.items():
+            lines += _histogram_lines('bot_handler_latency_seconds', f'handler="{name}"', histogram)
+        lines.append('# TYPE bot_external_call_seconds histogram')
+        for target, histogram in self.external.items():
+            lines += _histogram_lines('bot_external_call_seconds', f'target="{target}"', histogram)
+
+        for name, label, values in await self.collect():
+            if label is not None:
+                lines.append(f'# TYPE bot_{name} gauge')
+                lines += [f'bot_{name}{{{label}="{key}"}} {value}' for key, value in values.items()]
+            else:
+                for key, value in values.items():
+                    lines.append(f'# TYPE bot_{name}_{key} gauge')
+                    lines.append(f'bot_{name}_{key} {value}')
+        return '\n'.join(lines) + '\n'
+
+    async def summary(self) -> str:
+        """Краткая сводка для команды /stats."""
+        lines = [f"Работает {(time.time() - self.started_at) / 3600:.1f} ч", "", "Обработчики (вызовы, ошибки, p50/p95):"]
+        for name in sorted(self.handler_calls, key=self.handler_calls.get, reverse=True):
+            histogram = self.handler_latency[name]
+            lines.append(f"  {name}: {self.handler_calls[name]}, {self.handler_errors[name]}, "
+                         f"{_ms(histogram.quantile(0.5))}/{_ms(histogram.quantile(0.95))}")
+        lines += ["", "Внешние вызовы (число, среднее):"]
+        for target, histogram in sorted(self.external.items()):
+            lines.append(f"  {target}: {histogram.count}, {histogram.sum / histogram.count * 1000:.1f} мс")
+        for name, label, values in await self.collect():
+            lines += ["", f"{name}:"]
+            lines += [f"  {key}: {_format_value(value)}" for key, value in values.items()]
+        return '\n'.join(lines)
+
+
+def _histogram_lines(metric: str, labels: str, histogram: Histogram) -> list:
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+    lines.append(f'{metric}_sum{{{labels}}} {histogram.sum}')
+    lines.append(f'{metric}_count{{{labels}}} {histogram.count}')
+    return lines
+
+
+def _ms(seconds: float) -> str:
+    return "∞" if seconds == float('inf') else f"≤{seconds * 1000:g} мс"
+
+
+def _format_value(value) -> str:
+    return f"{value:.3f}" if isinstance(value, float) else str(value)
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Замер обработки апдейтов роутером.
+
+    Подключается как внешняя middleware (замеряет все время обработки, включая
+    фильтры и другие middleware) и как первая внутренняя через tag_handler,
+    которая лишь запоминает имя выбранного обработчика. Апдейты, для которых
+    обработчик не нашелся, учитываются как "unhandled".
+    """
+
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+
+    async def __call__(self, handler, event, data):
+        span = data['metrics_span'] = _Span()
+        error = False
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            # Отмена при остановке - не ошибка обработчика
+            error = True
+            raise
+        finally:
+            self.metrics.observe_handler(span.handler or 'unhandled', time.perf_counter() - start, error)
+
+    async def tag_handler(self, handler, event, data):
+        span = data.get('metrics_span')
+        if span is not None:
+            span.handler = data['handler'].callback.__name__
+        return await handler(event, data)
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Замер запросов к Telegram Bot API (middleware сессии бота)."""
+
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+
+    async def __call__(self, make_request, bot, method):
+        with self.metrics.track('telegram'):
+            return await make_request(bot, method)
+
+
+async def _handle_metrics(request: web.Request) -> web.Response:
+    text = await request.app['metrics'].render()
+    return web.Response(text=text, content_type='text/plain', charset='utf-8')
+
+
+async def start_metrics_server(metrics: Metrics, host: str, port: int) -> web.AppRunner:
+    """Запускает HTTP-сервер с метриками по адресу /metrics. Возвращает runner для остановки."""
+    app = web.Application()
+    app['metrics'] = metrics
+    app.router.add_get('/metrics', _handle_metrics)
+    runner = web.AppRunner(app, handle_signals=False)
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=port).start()
+    logging.info("Метрики доступны на http://%s:%s/metrics", host, port)
+    return runner
+
+
+# Общие метрики процесса
+metrics = Metrics()
+metrics_middleware = MetricsMiddleware(metrics)
@@ -0,0 +1,238 @@
+import time
+import heapq
+import random
+import asyncio
+import itertools
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiohttp import ClientConnectorError
+from aiogram.exceptions import TelegramRetryAfter, TelegramServerError, TelegramNetworkError
+
+from bot.config import (
+    SEND_GLOBAL_RATE,
+    SEND_CHAT_RATE,
+    SEND_GROUP_RATE,
+    SEND_CHAT_BURST,
+    SEND_MAX_RETRIES,
+    SEND_RETRY_JITTER,
+)
+
+# Приоритеты отправки: меньше - раньше
+PRIORITY_INTERACTIVE = 0   # Ответы на действия пользователя (по умолчанию)
+PRIORITY_BULK = 1          # Фоновые уведомления и рассылки
+
+send_priority = ContextVar('send_priority', default=PRIORITY_INTERACTIVE)
+# Повторять ли отправку после ошибки сервера Telegram (см. retry_server_errors)
+send_retry_server_errors = ContextVar('send_retry_server_errors', default=False)
+
+# Методы, на которые распространяются лимиты Telegram на сообщения
+_LIMITED_PREFIXES = ('send', 'copy', 'forward', 'edit')
+# Методы, повтор которых не создает второе сообщение
+_IDEMPOTENT_PREFIXES = ('edit',)
+
+
+@contextmanager
+def bulk_priority():
+    """Отправки внутри блока пропускают вперед ответы пользователям."""
+    token = send_priority.set(PRIORITY_BULK)
+    try:
+        yield
+    finally:
+        send_priority.reset(token)
+
+
+@contextmanager
+def retry_server_errors():
+    """
+    Отправки внутри блока повторяются и после ошибки сервера Telegram (5xx).
+    Сервер мог успеть доставить сообщение до ошибки, так что повтор может его продублировать:
+    только для сообщений, дубль которых не страшен.
+    """
+    token = send_retry_server_errors.set(True)
+    try:
+        yield
+    finally:
+        send_retry_server_errors.reset(token)
+
+
+def _not_sent(error: TelegramNetworkError) -> bool:
+    """Соединение не установлено - запрос точно не дошел до Telegram, и его можно повторить."""
+    return isinstance(error.__context__, ClientConnectorError)
+
+
+class RateLimiter:
+    """
+    Token bucket с очередью ожидающих по приоритету.
+
+    Токены пополняются со скоростью rate в секунду, не больше burst. Если токенов
+    нет, ожидающие выстраиваются в очередь (сначала по приоритету, затем по порядку)
+    и пропускаются одной фоновой задачей по мере пополнения. block() запрещает
+    отправку на заданное время - так соблюдается retry_after из ответа 429.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._waiters = []        # (приоритет, номер, future)
+        self._seq = itertools.count()
+        self._pump_task = None
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, priority: int = PRIORITY_INTERACTIVE):
+        now = time.monotonic()
+        self._refill(now)
+        if not self._waiters and self._tokens >= 1 and now >= self._blocked_until:
+            self._tokens -= 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        if self._pump_task is None:
+            self._pump_task = asyncio.create_task(self._pump())
+        await future
+
+    async def _pump(self):
+        try:
+            while self._waiters:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                if self._tokens < 1:
+                    await asyncio.sleep((1 - self._tokens) / self.rate)
+                    continue
+                _, _, future = heapq.heappop(self._waiters)
+                if future.done():  # Ожидающий отменен
+                    continue
+                self._tokens -= 1
+                future.set_result(None)
+        finally:
+            self._pump_task = None
+
+    def block(self, seconds: float):
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def is_idle(self, now: float) -> bool:
+        """Лимитер никто не ждет и он полностью пополнен - его можно удалить."""
+        self._refill(now)
+        return not self._waiters and self._tokens >= self.burst and now >= self._blocked_until
+
+
+class SendScheduler(BaseRequestMiddleware):
+    """
+    Планировщик исходящих запросов к Telegram (middleware сессии бота).
+
+    Сообщения в один чат ограничены скоростью chat_rate (group_rate для групп),
+    все сообщения бота вместе - global_rate. Когда лимит исчерпан, запрос ждет
+    своей очереди, и ответы пользователям (PRIORITY_INTERACTIVE) идут раньше
+    фоновых отправок (PRIORITY_BULK). На 429 чат блокируется на retry_after
+    секунд плюс случайная добавка, после чего запрос повторяется. С экспоненциальной
+    паузой повторяются запросы, которые не дошли до Telegram (не удалось соединиться),
+    а после ошибки сервера Telegram или таймаута - только редактирование и отправки
+    внутри retry_server_errors(): сообщение могло быть уже доставлено. Ответы
+    на callback query и служебные методы проходят без ограничений.
+    """
+
+    def __init__(self, global_rate: float = SEND_GLOBAL_RATE, chat_rate: float = SEND_CHAT_RATE,
+                 group_rate: float = SEND_GROUP_RATE, chat_burst: int = SEND_CHAT_BURST,
+                 max_retries: int = SEND_MAX_RETRIES, jitter: float = SEND_RETRY_JITTER):
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.jitter = jitter
+        self._global = RateLimiter(global_rate, global_rate)
+        self._chats = {}           # chat_id -> RateLimiter
+        self._last_sweep = time.monotonic()
+        self.sent = 0
+        self.rate_limited = 0
+        self.retries = 0
+        self.failed = 0
+        self.max_wait = 0.0
+
+    def _chat_limiter(self, chat_id) -> RateLimiter:
+        limiter = self._chats.get(chat_id)
+        if limiter is None:
+            # У групп и каналов (отрицательный id или @username) лимит строже
+            is_private = isinstance(chat_id, int) and chat_id > 0
+            limiter = RateLimiter(self.chat_rate if is_private else self.group_rate, self.chat_burst)
+            self._chats[chat_id] = limiter
+        return limiter
+
+    def _sweep(self):
+        now = time.monotonic()
+        if now - self._last_sweep < 60:
+            return
+        self._last_sweep = now
+        for chat_id in [chat_id for chat_id, limiter in self._chats.items() if limiter.is_idle(now)]:
+            del self._chats[chat_id]
+
+    async def __call__(self, make_request, bot, method):
+        if not method.__api_method__.startswith(_LIMITED_PREFIXES):
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, 'chat_id', None)
+        chat_limiter = self._chat_limiter(chat_id) if chat_id is not None else None
+        priority = send_priority.get()
+        retry_server = send_retry_server_errors.get() or method.__api_method__.startswith(_IDEMPOTENT_PREFIXES)
+        self._sweep()
+
+        for attempt in range(self.max_retries + 1):
+            start = time.monotonic()
+            if chat_limiter is not None:
+                await chat_limiter.acquire(priority)
+            await self._global.acquire(priority)
+            self.max_wait = max(self.max_wait, time.monotonic() - start)
+
+            try:
+                response = await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.rate_limited += 1
+                if attempt == self.max_retries:
+                    self.failed += 1
+                    raise
+                delay = e.retry_after + random.uniform(0, self.jitter)
+                logging.warning("%s в чат %s: 429, повтор через %.1f с", method.__api_method__, chat_id, delay)
+                (chat_limiter or self._global).block(delay)
+            except (TelegramServerError, TelegramNetworkError) as e:
+                retryable = retry_server or isinstance(e, TelegramNetworkError) and _not_sent(e)
+                if attempt == self.max_retries or not retryable:
+                    self.failed += 1
+                    raise
+                delay = 2 ** attempt + random.uniform(0, self.jitter)
+                logging.warning("%s в чат %s: %s, повтор через %.1f с", method.__api_method__, chat_id, e, delay)
+                await asyncio.sleep(delay)
+            else:
+                self.sent += 1
+                return response
+            self.retries += 1
+
+    def stats(self) -> dict:
+        return {
+            'sent': self.sent,
+            'rate_limited': self.rate_limited,
+            'retries': self.retries,
+            'failed': self.failed,
+            'waiting': self._global.waiting + sum(limiter.waiting for limiter in self._chats.values()),
+            'chats': len(self._chats),
+            'max_wait_ms': self.max_wait * 1000,
+        }
+
+
+# Общий планировщик; подключается к сессии бота в main
+send_scheduler = SendScheduler()
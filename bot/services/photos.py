@@ -0,0 +1,365 @@
+import os
+import time
+import uuid
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from bot.config import (
+    IMG_DIR,
+    PHOTO_WORKERS,
+    PHOTO_MAX_QUEUE,
+    PHOTO_QUOTA_BYTES,
+    PHOTO_PROCESS_WORKERS,
+    PHOTO_PROCESS_MAX_QUEUE,
+    PHOTO_THUMB_SIZE,
+    PHOTO_MAX_SIDE,
+    PHOTO_JPEG_QUALITY,
+)
+from bot.db.database import (
+    get_photo_blob,
+    touch_photo_blob,
+    save_photo,
+    get_photo_storage_size,
+    pop_photo_blobs_over_quota,
+    save_photo_variants,
+)
+from bot.services import imaging
+from bot.services.metrics import metrics
+from bot.services.outbound import bulk_priority
+
+# Задание на скачивание: что скачать и кому сообщить об ошибке
+PhotoJob = namedtuple('PhotoJob', ['bot', 'photo', 'chat_id'])
+# Задание на обработку: хэш оригинала и путь к нему относительно папки фото
+ProcessJob = namedtuple('ProcessJob', ['file_hash', 'path'])
+
+
+class PhotoQueueFull(Exception):
+    """Очередь скачивания фото переполнена."""
+
+
+class HashingWriter:
+    """Файл для записи, который по пути считает SHA-256 содержимого."""
+
+    def __init__(self, path: str):
+        self._file = open(path, 'wb')
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    def write(self, chunk: bytes) -> int:
+        self._hash.update(chunk)
+        self.size += len(chunk)
+        return self._file.write(chunk)
+
+    def flush(self):
+        self._file.flush()
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+    def close(self):
+        self._file.close()
+
+
+class PhotoProcessor:
+    """
+    Обработка сохраненных фото в отдельных процессах: превью, пережатая копия
+    без EXIF, размеры в таблице photo_variants (см. bot/services/imaging.py).
+
+    Декодирование и сжатие JPEG занимают процессор, поэтому выполняются в
+    ProcessPoolExecutor из workers процессов, а не в цикле событий и не в
+    потоках (им мешает GIL). Очередь ограничена max_queue: при переполнении фото
+    остается без копий (оригинал уже сохранен), а пользователь ничего не ждет -
+    ответ ему отправляется до обработки.
+    """
+
+    def __init__(self, root: str = IMG_DIR, workers: int = PHOTO_PROCESS_WORKERS,
+                 max_queue: int = PHOTO_PROCESS_MAX_QUEUE, thumb_size: int = PHOTO_THUMB_SIZE,
+                 max_side: int = PHOTO_MAX_SIDE, quality: int = PHOTO_JPEG_QUALITY):
+        self.root = root
+        self.workers = workers or os.cpu_count() or 1
+        self.thumb_size = thumb_size
+        self.max_side = max_side
+        self.quality = quality
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._executor = None
+        self._tasks = []
+        # Вызывается после записи копий: on_processed(file_hash, на сколько байт выросло занятое место)
+        self.on_processed = None
+        self.processed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.bytes_written = 0
+        self.busy_seconds = 0.0
+
+    async def start(self):
+        self._executor = self._create_executor()
+        loop = asyncio.get_running_loop()
+        # Процессы запускаются сразу, чтобы первое фото не ждало запуска интерпретатора
+        try:
+            await asyncio.gather(*(loop.run_in_executor(self._executor, imaging.warm_up) for _ in range(self.workers)))
+        except Exception as e:
+            # Без обработки бот работает дальше: оригиналы сохраняются, копии не создаются
+            logging.error("Не удалось запустить процессы обработки фото: %s", e, exc_info=True)
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            return
+        self._tasks = [asyncio.create_task(self._worker(), name=f"photo-process-{i}") for i in range(self.workers)]
+        logging.info("Обработка фото запущена: %s процессов", self.workers)
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # spawn: fork процесса с потоками (aiosqlite, логирование) небезопасен
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=imaging.init_worker,
+        )
+
+    def submit(self, file_hash: str, path: str) -> bool:
+        """Ставит фото в очередь обработки; False, если очередь переполнена или обработка не запущена."""
+        if not self._tasks:
+            return False
+        try:
+            self._queue.put_nowait(ProcessJob(file_hash, path))
+        except asyncio.QueueFull:
+            self.skipped += 1
+            logging.warning("Очередь обработки фото переполнена, %s остается без копий", path)
+            return False
+        return True
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            executor = self._executor
+            try:
+                await self._process(loop, executor, job)
+            except BrokenProcessPool:
+                # Процесс пула убит (например, нехватка памяти): пул больше не принимает задания
+                self.failed += 1
+                logging.error("Процесс обработки фото завершился аварийно на %s, пул перезапускается", job.path)
+                if self._executor is executor:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    self._executor = self._create_executor()
+            except Exception as e:
+                self.failed += 1
+                logging.error("Ошибка при обработке фото %s: %s", job.path, e, exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, loop, executor, job: ProcessJob):
+        start = time.perf_counter()
+        with metrics.track('photo_processing'):
+            result = await loop.run_in_executor(
+                executor, imaging.process_image,
+                self.root, job.path, self.thumb_size, self.max_side, self.quality,
+            )
+        self.busy_seconds += time.perf_counter() - start
+
+        added = await save_photo_variants(job.file_hash, result.width, result.height, result.variants, time.time())
+        if added is None:
+            # Оригинал вытеснен по квоте, пока шла обработка: копии больше не нужны
+            for variant in result.variants:
+                _remove(os.path.join(self.root, variant.path))
+            return
+        size = sum(variant.size for variant in result.variants)
+        self.processed += 1
+        self.bytes_written += size
+        logging.info("Фото %s обработано: %sx%s, копии %s байт", job.path, result.width, result.height, size)
+        if self.on_processed is not None:
+            await self.on_processed(job.file_hash, added)
+
+    async def close(self, timeout: float = 30):
+        """Дожидается обработки очереди (не дольше timeout секунд) и останавливает процессы."""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logging.warning("Не дождались обработки %s фото", self._queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._executor = None
+        logging.info("Обработка фото остановлена: обработано %s, ошибок %s, пропущено %s",
+                     self.processed, self.failed, self.skipped)
+
+    def stats(self) -> dict:
+        return {
+            'queued': self._queue.qsize(),
+            'workers': self.workers,
+            'processed': self.processed,
+            'failed': self.failed,
+            'skipped': self.skipped,
+            'bytes_written': self.bytes_written,
+            'busy_seconds': round(self.busy_seconds, 3),
+        }
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class PhotoIngestor:
+    """
+    Фоновое сохранение присланных фотографий.
+
+    Фото скачиваются пулом из workers фоновых задач, очередь ограничена max_queue.
+    Файл пишется на диск по частям и сохраняется под именем, равным SHA-256 содержимого,
+    в папках вида ab/cd/<hash>.jpg. Индекс file_unique_id -> hash хранится в SQLite,
+    так что повторно присланное фото не скачивается вовсе. Когда суммарный размер
+    превышает quota байт, удаляются давно не использовавшиеся файлы (LRU).
+    Новые файлы передаются в processor (PhotoProcessor), если он задан;
+    его копии тоже учитываются в квоте.
+    """
+
+    def __init__(self, root: str = IMG_DIR, workers: int = PHOTO_WORKERS,
+                 max_queue: int = PHOTO_MAX_QUEUE, quota: int = PHOTO_QUOTA_BYTES, processor: PhotoProcessor = None):
+        self.root = root
+        self.processor = processor
+        if processor is not None:
+            processor.on_processed = self._account_variants
+        self.workers = workers
+        self.quota = quota
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._in_flight = set()   # file_unique_id, которые уже в очереди или скачиваются
+        self._tasks = []
+        self.total_size = 0
+        self.downloaded = 0
+        self.deduplicated = 0
+        self.evicted = 0
+
+    async def start(self):
+        os.makedirs(os.path.join(self.root, 'tmp'), exist_ok=True)
+        self.total_size = await get_photo_storage_size()
+        if self.processor is not None:
+            self.processor.root = self.root   # Обрабатываются файлы из той же папки
+            await self.processor.start()
+        self._tasks = [asyncio.create_task(self._worker(), name=f"photo-worker-{i}") for i in range(self.workers)]
+        logging.info("Сохранение фото запущено: %s задач, занято %s байт", self.workers, self.total_size)
+
+    async def submit(self, bot, photo, chat_id: int):
+        """
+        Ставит фото в очередь. Возвращает путь к файлу, если такое фото уже сохранено,
+        или None, если оно будет скачано в фоне. При переполнении очереди - PhotoQueueFull.
+        """
+        blob = await get_photo_blob(photo.file_unique_id)
+        if blob is not None:
+            file_hash, path = blob
+            await touch_photo_blob(file_hash, time.time())
+            self.deduplicated += 1
+            return path
+
+        if photo.file_unique_id in self._in_flight:
+            self.deduplicated += 1
+            return None
+        try:
+            self._queue.put_nowait(PhotoJob(bot=bot, photo=photo, chat_id=chat_id))
+        except asyncio.QueueFull:
+            raise PhotoQueueFull(f"В очереди уже {self._queue.qsize()} фото")
+        self._in_flight.add(photo.file_unique_id)
+        return None
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._ingest(job)
+            except Exception as e:
+                logging.error("Ошибка при сохранении фото %s: %s", job.photo.file_id, e, exc_info=True)
+                try:
+                    with bulk_priority():  # Фоновое уведомление не должно задерживать ответы
+                        await job.bot.send_message(job.chat_id, "Не удалось сохранить фото. Попробуйте пожалуйста позже.")
+                except Exception as send_error:
+                    logging.error("Не удалось сообщить об ошибке сохранения фото: %s", send_error)
+            finally:
+                self._in_flight.discard(job.photo.file_unique_id)
+                self._queue.task_done()
+
+    async def _ingest(self, job: PhotoJob):
+        tmp_path = os.path.join(self.root, 'tmp', f"{uuid.uuid4().hex}.part")
+        writer = HashingWriter(tmp_path)
+        try:
+            with metrics.track('download'):
+                await job.bot.download(file=job.photo, destination=writer, seek=False)
+        except BaseException:
+            writer.close()
+            os.remove(tmp_path)
+            raise
+        writer.close()
+
+        file_hash = writer.hexdigest()
+        rel_path = os.path.join(file_hash[:2], file_hash[2:4], f"{file_hash}.jpg")
+        full_path = os.path.join(self.root, rel_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        os.replace(tmp_path, full_path)
+
+        is_new = await save_photo(job.photo.file_unique_id, file_hash, rel_path, writer.size, time.time())
+        if is_new:
+            self.total_size += writer.size
+            self.downloaded += 1
+            logging.info("Фото %s сохранено как %s (%s байт)", job.photo.file_unique_id, rel_path, writer.size)
+            if self.processor is not None:
+                self.processor.submit(file_hash, rel_path)
+            await self._enforce_quota()
+        else:
+            self.deduplicated += 1
+            logging.info("Фото %s совпало с уже сохраненным %s", job.photo.file_unique_id, rel_path)
+
+    async def _account_variants(self, file_hash: str, size: int):
+        """Копии, созданные обработкой, занимают место в той же квоте."""
+        self.total_size += size
+        await self._enforce_quota()
+
+    async def _enforce_quota(self):
+        # Занятое место берется из базы, а не из total_size: при шардировании фото
+        # сохраняют несколько процессов, и счетчик каждого видит только свои файлы
+        while self.quota:
+            self.total_size, rows = await pop_photo_blobs_over_quota(self.quota, limit=16)
+            if not rows:
+                break
+            for file_hash, paths, size in rows:
+                for rel_path in paths:
+                    _remove(os.path.join(self.root, rel_path))
+                self.evicted += 1
+            logging.info("Квота фото превышена: удалено %s файлов, занято %s байт", len(rows), self.total_size)
+
+    async def close(self, timeout: float = 30):
+        """Дожидается скачивания очереди (не дольше timeout секунд) и останавливает задачи."""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logging.warning("Не дождались скачивания %s фото", self._queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.processor is not None:
+            await self.processor.close(timeout)
+        logging.info("Сохранение фото остановлено: скачано %s, повторов %s, удалено по квоте %s",
+                     self.downloaded, self.deduplicated, self.evicted)
+
+    def stats(self) -> dict:
+        return {
+            'queued': self._queue.qsize(),
+            'total_size': self.total_size,
+            'downloaded': self.downloaded,
+            'deduplicated': self.deduplicated,
+            'evicted': self.evicted,
+        }
+
+
+# Общие экземпляры для обработчиков; задачи и процессы запускаются в main
+photo_processor = PhotoProcessor()
+photo_ingestor = PhotoIngestor(processor=photo_processor)
@@ -0,0 +1,369 @@
+import re
+import time
+import asyncio
+import logging
+import unicodedata
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from googletrans import Translator
+
+from bot.config import (
+    TRANSLATE_MAX_WORKERS,
+    TRANSLATE_TIMEOUT,
+    TRANSLATE_MAX_QUEUE,
+    TRANSLATE_BATCH_WINDOW,
+    TRANSLATE_BATCH_SIZE,
+    TRANSLATE_CACHE_SIZE,
+    TRANSLATE_CACHE_TTL,
+    TRANSLATE_CACHE_DB_TTL,
+    TRANSLATE_LOCAL_DETECT,
+    TRANSLATE_CHUNK_CHARS,
+    TRANSLATE_CHUNK_PARALLEL,
+    TRANSLATE_CHUNK_RETRIES,
+)
+from bot.db.database import get_cached_translation, save_cached_translation
+from bot.services.batching import MicroBatcher
+from bot.services.cache import LRUCache
+from bot.services.langdetect import detect_language
+from bot.services.metrics import metrics
+
+# Результат перевода из кэша: те же поля text и src, что и у googletrans
+CachedTranslation = namedtuple('CachedTranslation', ['text', 'src', 'dest'])
+# Ответ без обращения к переводчику: текст уже на нужном языке или переводить нечего
+LocalTranslation = namedtuple('LocalTranslation', ['text', 'src', 'dest', 'reason'])
+SAME_LANGUAGE = 'same_language'
+NOTHING_TO_TRANSLATE = 'nothing_to_translate'
+# Фрагмент длинного текста: перевод (при ok=False - исходный текст) и разделитель, шедший за ним в оригинале
+ChunkResult = namedtuple('ChunkResult', ['index', 'text', 'separator', 'ok'])
+
+# Граница предложения или абзаца
+_SENTENCE_BREAK_RE = re.compile(r'(?<=[.!?…。！？])\s+|\s*\n\s*')
+# Пауза перед повтором фрагмента, удваивается с каждой попыткой
+CHUNK_RETRY_DELAY = 0.5
+
+
+class TranslationOverloaded(Exception):
+    """Очередь переводов переполнена, запрос отброшен."""
+
+
+def normalize_text(text: str) -> str:
+    """Приводит текст к единому виду для ключа кэша: NFC, без лишних пробелов."""
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+
+def split_text(text: str, max_chars: int = TRANSLATE_CHUNK_CHARS) -> list:
+    """
+    Делит текст на фрагменты не длиннее max_chars по границам предложений.
+    Возвращает пары (фрагмент, разделитель после него). Предложения длиннее
+    max_chars режутся по пробелам, а без пробелов - просто по длине.
+    """
+    sentences = []
+    position = 0
+    for match in _SENTENCE_BREAK_RE.finditer(text):
+        sentences.append((text[position:match.start()], match.group()))
+        position = match.end()
+    sentences.append((text[position:], ''))
+
+    chunks = []
+    current, current_separator = '', ''
+    for sentence, separator in sentences:
+        for piece, piece_separator in _split_sentence(sentence, separator, max_chars):
+            if current and len(current) + len(current_separator) + len(piece) > max_chars:
+                chunks.append((current, current_separator))
+                current, current_separator = piece, piece_separator
+            elif current:
+                current += current_separator + piece
+                current_separator = piece_separator
+            else:
+                current, current_separator = piece, piece_separator
+    if current:
+        chunks.append((current, current_separator))
+    return chunks
+
+
+def _split_sentence(sentence: str, separator: str, max_chars: int):
+    while len(sentence) > max_chars:
+        cut = sentence.rfind(' ', 0, max_chars + 1)
+        if cut <= 0:
+            yield sentence[:max_chars], ''
+            sentence = sentence[max_chars:]
+        else:
+            yield sentence[:cut], ' '
+            sentence = sentence[cut + 1:]
+    if sentence:
+        yield sentence, separator
+
+
+class TranslationCache:
+    """
+    Двухуровневый кэш переводов.
+    Первый уровень - LRU в памяти процесса, второй - таблица translations в SQLite,
+    благодаря которой прогретые записи переживают перезапуск бота.
+    """
+
+    def __init__(self, max_size: int = TRANSLATE_CACHE_SIZE, ttl: float = TRANSLATE_CACHE_TTL,
+                 db_ttl: float = TRANSLATE_CACHE_DB_TTL, persistent: bool = True):
+        self.memory = LRUCache(max_size=max_size, ttl=ttl)
+        self.db_ttl = db_ttl
+        self.persistent = persistent
+        self.db_hits = 0
+        self.misses = 0
+        self._write_tasks = set()
+
+    async def get(self, text: str, dest: str):
+        key = (normalize_text(text), dest)
+        cached = self.memory.get(key)
+        if cached is not None:
+            return cached
+
+        if self.persistent:
+            try:
+                row = await get_cached_translation(*key)
+            except Exception as e:
+                logging.error("Ошибка чтения кэша переводов: %s", e)
+                row = None
+            if row is not None:
+                translated_text, src, created_at = row
+                if time.time() - created_at < self.db_ttl:
+                    cached = CachedTranslation(text=translated_text, src=src, dest=dest)
+                    self.memory.set(key, cached)
+                    self.db_hits += 1
+                    return cached
+
+        self.misses += 1
+        return None
+
+    def put(self, text: str, dest: str, translation):
+        """Кладет перевод в память сразу, а в SQLite - фоновой задачей, не задерживая ответ."""
+        key = (normalize_text(text), dest)
+        cached = CachedTranslation(text=translation.text, src=translation.src, dest=dest)
+        self.memory.set(key, cached)
+        if self.persistent:
+            task = asyncio.create_task(self._save(key, cached))
+            self._write_tasks.add(task)
+            task.add_done_callback(self._write_tasks.discard)
+
+    async def _save(self, key, cached):
+        try:
+            await save_cached_translation(key[0], key[1], cached.text, cached.src, time.time())
+        except Exception as e:
+            logging.error("Ошибка записи в кэш переводов: %s", e)
+
+    async def flush(self):
+        """Дожидается фоновых записей в SQLite."""
+        if self._write_tasks:
+            await asyncio.gather(*self._write_tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        memory = self.memory.stats()
+        lookups = memory['hits'] + self.db_hits + self.misses
+        return {
+            'memory_size': memory['size'],
+            'memory_hits': memory['hits'],
+            'db_hits': self.db_hits,
+            'misses': self.misses,
+            'evictions': memory['evictions'],
+            'hit_rate': (memory['hits'] + self.db_hits) / lookups if lookups else 0.0,
+        }
+
+
+class TranslationService:
+    """
+    Неблокирующая обертка над синхронным переводчиком.
+
+    Переводы выполняются в пуле потоков, чтобы не останавливать event loop.
+    Одновременно выполняется не более max_workers переводов, ожидать своей
+    очереди может не более max_queue запросов, остальные сразу отклоняются
+    исключением TranslationOverloaded. Каждый вызов ограничен таймаутом.
+    Если передан cache, повторные тексты отдаются из кэша без обращения к переводчику.
+
+    При batch_window > 0 одновременные запросы собираются в пачки (не дольше
+    batch_window секунд и не больше batch_size текстов) и одинаковые тексты
+    переводятся один раз. Если у переводчика есть translate_batch, пачка уходит
+    одним вызовом; иначе (googletrans) уникальные тексты переводятся
+    параллельными одиночными вызовами, каждый со своим таймаутом.
+
+    При local_detect язык сначала определяется локально (detect_language):
+    текст без букв и текст, надежно определенный как написанный на языке dest,
+    возвращаются сразу как LocalTranslation, а для остальных определенный язык
+    (если он есть) передается переводчику как src, чтобы тот не определял его сам.
+
+    Длинные тексты переводятся через translate_chunks: по фрагментам,
+    параллельно и с повтором только неудавшихся фрагментов.
+    """
+
+    def __init__(self, backend, max_workers: int = TRANSLATE_MAX_WORKERS,
+                 timeout: float = TRANSLATE_TIMEOUT, max_queue: int = TRANSLATE_MAX_QUEUE,
+                 cache: TranslationCache = None, batch_window: float = TRANSLATE_BATCH_WINDOW,
+                 batch_size: int = TRANSLATE_BATCH_SIZE, local_detect: bool = TRANSLATE_LOCAL_DETECT):
+        self.backend = backend
+        self.local_detect = local_detect
+        self.cache = cache
+        self.timeout = timeout
+        self.max_queue = max_queue
+        self.batcher = MicroBatcher(self._translate_batch, batch_window, batch_size) if batch_window > 0 else None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="translate")
+        self._semaphore = asyncio.Semaphore(max_workers)
+        self._pending = 0  # Запросы, которые ждут или выполняются
+        self.requests = 0
+        self.same_language = 0
+        self.nothing_to_translate = 0
+        self.hinted = 0
+        self.backend_texts = 0
+        self.backend_time = 0.0
+        self.chunked_texts = 0
+        self.chunk_retries = 0
+        self.chunk_failures = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def translate(self, text: str, dest: str = 'en', src: str = 'auto', batch: bool = True):
+        """
+        Переводит текст, возвращает объект с полями text и src, как у googletrans.
+        batch=False отправляет текст переводчику отдельным вызовом, минуя пачки.
+        """
+        self.requests += 1
+        if self.local_detect and src == 'auto':
+            detection = detect_language(text)
+            if not detection.letters:
+                self.nothing_to_translate += 1
+                return LocalTranslation(text=text, src='und', dest=dest, reason=NOTHING_TO_TRANSLATE)
+            if detection.confident and detection.lang == dest:
+                self.same_language += 1
+                return LocalTranslation(text=text, src=dest, dest=dest, reason=SAME_LANGUAGE)
+            # Неуверенное "уже на нужном языке" - не подсказка: переводчик вернул бы текст как есть
+            if detection.lang is not None and detection.lang != dest:
+                self.hinted += 1
+                src = detection.lang
+
+        if self.cache is not None:
+            cached = await self.cache.get(text, dest)
+            if cached is not None:
+                return cached
+
+        translation = await self._translate(text, dest, src, batch)
+        if self.cache is not None:
+            self.cache.put(text, dest, translation)
+        return translation
+
+    async def translate_chunks(self, text: str, dest: str = 'en', src: str = 'auto',
+                               parallel: int = TRANSLATE_CHUNK_PARALLEL, retries: int = TRANSLATE_CHUNK_RETRIES):
+        """
+        Переводит длинный текст по фрагментам (split_text), не больше parallel
+        фрагментов одновременно. Асинхронный генератор: отдает списки ChunkResult
+        по порядку, как только готов очередной фрагмент, вместе со всеми уже
+        готовыми за ним. Неудавшийся фрагмент повторяется до retries раз, после
+        чего отдается с ok=False и исходным текстом, не мешая остальным.
+        """
+        chunks = split_text(text)
+        self.chunked_texts += 1
+        semaphore = asyncio.Semaphore(parallel)
+        tasks = [
+            asyncio.create_task(self._translate_chunk(index, chunk, separator, dest, src, semaphore, retries))
+            for index, (chunk, separator) in enumerate(chunks)
+        ]
+        try:
+            position = 0
+            while position < len(tasks):
+                await asyncio.wait({tasks[position]})
+                ready = []
+                while position < len(tasks) and tasks[position].done():
+                    ready.append(tasks[position].result())
+                    position += 1
+                yield ready
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _translate_chunk(self, index: int, chunk: str, separator: str, dest: str, src: str,
+                               semaphore: asyncio.Semaphore, retries: int) -> ChunkResult:
+        async with semaphore:
+            for attempt in range(retries + 1):
+                try:
+                    # Мимо пачек: фрагменты одного текста должны переводиться параллельно
+                    translation = await self.translate(chunk, dest, src, batch=False)
+                    return ChunkResult(index, translation.text, separator, True)
+                except Exception as e:
+                    if attempt == retries:
+                        self.chunk_failures += 1
+                        logging.warning("Фрагмент %s не переведен после %s попыток: %r", index, retries + 1, e)
+                        return ChunkResult(index, chunk, separator, False)
+                    self.chunk_retries += 1
+                    await asyncio.sleep(CHUNK_RETRY_DELAY * 2 ** attempt)
+
+    async def _translate(self, text: str, dest: str, src: str, batch: bool = True):
+        if self._pending >= self.max_queue:
+            raise TranslationOverloaded(f"В очереди уже {self._pending} переводов")
+
+        self._pending += 1
+        try:
+            if batch and self.batcher is not None:
+                return await self.batcher.submit((dest, src), text)
+            return await self._run_in_pool(self._call_backend, text, dest, src)
+        finally:
+            self._pending -= 1
+
+    async def _translate_batch(self, group, texts):
+        dest, src = group
+        if getattr(self.backend, 'translate_batch', None) is not None:
+            return await self._run_in_pool(self._call_backend_batch, texts, dest, src, texts=len(texts))
+        # googletrans-py 4.x переводит одну строку за вызов: тексты пачки расходятся по пулу,
+        # и таймаут или ошибка одного текста не затрагивает остальные
+        return await asyncio.gather(
+            *(self._run_in_pool(self._call_backend, text, dest, src) for text in texts),
+            return_exceptions=True,
+        )
+
+    async def _run_in_pool(self, func, *args, texts: int = 1):
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._executor, func, *args)
+            start = time.perf_counter()
+            with metrics.track('translator'):
+                result = await asyncio.wait_for(future, timeout=self.timeout)
+            self.backend_texts += texts
+            self.backend_time += time.perf_counter() - start
+            return result
+
+    def stats(self) -> dict:
+        """Очередь и вызовы, которых удалось избежать локальным определением языка."""
+        avoided = self.same_language + self.nothing_to_translate
+        per_text = self.backend_time / self.backend_texts if self.backend_texts else 0.0
+        return {
+            'pending': self._pending,
+            'requests': self.requests,
+            'same_language': self.same_language,
+            'nothing_to_translate': self.nothing_to_translate,
+            'hinted': self.hinted,
+            'avoided_share': avoided / self.requests if self.requests else 0.0,
+            # Оценка: столько ждали бы пропущенные запросы при средней задержке переводчика
+            'saved_seconds': avoided * per_text,
+            'chunked_texts': self.chunked_texts,
+            'chunk_retries': self.chunk_retries,
+            'chunk_failures': self.chunk_failures,
+        }
+
+    def _call_backend(self, text: str, dest: str, src: str):
+        return self.backend.translate(text, dest=dest, src=src)
+
+    def _call_backend_batch(self, texts, dest: str, src: str):
+        return self.backend.translate_batch(texts, dest=dest, src=src)
+
+    async def shutdown(self):
+        """Сохраняет кэш и останавливает пул потоков, не дожидаясь зависших запросов."""
+        if self.batcher is not None:
+            await self.batcher.drain()
+            logging.info("Статистика пакетного перевода: %s", self.batcher.stats())
+        if self.cache is not None:
+            await self.cache.flush()
+            logging.info("Статистика кэша переводов: %s", self.cache.stats())
+        logging.info("Статистика сервиса перевода: %s", self.stats())
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        logging.info("Сервис перевода остановлен.")
+
+
+# Общий экземпляр сервиса для обработчиков
+translation_service = TranslationService(Translator(), cache=TranslationCache())
@@ -0,0 +1,196 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from bot.config import TTS_DIR, TTS_WORKERS, TTS_TIMEOUT, TTS_CACHE_BYTES
+from bot.services.media import media_registry
+from bot.services.metrics import metrics
+
+# Временные файлы синтеза старше этого (в секундах) остались от прерванного процесса.
+# Более свежие не трогаем: их может дописывать другой процесс с той же папкой кэша.
+STALE_PART_AGE = 3600
+
+
+def gtts_synthesize(text: str, lang: str, path: str):
+    """Синтезирует речь через gTTS и сохраняет mp3 в path (блокирующий сетевой вызов)."""
+    from gtts import gTTS
+    gTTS(text=text, lang=lang).save(path)
+
+
+class TTSService:
+    """
+    Синтез речи с кэшем на диске.
+
+    Синтез выполняется в пуле потоков, не блокируя event loop. Готовые mp3 хранятся
+    в папке cache_dir под именем sha256(язык + текст), так что одинаковые фразы
+    синтезируются один раз. Когда кэш превышает max_bytes, удаляются давно
+    не использовавшиеся файлы. Одновременные запросы одной фразы ждут один синтез.
+    """
+
+    def __init__(self, synthesizer=gtts_synthesize, cache_dir: str = TTS_DIR, workers: int = TTS_WORKERS,
+                 timeout: float = TTS_TIMEOUT, max_bytes: int = TTS_CACHE_BYTES, on_evict=None):
+        self.synthesizer = synthesizer
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict      # async callback(path) после удаления файла из кэша
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts")
+        self._files = None            # path -> size, от давно использованных к недавним
+        self._total = 0
+        self._index_lock = asyncio.Lock()
+        self._in_flight = {}          # path -> Future
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._latencies = deque(maxlen=1000)
+
+    def _load_index(self) -> OrderedDict:
+        """
+        Читает содержимое папки кэша (в потоке); порядок - по времени изменения.
+        Заодно удаляет брошенные временные файлы синтеза (.part) старше STALE_PART_AGE.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entries = []
+        stale_before = time.time() - STALE_PART_AGE
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+                if name.endswith('.part') and stat.st_mtime < stale_before:
+                    os.remove(path)
+            except FileNotFoundError:
+                continue   # Файл успел исчезнуть, пока читали папку
+            if name.endswith('.mp3'):
+                entries.append((stat.st_mtime, path, stat.st_size))
+        return OrderedDict((path, size) for _, path, size in sorted(entries))
+
+    async def _ensure_index(self):
+        """Загружает индекс кэша при первом обращении, не блокируя event loop."""
+        async with self._index_lock:
+            if self._files is None:
+                files = await asyncio.to_thread(self._load_index)
+                self._total = sum(files.values())
+                self._files = files
+
+    def cache_path(self, text: str, lang: str) -> str:
+        digest = hashlib.sha256(f"{lang}\0{text}".encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.mp3")
+
+    async def synthesize(self, text: str, lang: str) -> str:
+        """Возвращает путь к mp3 с озвученным текстом, синтезируя его при необходимости."""
+        if self._files is None:
+            await self._ensure_index()
+
+        path = self.cache_path(text, lang)
+        if path in self._files:
+            try:
+                await asyncio.to_thread(os.utime, path)  # Чтобы порядок LRU сохранился после перезапуска
+            except FileNotFoundError:
+                # Файл удален в обход кэша: синтезируем заново
+                self._total -= self._files.pop(path, 0)
+            else:
+                self.hits += 1
+                if path in self._files:
+                    self._files.move_to_end(path)
+                return path
+
+        future = self._in_flight.get(path)
+        if future is not None:
+            self.hits += 1
+            return await asyncio.shield(future)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[path] = future
+        try:
+            await self._render(text, lang, path)
+            future.set_result(path)
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Помечаем исключение полученным, если никто больше не ждет
+            raise
+        finally:
+            del self._in_flight[path]
+        await self._evict()
+        return path
+
+    async def _render(self, text: str, lang: str, path: str):
+        start = time.perf_counter()
+        abandoned = threading.Event()
+        loop = asyncio.get_running_loop()
+        try:
+            with metrics.track('tts'):
+                size = await asyncio.wait_for(
+                    loop.run_in_executor(self._executor, self._render_file, text, lang, path, abandoned),
+                    self.timeout
+                )
+        except BaseException:
+            # Поток после таймаута может еще работать: свой временный файл он удалит сам
+            abandoned.set()
+            raise
+        self._latencies.append(time.perf_counter() - start)
+
+        self._total += size - self._files.pop(path, 0)
+        self._files[path] = size
+
+    def _render_file(self, text: str, lang: str, path: str, abandoned: threading.Event) -> int:
+        """
+        Синтезирует речь в собственный временный файл и переносит его в path (в потоке пула).
+        Возвращает размер файла. Если запрос уже завершился по таймауту, результат выбрасывается.
+        """
+        fd, tmp_path = tempfile.mkstemp(suffix='.part', dir=self.cache_dir)
+        os.close(fd)
+        try:
+            self.synthesizer(text, lang, tmp_path)
+            if abandoned.is_set():
+                return 0
+            os.replace(tmp_path, path)
+            return os.path.getsize(path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    async def _evict(self):
+        while self._total > self.max_bytes and len(self._files) > 1:
+            path, size = self._files.popitem(last=False)
+            self._total -= size
+            self.evictions += 1
+            try:
+                await asyncio.to_thread(os.remove, path)
+            except FileNotFoundError:
+                pass
+            if self.on_evict is not None:
+                await self.on_evict(path)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        latencies = sorted(self._latencies)
+        return {
+            'files': len(self._files or ()),
+            'bytes': self._total,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'synth_p50_ms': latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+            'synth_max_ms': latencies[-1] * 1000 if latencies else 0.0,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        logging.info("Статистика синтеза речи: %s", self.stats())
+
+
+async def _forget_uploaded(path: str):
+    # Файл удален из кэша - его file_id больше не пригодится
+    await media_registry.forget(path, 'audio')
+
+
+# Общий экземпляр для обработчиков
+tts_service = TTSService(on_evict=_forget_uploaded)
@@ -0,0 +1,466 @@
+import os
+import json
+import time
+import struct
+import signal
+import asyncio
+import logging
+import tempfile
+import multiprocessing
+from collections import deque
+
+from aiohttp import web
+from aiogram import Bot
+from aiogram.types import Update
+
+from bot.config import (
+    BOT_TOKEN,
+    BOT_MODE,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET,
+    WEBHOOK_MAX_CONCURRENT,
+    WEBHOOK_DRAIN_TIMEOUT,
+    SHARD_SOCKET_DIR,
+    SHARD_QUEUE_SIZE,
+    SEND_GLOBAL_RATE,
+    METRICS_PORT,
+    LOG_FILE,
+    PHOTO_PROCESS_WORKERS,
+)
+from bot.log import setup_logging, worker_log_file
+
+# Кадр IPC: 4 байта длины (big-endian) и JSON апдейта
+FRAME_HEADER = struct.Struct('>I')
+
+# Поля апдейта, в которых лежит сообщение с чатом
+_MESSAGE_FIELDS = ('message', 'edited_message', 'channel_post', 'edited_channel_post')
+
+
+def extract_chat_id(update: dict) -> int:
+    """Чат, к которому относится апдейт (для inline-запросов и т.п. - пользователь)."""
+    for field in _MESSAGE_FIELDS:
+        message = update.get(field)
+        if message is not None:
+            return message['chat']['id']
+    for value in update.values():
+        if not isinstance(value, dict):
+            continue
+        message = value.get('message')
+        if isinstance(message, dict) and 'chat' in message:   # callback_query
+            return message['chat']['id']
+        if 'chat' in value:                                     # my_chat_member, chat_join_request...
+            return value['chat']['id']
+        if 'from' in value:                                     # inline_query, inline callback_query...
+            return value['from']['id']
+    return update.get('update_id', 0)
+
+
+def shard_for(chat_id: int, workers: int) -> int:
+    return chat_id % workers
+
+
+def write_frame(writer: asyncio.StreamWriter, payload: bytes):
+    writer.write(FRAME_HEADER.pack(len(payload)) + payload)
+
+
+async def read_frame(reader: asyncio.StreamReader):
+    """Следующий кадр или None, если соединение закрыто."""
+    try:
+        header = await reader.readexactly(FRAME_HEADER.size)
+        return await reader.readexactly(FRAME_HEADER.unpack(header)[0])
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+
+
+# --- Воркер ---
+class ShardWorker:
+    """
+    Процесс-воркер: принимает апдейты своего шарда через Unix-сокет и передает их в диспетчер.
+
+    У каждого чата своя очередь и одна задача, которая разбирает ее по порядку: апдейты
+    одного чата обрабатываются строго по очереди, разных чатов - параллельно, но не больше
+    max_concurrent сразу. Слот занимается, только когда апдейт действительно передается
+    в диспетчер, поэтому очередь одного занятого чата не задерживает другие чаты.
+    Принятых, но еще не обработанных апдейтов - не больше max_pending: дальше сокет
+    не читается, и очередь копится у фронта. По SIGTERM (или если родительский процесс
+    пропал) воркер перестает принимать апдейты и дорабатывает принятые.
+
+    Апдейты, принятые воркером, который затем упал, фронт заново не отправляет: они
+    остаются необработанными в журнале и повторяются при следующем запуске фронта.
+    """
+
+    def __init__(self, bot: Bot, dp, socket_path: str, max_concurrent: int = WEBHOOK_MAX_CONCURRENT,
+                 max_pending: int = SHARD_QUEUE_SIZE, drain_timeout: float = WEBHOOK_DRAIN_TIMEOUT):
+        self.bot = bot
+        self.dp = dp
+        self.socket_path = socket_path
+        self.drain_timeout = drain_timeout
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._pending = asyncio.Semaphore(max_pending)
+        self._chats = {}        # chat_id -> deque апдейтов, ждущих обработки
+        self._tasks = set()
+        self._writers = set()
+        self._stop = asyncio.Event()
+        self.processed = 0
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGTERM, self._stop.set)
+        watchdog = asyncio.create_task(self._watch_parent(os.getppid()))
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        server = await asyncio.start_unix_server(self._handle_connection, path=self.socket_path)
+        logging.info("Воркер слушает %s", self.socket_path)
+        try:
+            await self._stop.wait()
+        finally:
+            watchdog.cancel()
+            server.close()
+            for writer in self._writers:
+                writer.close()
+            await self._drain()
+            logging.info("Воркер остановлен, обработано апдейтов: %s", self.processed)
+
+    async def _watch_parent(self, parent_pid: int):
+        while os.getppid() == parent_pid:
+            await asyncio.sleep(1)
+        logging.warning("Процесс-супервизор завершился, останавливаем воркер")
+        self._stop.set()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._writers.add(writer)
+        try:
+            while not self._stop.is_set():
+                frame = await read_frame(reader)
+                if frame is None:
+                    break
+                await self._pending.acquire()
+                self._dispatch(frame)
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    def _dispatch(self, frame: bytes):
+        try:
+            data = json.loads(frame)
+            update = Update.model_validate(data, context={"bot": self.bot})
+        except Exception as e:
+            logging.error("Не удалось разобрать апдейт: %s", e)
+            self._pending.release()
+            return
+        chat_id = extract_chat_id(data)
+        queue = self._chats.get(chat_id)
+        if queue is not None:
+            # Задача чата уже работает и дойдет до апдейта после предыдущих
+            queue.append(update)
+            return
+        self._chats[chat_id] = deque([update])
+        task = asyncio.create_task(self._run_chat(chat_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_chat(self, chat_id: int):
+        """Обрабатывает апдейты чата по порядку, пока его очередь не опустеет."""
+        queue = self._chats[chat_id]
+        try:
+            while queue:
+                update = queue.popleft()
+                try:
+                    async with self._slots:
+                        await self.dp.feed_update(self.bot, update)
+                    self.processed += 1
+                except Exception as e:
+                    logging.error("Ошибка обработки апдейта %s: %s", update.update_id, e, exc_info=True)
+                finally:
+                    self._pending.release()
+        finally:
+            del self._chats[chat_id]
+            for _ in queue:   # Остановка прервала обработку: оставшиеся апдейты повторит журнал
+                self._pending.release()
+
+    async def _drain(self):
+        tasks = set(self._tasks)
+        if not tasks:
+            return
+        logging.info("Дорабатываем очереди %s чатов...", len(tasks))
+        _, pending = await asyncio.wait(tasks, timeout=self.drain_timeout)
+        for task in pending:
+            task.cancel()
+
+
+def worker_main(index: int, workers: int, socket_path: str, setup=None, setup_args=()):
+    """
+    Точка входа процесса-воркера. setup(*setup_args) вызывается до запуска бота и может
+    вернуть словарь аргументов для run_bot (например, session) - это нужно бенчмаркам.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)   # Останавливает супервизор через SIGTERM
+    # У каждого воркера свой файл лога; atexit в дочерних процессах multiprocessing не срабатывает
+    log_pipeline = setup_logging(log_file=worker_log_file(LOG_FILE, index))
+    overrides = setup(*setup_args) if setup is not None else {}
+
+    from bot.main import run_bot
+    from bot.services.metrics import metrics
+    from bot.services.outbound import SendScheduler
+    from bot.services.photos import photo_processor
+
+    options = {
+        # Лимит Telegram на весь бот делится между воркерами; лимиты чатов - нет, чаты не пересекаются
+        'scheduler': SendScheduler(global_rate=SEND_GLOBAL_RATE / workers),
+        'metrics_port': METRICS_PORT + 1 + index if METRICS_PORT else 0,
+        # Схему, прием апдейтов в журнал и его очистку ведет фронт; воркер только отмечает обработку
+        'init_schema': False,
+        'own_journal': False,
+    }
+    options.update(overrides or {})
+    if not PHOTO_PROCESS_WORKERS:
+        # Ядра для обработки фото тоже делятся между воркерами
+        photo_processor.workers = max(1, (os.cpu_count() or 1) // workers)
+    metrics.add_collector('logging', log_pipeline.stats)
+    try:
+        asyncio.run(run_bot(lambda bot, dp: ShardWorker(bot, dp, socket_path).serve(), **options))
+    finally:
+        log_pipeline.stop()
+
+
+# --- Супервизор ---
+class Supervisor:
+    """
+    Запускает workers процессов-воркеров и перезапускает упавшие.
+    Если воркер падает вскоре после запуска, пауза перед перезапуском удваивается (до 30 с).
+    """
+
+    def __init__(self, workers: int, socket_dir: str, setup=None, setup_args=()):
+        self.workers = workers
+        self.socket_dir = socket_dir
+        self.setup = setup
+        self.setup_args = setup_args
+        self._context = multiprocessing.get_context('spawn')
+        self._processes = [None] * workers
+        self._started_at = [0.0] * workers
+        self._delays = [0.5] * workers
+        self._restart_at = [None] * workers
+        self._stopping = False
+        self.restarts = 0
+
+    def socket_path(self, index: int) -> str:
+        return os.path.join(self.socket_dir, f"shard-{index}.sock")
+
+    def start(self):
+        for index in range(self.workers):
+            self._spawn(index)
+
+    def _spawn(self, index: int):
+        process = self._context.Process(
+            target=worker_main,
+            args=(index, self.workers, self.socket_path(index), self.setup, self.setup_args),
+            name=f"shard-{index}",
+        )
+        process.start()
+        self._processes[index] = process
+        self._started_at[index] = time.monotonic()
+        self._restart_at[index] = None
+        logging.info("Запущен воркер shard-%s (pid %s)", index, process.pid)
+
+    async def monitor(self):
+        while not self._stopping:
+            now = time.monotonic()
+            for index, process in enumerate(self._processes):
+                if process.is_alive():
+                    continue
+                if self._restart_at[index] is None:
+                    # Быстрое падение - увеличиваем паузу, долгая работа - сбрасываем
+                    if now - self._started_at[index] < 10:
+                        self._delays[index] = min(self._delays[index] * 2, 30)
+                    else:
+                        self._delays[index] = 0.5
+                    self._restart_at[index] = now + self._delays[index]
+                    logging.error("Воркер shard-%s завершился с кодом %s, перезапуск через %.1f с",
+                                  index, process.exitcode, self._delays[index])
+                elif now >= self._restart_at[index]:
+                    self.restarts += 1
+                    self._spawn(index)
+            await asyncio.sleep(0.2)
+
+    async def stop(self, timeout: float = WEBHOOK_DRAIN_TIMEOUT + 5):
+        self._stopping = True
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+        for process in self._processes:
+            await asyncio.to_thread(process.join, timeout)
+            if process.is_alive():
+                logging.warning("Воркер %s не остановился за %s с, завершаем принудительно", process.name, timeout)
+                process.kill()
+
+
+# --- Фронт: прием апдейтов и раздача по шардам ---
+class ShardLink:
+    """Очередь апдейтов к одному воркеру и задача, которая пересылает их в сокет, переподключаясь при обрыве."""
+
+    def __init__(self, socket_path: str, max_queue: int):
+        self.socket_path = socket_path
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.connected = asyncio.Event()
+        self.sent = 0
+        self.reconnects = 0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        pending = None
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.socket_path)
+            except OSError:
+                await asyncio.sleep(0.2)   # Воркер еще запускается или перезапускается
+                continue
+            self.connected.set()
+            try:
+                while True:
+                    if pending is None:
+                        pending = await self.queue.get()
+                    write_frame(writer, pending)
+                    await writer.drain()
+                    pending = None
+                    self.sent += 1
+                    self.queue.task_done()
+            except (ConnectionError, OSError) as e:
+                logging.warning("Соединение с %s потеряно: %s", self.socket_path, e)
+                self.reconnects += 1
+            finally:
+                self.connected.clear()
+                writer.close()
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+
+class ShardRouter:
+    """Раздает апдейты воркерам по chat_id: апдейты одного чата всегда попадают в один процесс."""
+
+    def __init__(self, socket_paths: list, max_queue: int = SHARD_QUEUE_SIZE):
+        self.links = [ShardLink(path, max_queue) for path in socket_paths]
+        self.rejected = 0
+
+    def start(self):
+        for link in self.links:
+            link.start()
+
+    def _link(self, update: dict) -> ShardLink:
+        return self.links[shard_for(extract_chat_id(update), len(self.links))]
+
+    def is_full(self, update: dict) -> bool:
+        """Переполнена ли очередь воркера, которому достанется апдейт."""
+        return self._link(update).queue.full()
+
+    def put_nowait(self, payload: bytes, update: dict) -> bool:
+        """Ставит апдейт в очередь воркера; False, если очередь переполнена."""
+        try:
+            self._link(update).queue.put_nowait(payload)
+            return True
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+
+    async def put(self, payload: bytes, update: dict):
+        """Ставит апдейт в очередь воркера, дожидаясь места."""
+        await self._link(update).queue.put(payload)
+
+    async def wait_connected(self, timeout: float = 60):
+        await asyncio.wait_for(asyncio.gather(*(link.connected.wait() for link in self.links)), timeout)
+
+    async def close(self, timeout: float = WEBHOOK_DRAIN_TIMEOUT):
+        """Дожидается отправки очередей воркерам (не дольше timeout) и закрывает соединения."""
+        try:
+            await asyncio.wait_for(asyncio.gather(*(link.queue.join() for link in self.links)), timeout)
+        except asyncio.TimeoutError:
+            logging.warning("Не переданы воркерам: %s апдейтов", sum(link.queue.qsize() for link in self.links))
+        for link in self.links:
+            await link.close()
+
+    def stats(self) -> dict:
+        return {
+            'sent': [link.sent for link in self.links],
+            'queued': [link.queue.qsize() for link in self.links],
+            'reconnects': sum(link.reconnects for link in self.links),
+            'rejected': self.rejected,
+        }
+
+
+def create_front_app(router: ShardRouter, journal=None) -> web.Application:
+    """
+    Вебхук фронта: проверяет секрет, определяет шард и сразу отвечает Telegram.
+    С журналом апдейт записывается в него до ответа, а повтор подтверждается без пересылки воркеру.
+    """
+
+    async def handle(request: web.Request) -> web.Response:
+        if WEBHOOK_SECRET and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != WEBHOOK_SECRET:
+            return web.Response(status=401, text="Unauthorized")
+        payload = await request.read()
+        update = json.loads(payload)
+        if router.is_full(update):
+            # Telegram повторит апдейт позже
+            router.rejected += 1
+            return web.Response(status=503, text="Overloaded")
+        if journal is not None and not await journal.accept(update['update_id'], payload.decode()):
+            return web.json_response({})
+        # Пока писался журнал, очередь могла заполниться: ждем места
+        await router.put(payload, update)
+        return web.json_response({})
+
+    app = web.Application()
+    app.router.add_post(WEBHOOK_PATH, handle)
+    return app
+
+
+async def run_sharded(workers: int):
+    """
+    Многопроцессный режим: этот процесс принимает апдейты (вебхуком или полингом)
+    и раздает их workers воркерам по chat_id, следя за тем, чтобы воркеры работали.
+    """
+    from bot.db.database import init_db, close_db
+    from bot.handlers.user_handlers import user_router
+    from bot.main import create_journal
+    from bot.polling import poll_updates
+    from bot.webhook import serve_webhook
+
+    # Схему и миграции применяем один раз здесь, а не наперегонки в воркерах.
+    # Журнал апдейтов пишет фронт, отметки об обработке - воркеры (база общая)
+    await init_db()
+    journal = create_journal()
+    await journal.start()
+
+    socket_dir = SHARD_SOCKET_DIR or tempfile.mkdtemp(prefix="bot-shards-")
+    os.makedirs(socket_dir, exist_ok=True)
+    supervisor = Supervisor(workers, socket_dir)
+    supervisor.start()
+    monitor = asyncio.create_task(supervisor.monitor())
+    router = ShardRouter([supervisor.socket_path(index) for index in range(workers)])
+    router.start()
+
+    # Фронту бот нужен только для getUpdates/setWebhook
+    bot = Bot(token=BOT_TOKEN)
+    allowed_updates = user_router.resolve_used_update_types()
+
+    async def forward(update: Update, data: dict):
+        await router.put(json.dumps(data, ensure_ascii=False).encode(), data)
+
+    try:
+        await journal.replay(bot, forward)
+        if BOT_MODE == 'webhook':
+            await serve_webhook(bot, create_front_app(router, journal), allowed_updates)
+        else:
+            logging.info("Начало полинга (многопроцессный режим)...")
+            await poll_updates(bot, allowed_updates, forward, journal)
+    finally:
+        await router.close()
+        logging.info("Статистика шардов: %s, перезапусков воркеров: %s", router.stats(), supervisor.restarts)
+        await supervisor.stop()
+        monitor.cancel()
+        await journal.close()
+        await close_db()
+        await bot.session.close()
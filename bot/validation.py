@@ -0,0 +1,58 @@
+"""Проверка данных студента: общие правила для регистрации в боте (/register) и импорта списков."""
+
+# Допустимый возраст студента
+MIN_AGE = 5
+MAX_AGE = 100
+
+# Причины отказа (InvalidStudent.reason)
+EMPTY = 'empty'
+COMMAND = 'command'
+NOT_NUMBER = 'not_number'
+OUT_OF_RANGE = 'out_of_range'
+
+
+class InvalidStudent(ValueError):
+    """Поле не проходит проверку; field - имя поля, reason - одна из причин выше."""
+
+    def __init__(self, field: str, reason: str, message: str):
+        super().__init__(message)
+        self.field = field
+        self.reason = reason
+
+
+def clean_name(value) -> str:
+    """Имя: непустая строка, не команда бота. Возвращает имя без пробелов по краям."""
+    return _clean_text('name', value, "имя")
+
+
+def clean_grade(value) -> str:
+    """Класс: непустая строка, не команда бота (например, '5А', '10Б', '11')."""
+    return _clean_text('grade', value, "класс")
+
+
+def clean_age(value) -> int:
+    """Возраст: целое число от MIN_AGE до MAX_AGE."""
+    text = str(value).strip() if value is not None else ''
+    if not text.isdigit():
+        raise InvalidStudent('age', NOT_NUMBER, f"возраст должен быть числом: {text!r}")
+    try:
+        age = int(text)
+    except ValueError:   # isdigit() пропускает надстрочные цифры вроде '²'
+        raise InvalidStudent('age', NOT_NUMBER, f"возраст должен быть числом: {text!r}") from None
+    if not MIN_AGE <= age <= MAX_AGE:
+        raise InvalidStudent('age', OUT_OF_RANGE, f"возраст должен быть от {MIN_AGE} до {MAX_AGE}: {age}")
+    return age
+
+
+def clean_student(name, age, grade) -> tuple:
+    """Проверяет все поля; возвращает (name, age, grade) или бросает InvalidStudent."""
+    return clean_name(name), clean_age(age), clean_grade(grade)
+
+
+def _clean_text(field: str, value, title: str) -> str:
+    text = str(value).strip() if value is not None else ''
+    if not text:
+        raise InvalidStudent(field, EMPTY, f"{title} не заполнено" if field == 'name' else f"{title} не заполнен")
+    if text.startswith('/'):
+        raise InvalidStudent(field, COMMAND, f"{title} не может начинаться с '/': {text!r}")
+    return text
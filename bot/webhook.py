@@ -0,0 +1,139 @@
+import asyncio
+import signal
+import logging
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+from bot.config import (
+    WEBHOOK_URL,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET,
+    WEBAPP_HOST,
+    WEBAPP_PORT,
+    WEBHOOK_MAX_CONCURRENT,
+    WEBHOOK_DRAIN_TIMEOUT,
+    DROP_PENDING_UPDATES,
+)
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    """
+    Обработчик вебхука с ограничением числа одновременно обрабатываемых апдейтов.
+
+    Telegram получает ответ сразу, а апдейт обрабатывается в фоне. Если занято
+    max_concurrent слотов, новый запрос ждет свободного слота, не отвечая Telegram,
+    так что нагрузка сдерживается на стороне Telegram, а не копится в памяти.
+    При остановке новые апдейты отклоняются (Telegram пришлет их повторно),
+    а уже принятые дорабатываются.
+    С журналом апдейт записывается в него до ответа Telegram, а повтор уже
+    принятого апдейта подтверждается без обработки.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, max_concurrent: int,
+                 drain_timeout: float, journal=None, **kwargs):
+        super().__init__(dispatcher=dispatcher, bot=bot, handle_in_background=True, **kwargs)
+        self.drain_timeout = drain_timeout
+        self.journal = journal
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._closing = False
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        if self._closing:
+            return web.Response(status=503, text="Shutting down")
+        payload = await request.text()
+        update = bot.session.json_loads(payload)
+        if self.journal is None or await self.journal.accept(update['update_id'], payload):
+            await self.feed(bot, update)
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def feed(self, bot: Bot, update: dict):
+        """Передает апдейт в обработку, дождавшись свободного слота."""
+        await self._slots.acquire()
+        task = asyncio.create_task(self._background_feed_update(bot=bot, update=update))
+        self._background_feed_update_tasks.add(task)
+        task.add_done_callback(self._background_feed_update_tasks.discard)
+        task.add_done_callback(lambda _: self._slots.release())
+
+    async def close(self) -> None:
+        """Дорабатывает принятые апдейты. Сессию бота закрывает main."""
+        self._closing = True
+        tasks = set(self._background_feed_update_tasks)
+        if not tasks:
+            return
+        logging.info("Дорабатываем %s принятых апдейтов...", len(tasks))
+        done, pending = await asyncio.wait(tasks, timeout=self.drain_timeout)
+        if pending:
+            logging.warning("Не успели обработать %s апдейтов за %s с", len(pending), self.drain_timeout)
+            for task in pending:
+                task.cancel()
+
+
+def create_webhook_app(bot: Bot, dp: Dispatcher) -> web.Application:
+    """
+    Собирает aiohttp-приложение с обработчиком вебхука по пути WEBHOOK_PATH.
+    Если у диспетчера есть журнал апдейтов, при запуске повторяются необработанные апдейты.
+    """
+    app = web.Application()
+    journal = dp.get('update_journal')
+    handler = BoundedRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=WEBHOOK_SECRET or None,
+        max_concurrent=WEBHOOK_MAX_CONCURRENT,
+        drain_timeout=WEBHOOK_DRAIN_TIMEOUT,
+        journal=journal,
+    )
+    handler.register(app, path=WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+    if journal is not None:
+        async def replay(_):
+            # Апдейты, принятые до перезапуска, обрабатываются раньше новых
+            await journal.replay(bot, lambda update, data: handler.feed(bot, data))
+        app.on_startup.append(replay)
+    return app
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher):
+    """
+    Запускает HTTP-сервер для вебхука и ждет SIGTERM/SIGINT.
+    При остановке сервер перестает принимать апдейты и дорабатывает принятые.
+    """
+    await serve_webhook(bot, create_webhook_app(bot, dp), dp.resolve_used_update_types())
+
+
+async def serve_webhook(bot: Bot, app: web.Application, allowed_updates: list):
+    """Обслуживает app на WEBAPP_HOST:WEBAPP_PORT, регистрирует вебхук и ждет SIGTERM/SIGINT."""
+    runner = web.AppRunner(app, handle_signals=False)
+    await runner.setup()
+    site = web.TCPSite(runner, host=WEBAPP_HOST, port=WEBAPP_PORT)
+    await site.start()
+    logging.info("Вебхук-сервер слушает %s:%s%s", WEBAPP_HOST, WEBAPP_PORT, WEBHOOK_PATH)
+
+    if WEBHOOK_URL:
+        await bot.set_webhook(
+            url=f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET or None,
+            drop_pending_updates=DROP_PENDING_UPDATES,
+            max_connections=min(WEBHOOK_MAX_CONCURRENT, 100),  # Telegram допускает 1..100
+            allowed_updates=allowed_updates,
+        )
+        logging.info("Вебхук зарегистрирован: %s%s", WEBHOOK_URL.rstrip('/'), WEBHOOK_PATH)
+    else:
+        logging.warning("WEBHOOK_URL не задан: вебхук в Telegram не регистрируется (локальный режим)")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
+
+    try:
+        await stop.wait()
+        logging.info("Получен сигнал остановки, завершаем вебхук-сервер...")
+    finally:
+        # Вебхук в Telegram не удаляем: пока бот перезапускается, апдейты копятся на стороне Telegram
+        await runner.cleanup()
@@ -0,0 +1,31 @@
+import os
+import asyncio
+
+import pytest
+
+# Тесты работают офлайн, поэтому настоящий токен не нужен.
+# Значение задается до импорта bot.config, который требует TELEGRAM_BOT_TOKEN.
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:TEST")
+
+
+@pytest.fixture
+def run_db(tmp_path, monkeypatch):
+    """
+    Запускает корутину test() с базой во временной папке: init_db до, close_db после.
+    Пул соединений привязан к циклу событий, поэтому все внутри одного asyncio.run.
+    """
+    from bot.db import database
+
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'test.db'))
+
+    def run(test):
+        async def main():
+            await database.init_db()
+            try:
+                return await test()
+            finally:
+                await database.close_db()
+
+        return asyncio.run(main())
+
+    return run
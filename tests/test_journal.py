@@ -0,0 +1,137 @@
+import json
+import time
+
+from bot.db import database
+from bot.db import journal as journal_module
+from bot.db.journal import UpdateJournal, ID_RESET_AFTER
+
+
+def make_journal(**kwargs) -> UpdateJournal:
+    kwargs.setdefault('flush_delay', 0)
+    return UpdateJournal(database.get_pool(), **kwargs)
+
+
+def payload(update_id: int) -> str:
+    return json.dumps({'update_id': update_id})
+
+
+def test_accept_skips_duplicates(run_db):
+    async def test():
+        journal = make_journal()
+        await journal.start()
+        assert await journal.accept(1, payload(1))
+        assert not await journal.accept(1, payload(1))
+        assert journal.seen(1) and not journal.seen(2)
+        assert journal.resume_offset() == 2
+        stats = await journal.stats()
+        await journal.close()
+        return stats
+
+    stats = run_db(test)
+    assert stats['accepted'] == 1
+    assert stats['duplicates'] == 1
+    assert stats['pending'] == 1
+
+
+def test_ring_eviction_keeps_old_ids_seen(run_db):
+    async def test():
+        journal = make_journal(ring_size=3)
+        await journal.start()
+        for update_id in range(1, 6):
+            await journal.accept(update_id, payload(update_id))
+        # 1 и 2 вытеснены из кольца, но остаются ниже границы
+        assert all(journal.seen(update_id) for update_id in range(1, 6))
+        await journal.close()
+
+        restarted = make_journal(ring_size=3)
+        await restarted.start()
+        try:
+            return [restarted.seen(update_id) for update_id in range(1, 7)], restarted.resume_offset()
+        finally:
+            await restarted.close()
+
+    seen, offset = run_db(test)
+    assert seen == [True] * 5 + [False]
+    assert offset == 6
+
+
+def test_replay_after_restart(run_db):
+    async def test():
+        journal = make_journal()
+        await journal.start()
+        for update_id in (1, 2, 3):
+            await journal.accept(update_id, payload(update_id))
+        journal.complete(2)
+        # Процесс "упал": отметки 1 и 3 не сделаны
+        await journal.close()
+
+        restarted = make_journal()
+        await restarted.start()
+        replayed = []
+
+        async def handle(update, data):
+            replayed.append(update.update_id)
+            restarted.complete(update.update_id)
+
+        count = await restarted.replay(None, handle)
+        await restarted.flush()
+        stats = await restarted.stats()
+        # Telegram присылает те же апдейты еще раз - они уже приняты
+        redelivered = [await restarted.accept(update_id, payload(update_id)) for update_id in (1, 2, 3)]
+        await restarted.close()
+        return count, replayed, stats, redelivered
+
+    count, replayed, stats, redelivered = run_db(test)
+    assert count == 2
+    assert replayed == [1, 3]
+    assert stats['pending'] == 0
+    assert redelivered == [False, False, False]
+
+
+def test_replay_drops_update_after_max_attempts(run_db):
+    async def test():
+        journal = make_journal(max_replays=2)
+        await journal.start()
+        await journal.accept(7, payload(7))
+        await journal.close()
+
+        attempts = []
+        for _ in range(3):
+            # Апдейт каждый раз роняет бота: отметка об обработке так и не записывается
+            restarted = make_journal(max_replays=2)
+            await restarted.start()
+
+            async def handle(update, data):
+                attempts.append(update.update_id)
+
+            await restarted.replay(None, handle)
+            await restarted.close()
+        return attempts, restarted.dropped
+
+    attempts, dropped = run_db(test)
+    assert attempts == [7, 7]
+    assert dropped == 1
+
+
+def test_numbering_restart_after_idle_week(run_db, monkeypatch):
+    async def test():
+        journal = make_journal(ring_size=3)
+        await journal.start()
+        for update_id in range(100, 105):
+            await journal.accept(update_id, payload(update_id))
+        # Неделя без апдейтов: Telegram начинает нумерацию с произвольного номера
+        now = time.time()
+        monkeypatch.setattr(journal_module.time, 'time', lambda: now + ID_RESET_AFTER + 1)
+        accepted = [await journal.accept(update_id, payload(update_id)) for update_id in (50, 101, 50)]
+        offset = journal.resume_offset()
+        await journal.close()
+        async with database.get_pool().acquire() as db:
+            async with db.execute('SELECT payload FROM update_journal WHERE update_id = 101') as cursor:
+                stored = (await cursor.fetchone())[0]
+        return accepted, offset, stored
+
+    accepted, offset, stored = run_db(test)
+    assert accepted == [True, True, False]
+    assert offset == 102
+    # Старая обработанная запись с тем же номером не мешает записать новый апдейт
+    assert stored == payload(101)
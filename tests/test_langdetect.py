@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from bot.services.langdetect import detect_language
+from bot.services.translation import TranslationService, SAME_LANGUAGE
+
+
+class RecordingTranslator:
+    """Переводчик с API googletrans, который запоминает, с каким src его вызвали."""
+
+    def __init__(self):
+        self.calls = []
+
+    def translate(self, text, dest='en', src='auto'):
+        self.calls.append((text, src))
+        return type('Translated', (), {'text': text, 'src': src, 'dest': dest})()
+
+
+def translate(text: str):
+    async def run():
+        translator = RecordingTranslator()
+        service = TranslationService(translator, batch_window=0, local_detect=True)
+        try:
+            result = await service.translate(text, dest='en')
+        finally:
+            await service.shutdown()
+        return result, translator.calls
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize('text, lang', [
+    ("Hello, how are you?", 'en'),
+    ("Thanks, see you tomorrow at the school", 'en'),
+    ("Wie geht es dir heute?", 'de'),
+    ("Bonjour, je ne sais pas", 'fr'),
+    ("¿Dónde está la biblioteca?", 'es'),
+    ("Dzień dobry, jak się masz?", 'pl'),
+    ("Привіт, як справи? Що нового?", 'uk'),
+    ("Γεια σου, τι κάνεις;", 'el'),
+])
+def test_detects_clear_cases(text, lang):
+    assert detect_language(text).lang == lang
+
+
+@pytest.mark.parametrize('text, lang', [
+    ("Привет, как дела?", 'ru'),
+    ("Здравей, как си? Какво правиш днес?", 'bg'),
+    ("مرحبا كيف حالك", 'ar'),
+    ("حال شما خوب است؟", 'fa'),
+])
+def test_detects_cyrillic_and_arabic_by_words(text, lang):
+    assert detect_language(text).lang == lang
+
+
+@pytest.mark.parametrize('text', [
+    "Обичам морето",        # болгарский без характерных слов - не обязательно русский
+    "Привет",               # одно слово
+    "من خوبم",              # персидский без характерных букв - не обязательно арабский
+    "Её",                   # одни характерные буквы без слов
+])
+def test_cyrillic_and_arabic_without_evidence_give_no_hint(text):
+    assert detect_language(text).lang is None
+
+
+@pytest.mark.parametrize('text', [
+    "Minä olen kotona",     # финский: "ä" - одна немецкая буква
+    "Saya di rumah",        # индонезийский: "di" - одно итальянское слово
+    "Mi chiamo Anna",       # итальянский: "mi" - одно турецкое слово
+    "Naïve idea",           # английский с одной французской буквой
+    "a to je",              # чешский: "a", "to" - английские слова, "je" - французское
+    "ok",
+])
+def test_ambiguous_latin_gives_no_hint(text):
+    detection = detect_language(text)
+    assert detection.lang is None
+    assert not detection.confident
+
+
+def test_only_english_majority_is_confident():
+    assert detect_language("Can you translate this for me please").confident
+    assert not detect_language("Wie geht es dir heute?").confident
+    assert not detect_language("Привет, как дела?").confident
+    assert detect_language("안녕하세요").confident
+
+
+def test_nothing_to_translate():
+    assert detect_language("https://example.com/lesson?id=5 😀").letters == 0
+
+
+def test_confident_english_skips_translator():
+    result, calls = translate("Hello, how are you?")
+    assert result.reason == SAME_LANGUAGE
+    assert calls == []
+
+
+@pytest.mark.parametrize('text', ["a to je", "Minä olen kotona", "ok", "Обичам морето"])
+def test_uncertain_text_goes_to_translator_with_auto(text):
+    _, calls = translate(text)
+    assert calls == [(text, 'auto')]
+
+
+def test_clear_language_is_passed_as_hint():
+    _, calls = translate("Bonjour, je ne sais pas")
+    assert calls == [("Bonjour, je ne sais pas", 'fr')]
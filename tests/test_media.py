@@ -0,0 +1,79 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import FSInputFile
+
+from bot.services.media import MediaRegistry
+
+
+class FakeBot:
+    """Отправляет документы: загрузка дает новый file_id, отклоненные file_id - BadRequest."""
+
+    def __init__(self, reject: dict = None, upload_delay: float = 0):
+        self.reject = reject or {}   # file_id -> текст ошибки Telegram
+        self.upload_delay = upload_delay
+        self.uploads = 0
+        self.by_id = []
+
+    async def send_document(self, chat_id, document, **kwargs):
+        if isinstance(document, FSInputFile):
+            self.uploads += 1
+            await asyncio.sleep(self.upload_delay)
+            file_id = f"id{self.uploads}"
+        else:
+            if document in self.reject:
+                raise TelegramBadRequest(method=None, message=self.reject[document])
+            self.by_id.append(document)
+            file_id = document
+        return SimpleNamespace(document=SimpleNamespace(file_id=file_id))
+
+
+def test_forget_during_upload_does_not_allow_parallel_upload(run_db, tmp_path):
+    path = tmp_path / 'file.txt'
+    path.write_text('data')
+
+    async def test():
+        registry = MediaRegistry()
+        bot = FakeBot(upload_delay=0.05)
+        first = asyncio.create_task(registry.send(bot, 1, str(path)))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(registry.send(bot, 2, str(path)))
+        await asyncio.sleep(0.01)
+        # Файл забыт, пока первый обработчик его загружает, а второй ждет блокировку
+        await registry.forget(str(path), 'document')
+        third = asyncio.create_task(registry.send(bot, 3, str(path)))
+        await asyncio.gather(first, second, third)
+        return registry, bot
+
+    registry, bot = run_db(test)
+    assert bot.uploads == 1
+    assert bot.by_id == ['id1', 'id1']
+    assert registry._locks == {} and registry._lock_users == {}
+
+
+@pytest.mark.parametrize('error, uploads', [
+    ("Bad Request: wrong file identifier/HTTP URL specified", 2),
+    ("Bad Request: chat not found", 1),
+])
+def test_send_after_waiting_reuploads_only_for_rejected_file_id(run_db, tmp_path, error, uploads):
+    path = tmp_path / 'file.txt'
+    path.write_text('data')
+
+    async def test():
+        registry = MediaRegistry()
+        bot = FakeBot(upload_delay=0.05)
+        first = asyncio.create_task(registry.send(bot, 1, str(path)))
+        await asyncio.sleep(0.01)
+        # Второй обработчик дождется блокировки и отправит по file_id, который Telegram отклонит
+        bot.reject['id1'] = error
+        second = asyncio.create_task(registry.send(bot, 2, str(path)))
+        return await asyncio.gather(first, second, return_exceptions=True), bot
+
+    (_, result), bot = run_db(test)
+    assert bot.uploads == uploads
+    if uploads == 1:
+        assert isinstance(result, TelegramBadRequest)
+    else:
+        assert result.document.file_id == 'id2'
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+from aiohttp import ClientConnectorError
+from aiogram.exceptions import TelegramServerError, TelegramNetworkError, TelegramRetryAfter
+from aiogram.methods import SendMessage, EditMessageText
+
+from bot.services import outbound
+from bot.services.outbound import SendScheduler, retry_server_errors
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    real_sleep = asyncio.sleep
+
+    async def sleep(delay, *args, **kwargs):
+        await real_sleep(0)
+
+    monkeypatch.setattr(outbound.asyncio, 'sleep', sleep)
+
+
+def make_scheduler() -> SendScheduler:
+    return SendScheduler(global_rate=1e9, chat_rate=1e9, group_rate=1e9, chat_burst=10 ** 9,
+                         max_retries=3, jitter=0)
+
+
+def not_connected(method) -> TelegramNetworkError:
+    """Ошибка aiogram при неудачном соединении: исходная ошибка aiohttp остается в __context__."""
+    try:
+        raise ClientConnectorError.__new__(ClientConnectorError)
+    except ClientConnectorError:
+        try:
+            raise TelegramNetworkError(method=method, message="ClientConnectorError")
+        except TelegramNetworkError as e:
+            return e
+
+
+def failing_request(*errors):
+    """make_request, который по очереди выбрасывает errors, а затем отвечает 'ok'."""
+    calls = []
+
+    async def make_request(bot, method):
+        calls.append(method)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return 'ok'
+
+    return make_request, calls
+
+
+def send(scheduler, make_request, method):
+    return asyncio.run(scheduler(make_request, None, method))
+
+
+@pytest.mark.parametrize('error', [
+    TelegramServerError(method=None, message="Internal Server Error"),
+    TelegramNetworkError(method=None, message="Request timeout error"),
+])
+def test_message_not_resent_after_server_error_or_timeout(error):
+    scheduler = make_scheduler()
+    make_request, calls = failing_request(error)
+    with pytest.raises(type(error)):
+        send(scheduler, make_request, SendMessage(chat_id=1, text="x"))
+    assert len(calls) == 1
+    assert scheduler.failed == 1
+
+
+def test_retry_after_and_failed_connection_are_retried():
+    method = SendMessage(chat_id=1, text="x")
+    scheduler = make_scheduler()
+    make_request, calls = failing_request(
+        TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=0),
+        not_connected(method),
+    )
+    assert send(scheduler, make_request, method) == 'ok'
+    assert len(calls) == 3
+    assert scheduler.retries == 2
+
+
+def test_server_error_retried_for_edit_and_opt_in():
+    error = TelegramServerError(method=None, message="Bad Gateway")
+    scheduler = make_scheduler()
+
+    make_request, calls = failing_request(error)
+    assert send(scheduler, make_request, EditMessageText(chat_id=1, message_id=1, text="x")) == 'ok'
+    assert len(calls) == 2
+
+    make_request, calls = failing_request(error)
+    with retry_server_errors():
+        assert send(scheduler, make_request, SendMessage(chat_id=1, text="x")) == 'ok'
+    assert len(calls) == 2
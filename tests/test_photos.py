@@ -0,0 +1,46 @@
+import os
+
+from bot.db import database
+from bot.services.photos import PhotoIngestor
+
+
+def store(root, name: str, size: int, saved_at: float) -> str:
+    """Кладет файл размером size в папку фото и возвращает путь относительно нее."""
+    rel_path = f"{name}.jpg"
+    with open(os.path.join(root, rel_path), 'wb') as f:
+        f.write(b'x' * size)
+    return rel_path
+
+
+def test_quota_counts_photos_saved_by_other_shards(run_db, tmp_path):
+    async def test():
+        # Два шарда с общей папкой и базой: каждый сохранил по 60 байт при квоте 100
+        shards = [PhotoIngestor(root=str(tmp_path), quota=100) for _ in range(2)]
+        for i, ingestor in enumerate(shards):
+            rel_path = store(tmp_path, f"photo{i}", 60, saved_at=i)
+            await database.save_photo(f"u{i}", f"hash{i}", rel_path, 60, saved_at=i)
+            ingestor.total_size += 60
+            await ingestor._enforce_quota()
+        return shards
+
+    first, second = run_db(test)
+    # Второй шард видит и фото первого, поэтому удаляет самое старое из общего индекса
+    assert first.evicted == 0
+    assert second.evicted == 1
+    assert second.total_size == 60
+    assert not (tmp_path / 'photo0.jpg').exists()
+    assert (tmp_path / 'photo1.jpg').exists()
+
+
+def test_quota_not_exceeded_keeps_files(run_db, tmp_path):
+    async def test():
+        ingestor = PhotoIngestor(root=str(tmp_path), quota=100)
+        rel_path = store(tmp_path, 'photo', 60, saved_at=0)
+        await database.save_photo('u', 'hash', rel_path, 60, saved_at=0)
+        await ingestor._enforce_quota()
+        return ingestor
+
+    ingestor = run_db(test)
+    assert ingestor.evicted == 0
+    assert ingestor.total_size == 60
+    assert (tmp_path / 'photo.jpg').exists()
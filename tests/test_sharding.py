@@ -0,0 +1,52 @@
+import json
+import asyncio
+
+from bot.sharding import ShardWorker, extract_chat_id, shard_for
+
+
+def frame(update_id: int, chat_id: int) -> bytes:
+    return json.dumps({
+        'update_id': update_id,
+        'message': {'message_id': update_id, 'date': 0, 'chat': {'id': chat_id, 'type': 'private'}, 'text': 'x'},
+    }).encode()
+
+
+class FakeDispatcher:
+    """Обработка апдейтов чата 1 ждет release; остальные чаты обрабатываются сразу."""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.done = []
+
+    async def feed_update(self, bot, update):
+        if update.message.chat.id == 1:
+            await self.release.wait()
+        self.done.append((update.message.chat.id, update.update_id))
+
+
+def test_busy_chat_does_not_block_other_chats():
+    async def test():
+        dp = FakeDispatcher()
+        worker = ShardWorker(None, dp, socket_path='', max_concurrent=2, max_pending=100)
+        for update_id in range(1, 11):
+            await worker._pending.acquire()
+            worker._dispatch(frame(update_id, chat_id=1))
+        await worker._pending.acquire()
+        worker._dispatch(frame(11, chat_id=2))
+        await asyncio.sleep(0.01)
+        before_release = list(dp.done)
+        dp.release.set()
+        await asyncio.gather(*worker._tasks)
+        return before_release, dp.done
+
+    before_release, done = asyncio.run(test())
+    assert before_release == [(2, 11)]
+    # Порядок внутри чата сохраняется
+    assert [update_id for chat_id, update_id in done if chat_id == 1] == list(range(1, 11))
+
+
+def test_updates_of_one_chat_go_to_one_shard():
+    update = json.loads(frame(5, chat_id=42))
+    callback = {'update_id': 6, 'callback_query': {'id': '1', 'from': {'id': 7}, 'message': {'chat': {'id': 42}}}}
+    assert extract_chat_id(update) == extract_chat_id(callback) == 42
+    assert shard_for(42, 4) == 2
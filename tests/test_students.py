@@ -0,0 +1,48 @@
+import pytest
+
+from bot.db import database
+from bot.handlers.user_handlers import (
+    STUDENTS_QUERY_MAX_BYTES,
+    _students_callback,
+    _parse_students_callback,
+)
+
+NAMES = ["Анна", "Борис", "Вера", "Глеб", "Дарья", "Егор"]
+
+
+@pytest.mark.parametrize('mode, value', [('all', ""), ('grade', "7Б"), ('name', "a:b"), ('name', "я" * 13)])
+def test_callback_round_trip_fits_limit(mode, value):
+    assert len(value.encode()) <= STUDENTS_QUERY_MAX_BYTES
+    key = "иванов иван иванович"
+    data = _students_callback(mode, value, 10 ** 18, key)
+    assert len(data.encode()) <= 64
+    parsed_mode, parsed_value, after_id, after_key = _parse_students_callback(data)
+    assert (parsed_mode, parsed_value, after_id) == (mode, value, 10 ** 18)
+    assert key.startswith(after_key)
+
+
+def test_next_page_after_anchor_deleted(run_db):
+    async def test():
+        await database.insert_students([(name, 10, "5А") for name in NAMES])
+        first = await database.search_students(grade="5А", limit=3)
+        anchor = first[-1]
+        after_key = database.make_name_key(anchor.name)
+        async with database.get_pool().acquire() as db:
+            await db.execute('DELETE FROM students WHERE id = ?', (anchor.id,))
+            await db.commit()
+        second = await database.search_students(grade="5А", after_id=anchor.id, after_key=after_key, limit=3)
+        return first, second
+
+    first, second = run_db(test)
+    assert [s.name for s in first] == NAMES[:3]
+    assert [s.name for s in second] == NAMES[3:]
+
+
+def test_truncated_key_uses_anchor_row(run_db):
+    async def test():
+        await database.insert_students([(name, 10, "5А") for name in ["Ив", "Ива", "Иван", "Иванов"]])
+        first = await database.search_students(limit=2)
+        # Ключ обрезан до "ив": запись есть, поэтому страница продолжается точно после нее
+        return await database.search_students(after_id=first[-1].id, after_key="ив", limit=2)
+
+    assert [s.name for s in run_db(test)] == ["Иван", "Иванов"]
@@ -0,0 +1,78 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from bot.middlewares import throttling
+from bot.middlewares.throttling import ThrottlingMiddleware, _Bucket
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(throttling.time, 'monotonic', clock)
+    return clock
+
+
+async def _handler(event, data):
+    return 'ok'
+
+
+def call(middleware, user_id: int = 1, heavy: bool = False):
+    data = {
+        'event_from_user': SimpleNamespace(id=user_id),
+        'handler': SimpleNamespace(flags={'cost': 'heavy'} if heavy else {}, callback=_handler),
+    }
+    return asyncio.run(middleware(_handler, object(), data))
+
+
+def test_bucket_refills_at_rate():
+    bucket = _Bucket(burst=2, now=0)
+    assert bucket.take(rate=1, burst=2, now=0)
+    assert bucket.take(rate=1, burst=2, now=0)
+    assert not bucket.take(rate=1, burst=2, now=0)
+    assert not bucket.take(rate=1, burst=2, now=0.5)
+    assert bucket.take(rate=1, burst=2, now=1.5)
+    assert bucket.is_full(rate=1, burst=2, now=10)
+
+
+def test_user_burst_then_throttled(clock):
+    middleware = ThrottlingMiddleware(user_rate=1, user_burst=3, notice_interval=60)
+    results = [call(middleware) for _ in range(4)]
+    assert results == ['ok', 'ok', 'ok', None]
+    # Другой пользователь ограничивается отдельно
+    assert call(middleware, user_id=2) == 'ok'
+    clock.now += 1
+    assert call(middleware) == 'ok'
+    assert middleware.throttled == 1
+
+
+def test_new_user_gets_middleware_burst(clock):
+    middleware = ThrottlingMiddleware(user_rate=0.001, user_burst=10)
+    assert [call(middleware) for _ in range(11)] == ['ok'] * 10 + [None]
+
+
+def test_heavy_handler_has_own_bucket(clock):
+    middleware = ThrottlingMiddleware(user_rate=100, user_burst=100, heavy_rate=0.1, heavy_burst=1)
+    assert call(middleware, heavy=True) == 'ok'
+    assert call(middleware, heavy=True) is None
+    # Легкие обработчики тяжелый лимит не затрагивает
+    assert call(middleware) == 'ok'
+
+
+def test_overload_sheds_heavy_first(clock):
+    middleware = ThrottlingMiddleware(max_in_flight=10, heavy_share=0.5)
+    middleware.in_flight = 5
+    assert call(middleware, heavy=True) is None
+    assert call(middleware) == 'ok'
+    middleware.in_flight = 10
+    assert call(middleware) is None
+    assert middleware.shed == 2
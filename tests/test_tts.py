@@ -0,0 +1,52 @@
+import os
+import time
+import asyncio
+
+from bot.services.tts import TTSService, STALE_PART_AGE
+
+
+def fake_synthesizer(text: str, lang: str, path: str):
+    with open(path, 'wb') as f:
+        f.write(text.encode())
+
+
+def make_service(tmp_path, **kwargs) -> TTSService:
+    return TTSService(synthesizer=fake_synthesizer, cache_dir=str(tmp_path), workers=1, **kwargs)
+
+
+def test_stale_part_files_removed_on_index_load(tmp_path):
+    stale = tmp_path / 'old.part'
+    fresh = tmp_path / 'new.part'
+    stale.write_bytes(b'x')
+    fresh.write_bytes(b'x')
+    old = time.time() - STALE_PART_AGE - 60
+    os.utime(stale, (old, old))
+    (tmp_path / 'cached.mp3').write_bytes(b'abc')
+
+    service = make_service(tmp_path)
+    asyncio.run(service._ensure_index())
+    service.shutdown()
+
+    assert not stale.exists()
+    assert fresh.exists()   # Его может дописывать другой процесс
+    assert list(service._files) == [str(tmp_path / 'cached.mp3')]
+
+
+def test_eviction_removes_oldest_files(tmp_path):
+    evicted = []
+
+    async def on_evict(path):
+        evicted.append(path)
+
+    async def test():
+        service = make_service(tmp_path, max_bytes=10, on_evict=on_evict)
+        first = await service.synthesize("aaaaaa", 'en')
+        second = await service.synthesize("bbbbbb", 'en')
+        service.shutdown()
+        return service, first, second
+
+    service, first, second = asyncio.run(test())
+    assert evicted == [first]
+    assert not os.path.exists(first)
+    assert os.path.exists(second)
+    assert service.stats()['bytes'] == 6
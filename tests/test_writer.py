@@ -0,0 +1,45 @@
+import asyncio
+
+from bot.db import database
+from bot.db.writer import BatchWriter
+
+
+def test_failed_batch_falls_back_to_rows(run_db):
+    async def test():
+        async with database.get_pool().acquire() as db:
+            await db.execute('CREATE TABLE items (value INTEGER NOT NULL CHECK (value > 0))')
+            await db.commit()
+        writer = BatchWriter(database.get_pool(), 'INSERT INTO items (value) VALUES (?)', window=0.05, max_size=100)
+        writer.start()
+        # Одна строка нарушает CHECK: пачка откатывается и пишется построчно
+        results = await asyncio.gather(*(writer.submit((value,)) for value in (1, 2, -1, 3)))
+        await writer.close()
+        async with database.get_pool().acquire() as db:
+            async with db.execute('SELECT value FROM items ORDER BY value') as cursor:
+                saved = [row[0] for row in await cursor.fetchall()]
+        return results, saved, writer.batches_written
+
+    results, saved, batches = run_db(test)
+    assert results == [True, True, False, True]
+    assert saved == [1, 2, 3]
+    assert batches == 1
+
+
+def test_close_writes_queued_rows(run_db):
+    async def test():
+        async with database.get_pool().acquire() as db:
+            await db.execute('CREATE TABLE items (value INTEGER)')
+            await db.commit()
+        writer = BatchWriter(database.get_pool(), 'INSERT INTO items (value) VALUES (?)', window=10, max_size=1000)
+        writer.start()
+        pending = [asyncio.ensure_future(writer.submit((value,))) for value in range(50)]
+        await asyncio.sleep(0)
+        await writer.close()
+        results = await asyncio.gather(*pending)
+        async with database.get_pool().acquire() as db:
+            async with db.execute('SELECT COUNT(*) FROM items') as cursor:
+                return results, (await cursor.fetchone())[0]
+
+    results, count = run_db(test)
+    assert all(results)
+    assert count == 50